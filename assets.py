@@ -0,0 +1,58 @@
+"""
+Background asset warm-up for RETRO RACER
+
+Expensive startup work (font loading, sound synthesis, rasterizing
+sprites and pre-rendering text) runs on a worker thread, one named job
+at a time in submission order, while the main thread keeps drawing a
+loading screen. The game asks for a job's result only when the state it
+is entering needs it, and blocks just for that job.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AssetLoader:
+    """Prepare named assets on a background thread"""
+
+    def __init__(self):
+        # One worker keeps jobs in order, so later jobs may use earlier results
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='assets')
+        self.futures = {}  # name -> Future
+        self.timings = {}  # name -> seconds spent preparing
+
+    def submit(self, name, load, *args):
+        """Queue load(*args) to produce the asset called name"""
+        def timed():
+            start = time.perf_counter()
+            try:
+                return load(*args)
+            finally:
+                self.timings[name] = time.perf_counter() - start
+        self.futures[name] = self.executor.submit(timed)
+
+    def ready(self, *names):
+        """True when every named asset has finished (or failed)"""
+        return all(self.futures[name].done() for name in names)
+
+    def get(self, name):
+        """Return an asset, blocking until it is ready; re-raises its error"""
+        return self.futures[name].result()
+
+    def progress(self):
+        """Fraction of submitted assets that are finished"""
+        if not self.futures:
+            return 1.0
+        return sum(future.done() for future in self.futures.values()) / len(self.futures)
+
+    def pending(self):
+        """Names of assets still being prepared, in submission order"""
+        return [name for name, future in self.futures.items() if not future.done()]
+
+    def wait_all(self):
+        """Block until every asset is ready"""
+        for name in self.futures:
+            self.futures[name].exception()
+
+    def shutdown(self):
+        """Stop the worker once queued jobs finish"""
+        self.executor.shutdown(wait=True)
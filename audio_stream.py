@@ -0,0 +1,97 @@
+"""
+Block-streaming audio playback for RETRO RACER
+
+An AudioStream plays an endless signal on one pygame.mixer.Channel. A
+feeder thread renders fixed-size blocks ahead of playback and hands
+them to Channel.queue(), so the game loop never waits on synthesis and a
+slow frame cannot starve the mixer. Blocks are written in place into a
+small ring of preallocated Sounds, so memory stays bounded however long
+the stream runs.
+"""
+import threading
+import time
+
+import pygame
+
+# Sounds in the ring: one playing, one queued, one being filled
+RING_SIZE = 3
+
+# Channels kept back from one-shot sounds: 0 for music, 1 for the engine
+STREAM_CHANNELS = 2
+
+
+class AudioStream:
+    """Feed render(out) blocks to a mixer channel from a background thread
+
+    render(out) fills an int16 (frames, 2) array in place. channel is a
+    reserved channel index or a Channel.
+    """
+
+    def __init__(self, render, channel=0, block_frames=4096, sample_rate=22050):
+        self.render = render
+        if isinstance(channel, int):
+            # Reserve the stream channels so one-shot Sound.play() calls never take them
+            pygame.mixer.set_reserved(STREAM_CHANNELS)
+            channel = pygame.mixer.Channel(channel)
+        self.channel = channel
+        self.block_frames = block_frames
+        self.block_seconds = block_frames / sample_rate
+        self.ring = [pygame.mixer.Sound(buffer=bytes(block_frames * 4)) for _ in range(RING_SIZE)]
+        self.buffers = [pygame.sndarray.samples(sound) for sound in self.ring]
+        self.next_slot = 0
+        self.blocks = 0
+        self.underruns = 0
+        self.render_time = 0.0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def fill_next(self):
+        """Render the next block into the ring; returns its Sound"""
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % RING_SIZE
+        start = time.perf_counter()
+        self.render(self.buffers[slot])
+        self.render_time += time.perf_counter() - start
+        self.blocks += 1
+        return self.ring[slot]
+
+    def feed(self):
+        """Keep one block playing and one queued; returns True if a block was added"""
+        queued = self.channel.get_queue()
+        if not self.channel.get_busy():
+            if queued is not None:
+                # Between blocks: the mixer is about to start the queued one
+                return False
+            if self.blocks:
+                self.underruns += 1
+            self.channel.play(self.fill_next())
+            return True
+        if queued is None:
+            self.channel.queue(self.fill_next())
+            return True
+        return False
+
+    def run(self):
+        # Poll several times per block so the queue is refilled well before it drains
+        interval = self.block_seconds / 4
+        while not self.stopping.is_set():
+            self.feed()
+            self.stopping.wait(interval)
+
+    def start(self):
+        """Start playback on the feeder thread"""
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='audio-stream', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the feeder and silence the channel"""
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+        self.channel.stop()
+
+    def set_volume(self, volume):
+        self.channel.set_volume(volume)
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmarks for RETRO RACER
+
+Runs headless under SDL's dummy video and audio drivers.
+
+Besides the before/after comparisons, a regression suite times the
+game's hot paths and full frames and compares them with a JSON baseline:
+
+    python3 benchmarks.py --update-baseline   # record this machine's timings
+    python3 benchmarks.py --threshold 0.25    # fail on a >25% slowdown
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+
+import numpy as np
+
+from engine_audio import ENGINE_BLOCK_FRAMES, EngineVoice
+from glow import Bloom
+from layers import create_default_compositor, render_background, render_road
+from obstacle_store import OBSTACLE_SIZES, TYPE_CODES, TYPE_NAMES, ObstacleStore
+from retro_racer import RetroRacer, SynthSounds
+from road3d import PerspectiveRoad
+from sim_core import MAX_SPEED, SCREEN_HEIGHT, SCREEN_WIDTH, START_SPEED
+from sprites import SPRITE_RENDERERS, SpriteAtlas
+from synth import SAMPLE_RATE, render_beep, render_engine
+from text_cache import GLOW_OFFSETS, TextCache
+
+# Regression suite defaults
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+DEFAULT_THRESHOLD = 0.25
+OBSTACLE_COUNTS = (5, 50, 500)
+PARTICLE_COUNT = 10000
+
+# Internal resolution for the scaled-down drawing benchmark
+LOW_RENDER_SIZE = (400, 300)
+
+
+def time_frames(draw, frames=200):
+    """Return the mean milliseconds per call of draw()"""
+    draw()  # warm-up
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    return (time.perf_counter() - start) * 1000.0 / frames
+
+
+def time_best(draw, frames=100, repeats=5):
+    """Best of several time_frames() batches, which is the least noisy"""
+    return min(time_frames(draw, frames) for _ in range(repeats))
+
+
+def bench_static_layers(frames=200):
+    """Background plus road: per-frame redraw versus cached layers"""
+    size = (800, 600)
+    screen = pygame.display.set_mode(size)
+    compositor = create_default_compositor(size)
+
+    def uncached():
+        # What every frame used to cost: 600 gradient lines plus the road
+        screen.blit(render_background(size, compositor.palette), (0, 0))
+        road, offset = render_road(size, compositor.palette)
+        screen.blit(road, offset)
+
+    def cached():
+        compositor.blit(screen, 'background')
+        compositor.blit(screen, 'road')
+
+    return {
+        'uncached_ms': time_frames(uncached, frames),
+        'cached_ms': time_frames(cached, frames),
+    }
+
+
+def bench_glowing_text(frames=200):
+    """Glowing HUD counter: nine renders per frame versus the glyph atlas"""
+    screen = pygame.display.set_mode((800, 600))
+    font = pygame.font.Font(None, 28)
+    cache = TextCache()
+    color, glow_color = (0, 255, 255), (0, 127, 127)
+    score = [0]
+
+    def uncached():
+        score[0] += 7
+        text = f"SCORE: {score[0]:06d}"
+        for dx, dy in GLOW_OFFSETS:
+            screen.blit(font.render(text, True, glow_color), (20 + dx, 20 + dy))
+        screen.blit(font.render(text, True, color), (20, 20))
+
+    def cached():
+        score[0] += 7
+        cache.draw_glyphs(screen, font, f"SCORE: {score[0]:06d}", (20, 20), color, glow_color)
+
+    results = {
+        'uncached_ms': time_frames(uncached, frames),
+        'cached_ms': time_frames(cached, frames),
+    }
+    results.update(cache.stats())
+    return results
+
+
+def make_obstacles(count):
+    """Deterministic mix of cars and barriers spread over the road"""
+    obstacles = []
+    for i in range(count):
+        kind = 'car' if i % 2 == 0 else 'barrier'
+        width, height = (30, 40) if kind == 'car' else (40, 20)
+        obstacles.append((kind, width, height, 280 + (i * 37) % 240, -50 + (i * 53) % 700))
+    return obstacles
+
+
+def bench_obstacle_sprites(counts=(5, 50, 500), frames=100):
+    """Obstacle draw cost by count: pygame.draw primitives versus the atlas"""
+    screen = pygame.display.set_mode((800, 600))
+    atlas = SpriteAtlas()
+    results = {}
+    for count in counts:
+        obstacles = make_obstacles(count)
+
+        def primitives():
+            for kind, width, height, x, y in obstacles:
+                SPRITE_RENDERERS[kind](screen, x, y, width, height)
+
+        def sprites():
+            atlas.blits(screen, obstacles)
+
+        results[count] = {
+            'primitives_ms': time_frames(primitives, frames),
+            'atlas_ms': time_frames(sprites, frames),
+        }
+    return results
+
+
+def obstacle_memory():
+    """Bytes held per obstacle: a dict with its values versus a store row"""
+    width, height = OBSTACLE_SIZES['car']
+    obstacle = {'x': 400, 'y': -50, 'type': 'car', 'width': width, 'height': height}
+    # Small ints and the type string are shared, so only the dict counts
+    return {'dict_bytes': sys.getsizeof(obstacle),
+            'store_bytes': ObstacleStore().bytes_per_obstacle()}
+
+
+def bench_obstacle_store(counts=(10, 1000, 10000), frames=50):
+    """Obstacle update plus collision: list of dicts versus the SoA store"""
+    results = {}
+    player_rect = pygame.Rect(384, 472, 32, 56)
+    for count in counts:
+        rng = np.random.default_rng(count)
+        xs = rng.integers(280, 520, count)
+        kinds = rng.integers(0, 2, count)
+
+        def fresh_dicts():
+            obstacles = []
+            for i in range(count):
+                width, height = OBSTACLE_SIZES[TYPE_NAMES[kinds[i]]]
+                obstacles.append({'x': int(xs[i]), 'y': -50 - i % 650, 'type': TYPE_NAMES[kinds[i]],
+                                  'width': width, 'height': height})
+            return obstacles
+
+        def fresh_store():
+            store = ObstacleStore()
+            store.spawn_many(xs, -50 - np.arange(count) % 650, kinds)
+            return store
+
+        dicts = [fresh_dicts()]
+
+        def update_dicts():
+            # The original update_obstacles/check_collisions loops
+            obstacles = dicts[0]
+            for obstacle in obstacles[:]:
+                obstacle['y'] += 7
+                if obstacle['y'] > 650:
+                    obstacles.remove(obstacle)
+            for obstacle in obstacles:
+                rect = pygame.Rect(obstacle['x'] - obstacle['width']//2,
+                                   obstacle['y'] - obstacle['height']//2,
+                                   obstacle['width'], obstacle['height'])
+                if player_rect.colliderect(rect):
+                    break
+
+        store = [fresh_store()]
+
+        def update_store():
+            store[0].advance(7, 650)
+            store[0].overlaps(384, 472, 32, 56)
+
+        results[count] = {
+            'dicts_ms': time_frames(update_dicts, frames),
+            'store_ms': time_frames(update_store, frames),
+        }
+    return results
+
+
+def bench_startup(runs=5):
+    """Time to first frame: blocking on every asset versus the loading screen"""
+    blocking, loading = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        game = RetroRacer(music=False, engine_sound=False)
+        game.require_assets()
+        game.draw_simple_background()
+        game.draw_enhanced_start_screen()
+        game.present()
+        blocking.append((time.perf_counter() - start) * 1000.0)
+        game.assets.shutdown()
+
+        start = time.perf_counter()
+        game = RetroRacer(music=False, engine_sound=False)
+        game.draw_loading_screen()
+        game.present()
+        loading.append((time.perf_counter() - start) * 1000.0)
+        game.assets.shutdown()
+    return {'blocking_ms': min(blocking), 'first_frame_ms': min(loading)}
+
+
+def load_obstacles(game, count):
+    """Replace the game's obstacles with make_obstacles(count)"""
+    obstacles = make_obstacles(count)
+    game.obstacles.clear()
+    game.obstacles.spawn_many([o[3] for o in obstacles], [o[4] for o in obstacles],
+                              [TYPE_CODES[o[0]] for o in obstacles])
+    game.obstacles.sync_previous()
+
+
+def load_particles(game, count):
+    """Fill the game's particle pool with count long-lived crash particles"""
+    particles = game.particles
+    particles.clear()
+    particles.rng = np.random.default_rng(0)
+    while len(particles) < count:
+        particles.emit('crash', SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+                       count=min(400, count - len(particles)), spread=250)
+    # Never expire, so every timed frame draws the full count
+    particles.life[:count] = particles.max_life[:count] = 1e6
+
+
+def bench_suite(frames=100, repeats=5):
+    """Time each game hot path and full frame; returns {name: ms per call}"""
+    game = RetroRacer(seed=0, music=False, engine_sound=False)
+    game.require_assets()
+    game.dt = 1.0 / 60
+    results = {}
+
+    def record(name, draw):
+        results[name] = time_best(draw, frames, repeats)
+
+    # Hot paths in isolation
+    record('draw_simple_background', game.draw_simple_background)
+    record('draw_simple_road', game.draw_simple_road)
+    record('draw_backdrop', game.draw_backdrop)
+    for count in OBSTACLE_COUNTS:
+        load_obstacles(game, count)
+        record(f'draw_simple_obstacles_{count}', game.draw_simple_obstacles)
+        record(f'check_collisions_{count}', game.check_collisions)
+    load_particles(game, PARTICLE_COUNT)
+    record(f'draw_particles_{PARTICLE_COUNT}', lambda: game.particles.draw(game.screen))
+    record(f'update_particles_{PARTICLE_COUNT}', lambda: game.particles.update(game.dt))
+    game.particles.clear()
+    load_obstacles(game, 5)
+    record('draw_glowing_hud', game.draw_glowing_hud)
+    record('draw_enhanced_start_screen', game.draw_enhanced_start_screen)
+    bloom = Bloom()
+    record('bloom_pass', lambda: bloom.apply(game.screen))
+
+    # Sound generation: synthesis from scratch, and the cached path the game uses
+    def synthesize():
+        pygame.sndarray.make_sound(render_beep(880, 0.1, 0.3, SAMPLE_RATE))
+        pygame.sndarray.make_sound(render_engine(60, 0.5, 0.5, SAMPLE_RATE))
+
+    def cached_sounds():
+        SynthSounds.generate_beep(880, 0.1, 0.3)
+        SynthSounds.generate_engine_sound(60, 0.5, 0.5)
+
+    record('synth_sounds_render', synthesize)
+    record('synth_sounds_cached', cached_sounds)
+
+    # One streamed block of engine sound, sweeping through the speed range
+    voice = EngineVoice()
+    voice.level = 1.0
+    block = np.zeros((ENGINE_BLOCK_FRAMES, 2), dtype=np.int16)
+    speeds = itertools.cycle(np.arange(START_SPEED, MAX_SPEED + 0.5, 0.5))
+
+    def engine_block():
+        voice.speed = next(speeds)
+        voice.render(block)
+
+    record('engine_audio_block', engine_block)
+
+    # Full frames, as drawn by run() in each game state
+    def start_frame():
+        game.draw_simple_background()
+        game.draw_enhanced_start_screen()
+        game.start_button.draw(game.screen)
+        game.present()
+
+    def playing_frame():
+        game.draw_simple_background()
+        game.draw_playfield()
+        game.draw_simple_hud()
+        game.present()
+
+    def game_over_frame():
+        game.draw_simple_background()
+        game.draw_playfield()
+        game.draw_enhanced_game_over_screen()
+        game.restart_button.draw(game.screen)
+        game.quit_button.draw(game.screen)
+        game.present()
+
+    record('frame_start', start_frame)
+    for count in OBSTACLE_COUNTS:
+        load_obstacles(game, count)
+        record(f'frame_playing_{count}', playing_frame)
+    # The same playing frame with the pseudo-3D road
+    game.road = PerspectiveRoad((SCREEN_WIDTH, SCREEN_HEIGHT))
+    load_obstacles(game, 50)
+    record('draw_perspective_road', game.draw_perspective_road)
+    record('frame_playing_3d_50', playing_frame)
+    game.road = None
+
+    load_particles(game, PARTICLE_COUNT)
+    record(f'frame_particles_{PARTICLE_COUNT}', playing_frame)
+    game.particles.clear()
+    record('frame_game_over', game_over_frame)
+
+    # Drawing the playing frame at full and at a quarter of the pixels. The
+    # upscale in present() is left out: real displays do it on the renderer,
+    # the dummy video driver in software.
+    def draw_playing():
+        game.draw_simple_background()
+        game.draw_playfield()
+        game.draw_simple_hud()
+
+    load_obstacles(game, 50)
+    record('draw_playing_50', draw_playing)
+    # SDL cannot turn the open window into a SCALED one, so start a fresh display
+    pygame.display.quit()
+    pygame.display.init()
+    game = RetroRacer(seed=0, music=False, engine_sound=False, render_size=LOW_RENDER_SIZE)
+    game.require_assets()
+    game.dt = 1.0 / 60
+    load_obstacles(game, 50)
+    record('draw_playing_50_{}x{}'.format(*LOW_RENDER_SIZE), draw_playing)
+    return results
+
+
+def load_baseline(path):
+    """Read a saved baseline, or None when there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_baseline(path, results):
+    """Write suite results as the new baseline"""
+    with open(path, 'w') as f:
+        json.dump({'pygame': pygame.version.ver, 'python': sys.version.split()[0],
+                   'results': results}, f, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return [(name, baseline ms, current ms)] slower than the threshold allows"""
+    regressions = []
+    for name, ms in results.items():
+        reference = baseline.get(name)
+        if reference and ms > reference * (1.0 + threshold):
+            regressions.append((name, reference, ms))
+    return regressions
+
+
+def print_comparisons():
+    """Before/after timings for each rendering optimization"""
+
+    layers = bench_static_layers()
+    print("Static layers (background + road):")
+    print(f"  redraw every frame: {layers['uncached_ms']:8.3f} ms/frame")
+    print(f"  cached layers:      {layers['cached_ms']:8.3f} ms/frame")
+    print(f"  speedup:            {layers['uncached_ms'] / layers['cached_ms']:8.1f}x")
+
+    text = bench_glowing_text()
+    print("Glowing HUD text (changing score counter):")
+    print(f"  render every frame: {text['uncached_ms']:8.3f} ms/frame")
+    print(f"  glyph atlas:        {text['cached_ms']:8.3f} ms/frame")
+    print(f"  speedup:            {text['uncached_ms'] / text['cached_ms']:8.1f}x")
+    print(f"  cache hit rate:     {text['hit_rate'] * 100:8.1f}% ({text['entries']} entries)")
+
+
+    sprites = bench_obstacle_sprites()
+    print("Obstacle drawing (primitives vs sprite atlas):")
+    for count, timing in sprites.items():
+        print(f"  {count:4d} obstacles: {timing['primitives_ms']:8.3f} ms -> "
+              f"{timing['atlas_ms']:8.3f} ms "
+              f"({timing['primitives_ms'] / timing['atlas_ms']:.1f}x)")
+
+
+    startup = bench_startup()
+    print("Startup (construct the game and show a frame):")
+    print(f"  wait for all assets: {startup['blocking_ms']:8.3f} ms")
+    print(f"  loading screen:      {startup['first_frame_ms']:8.3f} ms")
+
+    store = bench_obstacle_store()
+    store_memory = obstacle_memory()
+    print("Obstacle update + collision (list of dicts vs SoA store):")
+    for count, timing in store.items():
+        print(f"  {count:5d} obstacles: {timing['dicts_ms']:8.3f} ms -> "
+              f"{timing['store_ms']:8.3f} ms "
+              f"({timing['dicts_ms'] / timing['store_ms']:.1f}x)")
+    print(f"  memory per obstacle: {store_memory['dict_bytes']:5d} B -> "
+          f"{store_memory['store_bytes']:5d} B")
+
+
+def main(argv=None):
+    """Run the benchmarks; returns 1 when the suite regressed past the threshold"""
+    parser = argparse.ArgumentParser(description="RETRO RACER rendering benchmarks")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="JSON baseline file")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="store this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument('--frames', type=int, default=100, help="calls per timing batch")
+    parser.add_argument('--suite-only', action='store_true',
+                        help="skip the before/after comparisons")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    print("🏁 RETRO RACER - Rendering Benchmarks")
+    print("=" * 50)
+    if not args.suite_only:
+        print_comparisons()
+
+    results = bench_suite(args.frames)
+    baseline = load_baseline(args.baseline)
+    print("Regression suite (ms per call, best of 5):")
+    for name, ms in results.items():
+        reference = baseline.get(name) if baseline else None
+        change = f"  ({(ms / reference - 1) * 100:+6.1f}%)" if reference else ""
+        print(f"  {name:28s} {ms:8.3f} ms{change}")
+    pygame.quit()
+
+    if args.update_baseline or baseline is None:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, reference, ms in regressions:
+        print(f"✗ {name}: {reference:.3f} ms -> {ms:.3f} ms "
+              f"exceeds the {args.threshold * 100:.0f}% threshold")
+    if regressions:
+        return 1
+    print(f"✓ no regressions beyond {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo difficulty analyzer for RETRO RACER
+
+Plays large numbers of headless games for every point of a grid of
+difficulty parameters, spread over all CPU cores with a process pool.
+Games are dealt out in chunks of seeds and results stream back as each
+chunk finishes, so progress (and a running estimate per parameter set)
+is visible long before the sweep completes.
+
+Every parameter set plays the same seeds, so differences between rows
+come from the parameters rather than from luck.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from sim_core import BASE_TICK_RATE, POLICIES, Difficulty, Simulation
+
+# Longest game played before it is cut off (five minutes)
+DEFAULT_MAX_TICKS = BASE_TICK_RATE * 60 * 5
+
+# Percentiles reported for each distribution
+PERCENTILES = (10, 50, 90)
+
+
+def play_game(difficulty, seed, policy, max_ticks=DEFAULT_MAX_TICKS):
+    """Play one game; returns (survival seconds, score, mean obstacles on screen)"""
+    sim = Simulation(seed, difficulty=difficulty)
+    obstacle_ticks = 0
+    while not sim.crashed and sim.tick < max_ticks:
+        sim.step(policy(sim))
+        obstacle_ticks += len(sim.obstacles)
+    return sim.time_elapsed, sim.score, obstacle_ticks / max(sim.tick, 1)
+
+
+def run_chunk(task):
+    """Pool worker: play one chunk of seeds for one parameter set"""
+    index, params, policy_name, seeds, max_ticks = task
+    difficulty = Difficulty(**params)
+    policy = POLICIES[policy_name]
+    return index, [play_game(difficulty, seed, policy, max_ticks) for seed in seeds]
+
+
+def parameter_grid(grid):
+    """Expand {name: [values]} into a list of parameter dicts"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def make_tasks(param_sets, policy_name, games, base_seed, chunk_size, max_ticks):
+    """Split every parameter set's games into chunks of seeds"""
+    tasks = []
+    for index, params in enumerate(param_sets):
+        for start in range(0, games, chunk_size):
+            seeds = range(base_seed + start, base_seed + min(start + chunk_size, games))
+            tasks.append((index, params, policy_name, list(seeds), max_ticks))
+    return tasks
+
+
+def summarize(values):
+    """Mean and percentiles of a distribution"""
+    values = np.asarray(values, dtype=float)
+    summary = {'mean': float(values.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}'] = float(value)
+    return summary
+
+
+def aggregate(param_sets, results):
+    """Build report rows from {index: [(survival, score, density), ...]}"""
+    rows = []
+    for index, params in enumerate(param_sets):
+        games = results.get(index, [])
+        if not games:
+            continue
+        survival, score, density = zip(*games)
+        rows.append({
+            'params': params,
+            'games': len(games),
+            'survival_s': summarize(survival),
+            'score': summarize(score),
+            'obstacle_density': summarize(density),
+        })
+    return rows
+
+
+def analyze(grid, policy_name='random', games=200, base_seed=0, chunk_size=25,
+            max_ticks=DEFAULT_MAX_TICKS, processes=None, progress=None):
+    """Run the sweep across a process pool and return the report rows
+
+    progress(done, total, index, chunk_results) is called as each chunk
+    arrives, in completion order.
+    """
+    param_sets = parameter_grid(grid)
+    tasks = make_tasks(param_sets, policy_name, games, base_seed, chunk_size, max_ticks)
+    results = {}
+    with multiprocessing.Pool(processes) as pool:
+        for done, (index, chunk) in enumerate(pool.imap_unordered(run_chunk, tasks), 1):
+            results.setdefault(index, []).extend(chunk)
+            if progress is not None:
+                progress(done, len(tasks), index, results[index])
+    return aggregate(param_sets, results)
+
+
+def format_params(params, names):
+    return " ".join(f"{name}={params[name]:g}" for name in names)
+
+
+def print_report(rows):
+    """Print one line per parameter set, easiest first"""
+    # Only show the parameters that differ between rows
+    names = [name for name in Difficulty.FIELDS
+             if len({row['params'][name] for row in rows}) > 1]
+    print(f"{'survival s (p10/p50/p90)':>26} {'score (p50/p90)':>16} {'obstacles':>9}  parameters")
+    for row in sorted(rows, key=lambda r: -r['survival_s']['p50']):
+        survival, score = row['survival_s'], row['score']
+        print(f"{survival['p10']:8.1f} {survival['p50']:8.1f} {survival['p90']:8.1f} "
+              f"{score['p50']:8.0f} {score['p90']:7.0f} "
+              f"{row['obstacle_density']['mean']:9.2f}  {format_params(row['params'], names)}")
+
+
+def parse_values(text):
+    """Comma-separated numbers, e.g. '20,30,40'"""
+    return [float(value) if '.' in value else int(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    """Sweep a grid of difficulty parameters from the command line"""
+    parser = argparse.ArgumentParser(description="Monte Carlo RETRO RACER difficulty analyzer")
+    defaults = Difficulty()
+    for name in Difficulty.FIELDS:
+        parser.add_argument('--' + name.replace('_', '-'), type=parse_values,
+                            default=[getattr(defaults, name)],
+                            help=f"comma-separated values (default {getattr(defaults, name)})")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--games', type=int, default=200, help="games per parameter set")
+    parser.add_argument('--seed', type=int, default=0, help="first seed; every set plays the same seeds")
+    parser.add_argument('--chunk-size', type=int, default=25, help="games per pool task")
+    parser.add_argument('--max-ticks', type=int, default=DEFAULT_MAX_TICKS,
+                        help="cut games off after this many ticks")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--json', metavar='FILE', help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    grid = {name: getattr(args, name) for name in Difficulty.FIELDS}
+    sets = len(parameter_grid(grid))
+    print(f"Sweeping {sets} parameter sets x {args.games} games "
+          f"on {args.processes or os.cpu_count()} processes ({args.policy} policy)")
+
+    def progress(done, total, index, games):
+        survival = np.median([game[0] for game in games])
+        print(f"  [{done}/{total}] set {index}: {len(games)} games, median survival {survival:.1f}s",
+              flush=True)
+
+    start = time.perf_counter()
+    rows = analyze(grid, args.policy, args.games, args.seed, args.chunk_size,
+                   args.max_ticks, args.processes, progress)
+    print(f"Finished in {time.perf_counter() - start:.1f}s")
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Dirty-rectangle display updates for RETRO RACER
+
+Draw routines report the rectangles they touch; present() pushes only
+those (plus last frame's, so vacated areas are repaired) with
+pygame.display.update(rects). When the dirty area passes a threshold,
+or after invalidate(), it falls back to a full flip.
+"""
+import pygame
+
+
+class DirtyRects:
+    """Collect the screen areas touched this frame and present them"""
+
+    def __init__(self, screen_size, full_threshold=0.5):
+        self.screen_rect = pygame.Rect((0, 0), screen_size)
+        self.full_threshold = full_threshold
+        self.rects = []
+        self.previous = []
+        self.full = True
+        self.full_flips = 0
+        self.partial_updates = 0
+        self.last_area = 0
+
+    def add(self, rect):
+        """Mark a rect as changed this frame; returns the rect"""
+        if rect is not None:
+            clipped = self.screen_rect.clip(rect)
+            if clipped.width and clipped.height:
+                self.rects.append(clipped)
+        return rect
+
+    def add_all(self, rects):
+        """Mark several rects as changed"""
+        for rect in rects:
+            self.add(rect)
+
+    def invalidate(self):
+        """Push the whole screen on the next present()"""
+        self.full = True
+
+    def merged(self):
+        """This frame's and last frame's rects with overlaps merged"""
+        merged = []
+        for rect in self.rects + self.previous:
+            rect = rect.copy()
+            # Absorb any already-merged rects this one overlaps
+            hits = rect.collidelistall(merged)
+            while hits:
+                for i in reversed(hits):
+                    rect.union_ip(merged.pop(i))
+                hits = rect.collidelistall(merged)
+            merged.append(rect)
+        return merged
+
+    def present(self):
+        """Update only the dirty areas, or flip when too much changed"""
+        rects = self.merged()
+        self.last_area = sum(rect.width * rect.height for rect in rects)
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        if self.full or self.last_area > screen_area * self.full_threshold:
+            pygame.display.flip()
+            self.full_flips += 1
+            self.full = False
+        elif rects:
+            pygame.display.update(rects)
+            self.partial_updates += 1
+        self.previous = self.rects
+        self.rects = []
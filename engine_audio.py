@@ -0,0 +1,167 @@
+"""
+Speed-tracking engine audio for RETRO RACER
+
+A WavetableBank holds one single-cycle engine waveform per whole car
+speed from 5 to 12, each pitched higher and brighter than the one
+before, built once with NumPy. An EngineVoice plays through the bank a
+block at a time: pitch and table position glide from the last block's
+speed to the current one, and neighbouring tables are crossfaded. Every
+intermediate lives in scratch arrays allocated for the first block, so
+steady-state rendering allocates nothing. Pair it with
+audio_stream.AudioStream to play it.
+"""
+import numpy as np
+
+from sim_core import MAX_SPEED, START_SPEED
+from synth import AMPLITUDE, SAMPLE_RATE
+
+# Samples per single-cycle table (a power of two, so phase * size stays below size)
+TABLE_SIZE = 2048
+
+# Fundamental at the slowest and the fastest speed
+IDLE_FREQ = 55.0
+TOP_FREQ = 150.0
+
+# Harmonics per table; the highest stays well under Nyquist at TOP_FREQ
+PARTIALS = 24
+
+# Harmonic rolloff exponent: dull at the slowest speed, bright at the fastest
+DULL_ROLLOFF = 2.2
+BRIGHT_ROLLOFF = 1.2
+
+# Extra weight on odd harmonics for a raspier exhaust note
+ODD_BOOST = 1.6
+
+# Frames per streamed block (about 93 ms), short enough to follow speed changes
+ENGINE_BLOCK_FRAMES = 2048
+
+ENGINE_VOLUME = 0.6
+
+
+class WavetableBank:
+    """Single-cycle engine waveforms, one per whole speed"""
+
+    def __init__(self, start_speed=START_SPEED, max_speed=MAX_SPEED, table_size=TABLE_SIZE):
+        self.start_speed = start_speed
+        self.table_size = table_size
+        self.count = int(max_speed - start_speed) + 1
+        ratio = np.linspace(0.0, 1.0, self.count)
+        self.frequencies = IDLE_FREQ + (TOP_FREQ - IDLE_FREQ) * ratio
+
+        # Weights per (table, harmonic), then one cycle of their sum per table
+        harmonic = np.arange(1, PARTIALS + 1)
+        rolloff = DULL_ROLLOFF + (BRIGHT_ROLLOFF - DULL_ROLLOFF) * ratio
+        weights = harmonic[None, :] ** -rolloff[:, None]
+        weights[:, ::2] *= ODD_BOOST
+        cycle = np.arange(table_size) / table_size
+        waves = weights @ np.sin(2 * np.pi * np.outer(harmonic, cycle))
+        waves /= np.abs(waves).max(axis=1, keepdims=True)
+
+        # Flat samples plus the slope to the next sample (wrapping), for linear interpolation
+        self.samples = np.ascontiguousarray(waves).ravel()
+        self.slopes = (np.roll(waves, -1, axis=1) - waves).ravel()
+
+    def position(self, speed):
+        """Fractional table index for a car speed"""
+        return min(max(speed - self.start_speed, 0.0), self.count - 1.0)
+
+    def read(self, offsets, fraction, out, scratch):
+        """Interpolated samples at flat offsets plus fraction, written into out"""
+        # mode='clip' lets take() write straight into out without a buffer
+        np.take(self.samples, offsets, out=out, mode='clip')
+        np.take(self.slopes, offsets, out=scratch, mode='clip')
+        scratch *= fraction
+        out += scratch
+        return out
+
+
+class EngineVoice:
+    """Continuous engine sound whose pitch and timbre follow the car speed
+
+    Set speed and level (0 silent to 1 full) from the game loop; render(out)
+    glides to them over the next block.
+    """
+
+    def __init__(self, bank=None, volume=ENGINE_VOLUME, sample_rate=SAMPLE_RATE):
+        self.bank = bank or WavetableBank()
+        self.volume = volume
+        self.sample_rate = sample_rate
+        self.speed = self.bank.start_speed
+        self.level = 0.0
+        # State carried from the end of the last block
+        self.position = self.bank.position(self.speed)
+        self.gain = 0.0
+        self.phase = 0.0
+        self.frames = 0
+
+    def allocate(self, frames):
+        """Scratch arrays for blocks of this many frames"""
+        self.frames = frames
+        # Glides reach their target on the last sample of the block
+        self.ramp = np.arange(1, frames + 1) / frames
+        self.positions = np.empty(frames)
+        self.increments = np.empty(frames)
+        self.cycles = np.empty(frames)
+        self.index = np.empty(frames, dtype=np.intp)
+        self.fraction = np.empty(frames)
+        self.offsets = np.empty(frames, dtype=np.intp)
+        self.blend = np.empty(frames)
+        self.wave = np.empty(frames)
+        self.upper = np.empty(frames)
+        self.scratch = np.empty(frames)
+
+    def glide(self, start, end, out):
+        """Linear ramp from start (exclusive) to end across the block"""
+        np.multiply(self.ramp, end - start, out=out)
+        out += start
+        return out
+
+    def render(self, out):
+        """Fill an int16 (frames, 2) array with the next block of engine sound"""
+        frames = len(out)
+        if frames != self.frames:
+            self.allocate(frames)
+        bank = self.bank
+        size = bank.table_size
+
+        target = bank.position(self.speed)
+        positions = self.glide(self.position, target, self.positions)
+        self.position = target
+
+        # Pitch follows the table position; integrate it into the oscillator phase
+        step = (bank.frequencies[-1] - bank.frequencies[0]) / max(bank.count - 1, 1)
+        np.multiply(positions, step / self.sample_rate, out=self.increments)
+        self.increments += bank.frequencies[0] / self.sample_rate
+        cycles = np.cumsum(self.increments, out=self.cycles)
+        cycles += self.phase
+        self.phase = cycles[-1] % 1.0
+        np.remainder(cycles, 1.0, out=cycles)
+        cycles *= size
+        # Floors stay in float arrays: mixing int and float operands would allocate
+        np.floor(cycles, out=self.fraction)
+        np.copyto(self.index, self.fraction, casting='unsafe')
+        np.subtract(cycles, self.fraction, out=self.fraction)
+
+        # Crossfade the two tables either side of the position
+        lower = np.floor(positions, out=self.blend)
+        np.minimum(lower, max(bank.count - 2, 0), out=lower)
+        offsets = self.offsets
+        np.copyto(offsets, lower, casting='unsafe')
+        np.subtract(positions, lower, out=self.blend)
+        offsets *= size
+        offsets += self.index
+        wave = bank.read(offsets, self.fraction, self.wave, self.scratch)
+        if bank.count > 1:
+            offsets += size
+            upper = bank.read(offsets, self.fraction, self.upper, self.scratch)
+            upper -= wave
+            upper *= self.blend
+            wave += upper
+
+        gain = self.glide(self.gain, self.level, self.scratch)
+        self.gain = self.level
+        gain *= AMPLITUDE * 2 * self.volume
+        wave *= gain
+        np.copyto(out[:, 0], wave, casting='unsafe')
+        np.copyto(out[:, 1], wave, casting='unsafe')
+        return out
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Load test for the RETRO RACER ghost relay
+
+Runs many simulated racers from one asyncio loop, in rooms of a few cars
+each. They connect to a running ghost_relay, or to one started in this
+process with --local. Each racer weaves across the road, sends snapshots
+at SEND_RATE the way the game does, and pings the relay once a second.
+
+The report gives:
+- bandwidth per client, in each direction
+- ping round trips
+- relay latency: how long a snapshot takes from being sent to reaching
+  the other racers in its room, timed on one clock in this process
+"""
+import argparse
+import asyncio
+import math
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from ghost_net import (CAR_ID, DEFAULT_PORT, LENGTH, MSG_HELLO, MSG_KEYFRAME, MSG_PING,
+                       MSG_SNAPSHOT, MSG_WELCOME, PING, SEED, SEND_RATE, STATE_RACING, ZERO,
+                       decode_delta, encode_delta, frame, quantize, read_message)
+from ghost_relay import GhostRelay
+
+# Percentiles reported for latencies
+PERCENTILES = (50, 90, 99)
+
+# Recent snapshot send times kept per racer, for matching arrivals
+SENT_HISTORY = 8
+
+
+class LoadClient:
+    """One simulated racer"""
+
+    def __init__(self, test, seed, index):
+        self.test = test
+        self.seed = seed
+        self.index = index
+        self.id = None
+        self.bases = {}
+        self.sent_times = deque(maxlen=SENT_HISTORY)  # (time_ms, perf_counter)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.snapshots_received = 0
+
+    def send(self, writer, data):
+        writer.write(data)
+        self.bytes_sent += len(data)
+
+    async def run(self, host, port, seconds):
+        reader, writer = await asyncio.open_connection(host, port)
+        self.send(writer, frame(MSG_HELLO, SEED.pack(self.seed)))
+        receiving = asyncio.create_task(self.receive(reader))
+        interval = 1.0 / SEND_RATE
+        start = time.perf_counter()
+        sent = ZERO
+        beat = 0
+        try:
+            while beat * interval < seconds:
+                t = beat * interval
+                x = 400 + 80 * math.sin(t * 1.7 + self.index)
+                snapshot = quantize(t, x, t * 420, int(t * 60), STATE_RACING)
+                self.send(writer, frame(MSG_SNAPSHOT, encode_delta(sent, snapshot)))
+                self.sent_times.append((snapshot[0], time.perf_counter()))
+                sent = snapshot
+                if beat % SEND_RATE == 0:
+                    self.send(writer, frame(MSG_PING, PING.pack(time.perf_counter())))
+                await writer.drain()
+                beat += 1
+                await asyncio.sleep(max(start + beat * interval - time.perf_counter(), 0))
+            # Let the last snapshots arrive before hanging up
+            await asyncio.sleep(0.2)
+        finally:
+            receiving.cancel()
+            writer.close()
+
+    async def receive(self, reader):
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                now = time.perf_counter()
+                self.bytes_received += LENGTH.size + 1 + len(payload)
+                if kind == MSG_WELCOME:
+                    self.id = CAR_ID.unpack(payload)[0]
+                    self.test.register(self)
+                elif kind in (MSG_SNAPSHOT, MSG_KEYFRAME):
+                    sender = CAR_ID.unpack_from(payload)[0]
+                    base = ZERO if kind == MSG_KEYFRAME else self.bases.get(sender, ZERO)
+                    snapshot, _ = decode_delta(base, payload, CAR_ID.size)
+                    self.bases[sender] = snapshot
+                    self.snapshots_received += 1
+                    self.test.arrived(self.seed, sender, snapshot[0], now)
+                elif kind == MSG_PING:
+                    self.test.rtts.append(now - PING.unpack(payload)[0])
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+
+
+class LoadTest:
+    """Racers spread over rooms, with the timings they collect"""
+
+    def __init__(self, clients, room_size, base_seed=1000):
+        self.racers = [LoadClient(self, base_seed + i // room_size, i) for i in range(clients)]
+        self.by_id = {}
+        self.rtts = []
+        self.latencies = []
+
+    def register(self, racer):
+        self.by_id[racer.seed, racer.id] = racer
+
+    def arrived(self, seed, sender, time_ms, now):
+        racer = self.by_id.get((seed, sender))
+        if racer is None:
+            return
+        for sent_ms, sent_at in racer.sent_times:
+            if sent_ms == time_ms:
+                self.latencies.append(now - sent_at)
+                return
+
+    async def run(self, host, port, seconds, connect_rate=200):
+        """Connect every racer (connect_rate per second) and race for seconds"""
+        tasks = []
+        for racer in self.racers:
+            tasks.append(asyncio.create_task(racer.run(host, port, seconds)))
+            await asyncio.sleep(1.0 / connect_rate)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return [result for result in results if isinstance(result, Exception)]
+
+    def report(self, seconds, errors, relay=None):
+        up = np.array([racer.bytes_sent for racer in self.racers]) / seconds
+        down = np.array([racer.bytes_received for racer in self.racers]) / seconds
+
+        def milliseconds(values):
+            if not values:
+                return {f'p{p}': None for p in PERCENTILES}
+            return {f'p{p}': float(np.percentile(values, p) * 1000) for p in PERCENTILES}
+
+        report = {
+            'clients': len(self.racers),
+            'errors': len(errors),
+            'seconds': seconds,
+            'up_bytes_per_s': float(up.mean()),
+            'down_bytes_per_s': float(down.mean()),
+            'snapshots_received': sum(racer.snapshots_received for racer in self.racers),
+            'ping_ms': milliseconds(self.rtts),
+            'relay_latency_ms': milliseconds(self.latencies),
+        }
+        if relay is not None:
+            report['relay'] = relay.stats()
+        return report
+
+
+def run_load_test(clients=200, room_size=4, seconds=5.0, host='127.0.0.1', port=DEFAULT_PORT,
+                  local=False):
+    """Run a load test; with local, against a relay on this process's loop"""
+    async def main():
+        relay = None
+        target_port = port
+        if local:
+            relay = GhostRelay()
+            target_port = await relay.start(host, 0)
+        test = LoadTest(clients, room_size)
+        errors = await test.run(host, target_port, seconds)
+        report = test.report(seconds, errors, relay)
+        if relay is not None:
+            relay.server.close()
+        return report
+
+    return asyncio.run(main())
+
+
+def main(argv=None):
+    """Run the load test from the command line"""
+    parser = argparse.ArgumentParser(description="Load test for the RETRO RACER ghost relay")
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--room-size', type=int, default=4, help="racers per seed")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--local', action='store_true',
+                        help="start a relay in this process instead of using a running one")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.clients, args.room_size, args.seconds, args.host, args.port,
+                           args.local)
+    ping, latency = report['ping_ms'], report['relay_latency_ms']
+    print(f"{report['clients']} clients in rooms of {args.room_size} for {args.seconds:g}s "
+          f"({report['errors']} failed)")
+    print(f"  per client: up {report['up_bytes_per_s']:.0f} B/s, "
+          f"down {report['down_bytes_per_s']:.0f} B/s")
+    print(f"  snapshots delivered: {report['snapshots_received']}")
+    for name, values in (("ping", ping), ("relay latency", latency)):
+        if values['p50'] is not None:
+            print(f"  {name}: " + ", ".join(f"{key} {value:.2f} ms" for key, value in values.items()))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
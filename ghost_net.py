@@ -0,0 +1,308 @@
+"""
+Ghost-race networking for RETRO RACER
+
+Racers playing the same seed join that seed's room on a ghost_relay
+server and stream their car to it. The relay forwards every car to the
+rest of the room, where it is drawn as a ghost that never collides.
+
+Every message is a 2-byte big-endian length followed by a payload whose
+first byte is the message type. A car snapshot holds the race time,
+player x, distance, score and state. It is quantized to integers (x to a
+quarter pixel, time to milliseconds) and sent as a delta against the
+previous snapshot on the same connection: a byte of changed-field flags,
+then one zigzag varint per changed field. TCP keeps messages in order,
+so both ends always agree on the base. A fresh base is sent as a
+keyframe, which is a delta from all zeros. A snapshot is usually 6 to 9
+bytes on the wire.
+
+GhostClient runs its connection on an asyncio loop in a background
+thread. The game only calls publish() with its latest state and ghosts()
+for the other cars, each interpolated a short delay behind its newest
+snapshot, and neither waits on the network. A car that stops updating
+is dropped after GHOST_TIMEOUT even if its departure never arrives. This
+module does not import pygame.
+"""
+import asyncio
+import struct
+import threading
+import time
+from collections import deque
+
+DEFAULT_PORT = 8765
+
+# Snapshots sent per second, and how far behind the newest snapshot ghosts
+# are drawn (two send intervals, so one late snapshot does not stall them)
+SEND_RATE = 20
+INTERP_DELAY = 2.0 / SEND_RATE
+
+# Snapshots kept per remote car
+HISTORY = 16
+
+# Seconds between snapshots of an unchanged car, so others know it is
+# still there, and seconds without one after which its ghost is dropped
+HEARTBEAT_INTERVAL = 1.0
+GHOST_TIMEOUT = 3.0
+
+# Quantization steps per pixel of player x
+X_SCALE = 4
+
+# Message types
+MSG_HELLO = ord('H')     # client: room seed
+MSG_WELCOME = ord('W')   # relay: the client's id in its room
+MSG_SNAPSHOT = ord('S')  # client: delta; relay: sender id + delta
+MSG_KEYFRAME = ord('K')  # relay: sender id + snapshot as a delta from ZERO
+MSG_LEAVE = ord('L')     # relay: sender id
+MSG_PING = ord('P')      # echoed back unchanged
+
+# Car states
+STATE_WAITING = 0
+STATE_RACING = 1
+STATE_CRASHED = 2
+
+# Snapshot fields, in order; a snapshot is a tuple of ints
+FIELDS = ('time_ms', 'x', 'distance', 'score', 'state')
+ZERO = (0,) * len(FIELDS)
+
+LENGTH = struct.Struct('>H')
+SEED = struct.Struct('>Q')
+CAR_ID = struct.Struct('>H')
+PING = struct.Struct('>d')
+
+
+def quantize(time_elapsed, x, distance, score, state):
+    """Snapshot tuple for a car's state"""
+    return (int(round(time_elapsed * 1000)), int(round(x * X_SCALE)), int(distance),
+            int(score), int(state))
+
+
+def put_varint(out, value):
+    """Append a signed integer to out as a zigzag varint"""
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def get_varint(data, offset):
+    """Read a zigzag varint; returns (value, offset after it)"""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def encode_delta(previous, current):
+    """Changed-field flags, then the change in each flagged field"""
+    out = bytearray(1)
+    flags = 0
+    for i, (old, new) in enumerate(zip(previous, current)):
+        if new != old:
+            flags |= 1 << i
+            put_varint(out, new - old)
+    out[0] = flags
+    return bytes(out)
+
+
+def decode_delta(previous, data, offset=0):
+    """Apply a delta to previous; returns (snapshot, offset after it)"""
+    flags = data[offset]
+    offset += 1
+    snapshot = list(previous)
+    for i in range(len(FIELDS)):
+        if flags & (1 << i):
+            change, offset = get_varint(data, offset)
+            snapshot[i] += change
+    return tuple(snapshot), offset
+
+
+def frame(kind, payload=b''):
+    """One length-prefixed message"""
+    return LENGTH.pack(len(payload) + 1) + bytes((kind,)) + payload
+
+
+async def read_message(reader):
+    """Read one message; returns (type, payload)"""
+    header = await reader.readexactly(LENGTH.size)
+    body = await reader.readexactly(LENGTH.unpack(header)[0])
+    return body[0], body[1:]
+
+
+class RemoteCar:
+    """Recent snapshots of one remote car, for drawing it smoothly"""
+
+    def __init__(self):
+        self.snapshots = deque(maxlen=HISTORY)  # (sender seconds, snapshot)
+        # Local time of the newest snapshot
+        self.updated = None
+        # Local clock minus the sender's race clock, from the least delayed snapshot
+        self.offset = None
+
+    def add(self, snapshot, now):
+        sender_time = snapshot[0] / 1000.0
+        if self.snapshots and sender_time < self.snapshots[-1][0]:
+            # The sender started a new run
+            self.snapshots.clear()
+            self.offset = None
+        if self.offset is None or now - sender_time < self.offset:
+            self.offset = now - sender_time
+        self.snapshots.append((sender_time, snapshot))
+        self.updated = now
+
+    def sample(self, now, delay=INTERP_DELAY):
+        """(x, distance, score, state) interpolated delay seconds behind the newest data"""
+        if not self.snapshots:
+            return None
+        target = now - self.offset - delay
+        older = self.snapshots[0]
+        for newer in self.snapshots:
+            if newer[0] >= target:
+                break
+            older = newer
+        else:
+            newer = older
+        (t0, a), (t1, b) = older, newer
+        blend = min(max((target - t0) / (t1 - t0), 0.0), 1.0) if t1 > t0 else 1.0
+        x = (a[1] + (b[1] - a[1]) * blend) / X_SCALE
+        distance = a[2] + (b[2] - a[2]) * blend
+        return x, distance, a[3], a[4]
+
+
+class GhostClient:
+    """Connection to a ghost relay room, run on a background thread"""
+
+    def __init__(self, host, port=DEFAULT_PORT, seed=0, send_rate=SEND_RATE,
+                 interp_delay=INTERP_DELAY, timeout=GHOST_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.seed = seed % (1 << 64)
+        self.send_rate = send_rate
+        self.interp_delay = interp_delay
+        self.timeout = timeout
+        self.id = None
+        # Latest local snapshot; publish() replaces it whole
+        self.local = None
+        self.remotes = {}
+        # Newest snapshot per car id, the base for its next delta; kept when
+        # a silent car's ghost expires, so its deltas still decode if it resumes
+        self.bases = {}
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.error = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+
+    def start(self):
+        """Connect in the background; returns immediately"""
+        self.thread = threading.Thread(target=self.run_loop, name='ghost-net', daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        """Disconnect and wait for the network thread to finish"""
+        if self.loop is not None and self.stopping is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.stopping.set)
+            except RuntimeError:
+                pass  # the loop has already finished
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def publish(self, time_elapsed, x, distance, score, state):
+        """Set the local car's state; the network thread sends it on its next beat"""
+        self.local = quantize(time_elapsed, x, distance, score, state)
+
+    def ghosts(self, now=None):
+        """Other cars in the room as (id, x, distance, score, state), interpolated"""
+        now = time.perf_counter() if now is None else now
+        ghosts = []
+        with self.lock:
+            for car_id, car in list(self.remotes.items()):
+                if now - car.updated > self.timeout:
+                    # Gone quiet without a departure; it returns with its next snapshot
+                    del self.remotes[car_id]
+                    continue
+                sample = car.sample(now, self.interp_delay)
+                if sample is not None:
+                    ghosts.append((car_id,) + sample)
+        return ghosts
+
+    def run_loop(self):
+        try:
+            asyncio.run(self.session())
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.error = e
+
+    async def session(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        hello = frame(MSG_HELLO, SEED.pack(self.seed))
+        writer.write(hello)
+        self.bytes_sent += len(hello)
+        receiving = asyncio.create_task(self.receive(reader))
+        try:
+            await self.send_snapshots(writer)
+        finally:
+            receiving.cancel()
+            writer.close()
+
+    async def send_snapshots(self, writer):
+        """Send the local car at send_rate, as deltas, until stopped"""
+        sent = ZERO
+        sent_at = 0.0
+        interval = 1.0 / self.send_rate
+        while not self.stopping.is_set():
+            current = self.local
+            now = time.perf_counter()
+            if current is not None and (current != sent or now - sent_at >= HEARTBEAT_INTERVAL):
+                # An unchanged car goes out as an empty delta (4 bytes on the wire)
+                data = frame(MSG_SNAPSHOT, encode_delta(sent, current))
+                writer.write(data)
+                self.bytes_sent += len(data)
+                sent, sent_at = current, now
+                await writer.drain()
+            try:
+                await asyncio.wait_for(self.stopping.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def receive(self, reader):
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                self.bytes_received += LENGTH.size + 1 + len(payload)
+                self.handle(kind, payload, time.perf_counter())
+        except (OSError, asyncio.IncompleteReadError) as e:
+            self.error = e
+            self.stopping.set()
+
+    def handle(self, kind, payload, now):
+        """Apply one message from the relay"""
+        if kind == MSG_WELCOME:
+            self.id = CAR_ID.unpack(payload)[0]
+            self.connected.set()
+            return
+        if kind not in (MSG_SNAPSHOT, MSG_KEYFRAME, MSG_LEAVE):
+            return
+        car_id = CAR_ID.unpack_from(payload)[0]
+        with self.lock:
+            if kind == MSG_LEAVE:
+                self.remotes.pop(car_id, None)
+                self.bases.pop(car_id, None)
+                return
+            base = ZERO if kind == MSG_KEYFRAME else self.bases.get(car_id, ZERO)
+            snapshot, _ = decode_delta(base, payload, CAR_ID.size)
+            self.bases[car_id] = snapshot
+            car = self.remotes.get(car_id)
+            if car is None:
+                car = self.remotes[car_id] = RemoteCar()
+            car.add(snapshot, now)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Ghost-race relay server for RETRO RACER
+
+A single asyncio process relays car snapshots between the clients in
+each room, where a room holds everyone racing the same seed. The relay
+keeps each car's current snapshot and forwards the sender's delta bytes
+to the rest of the room unchanged, prefixed with the sender's id. A
+client that joins is sent a keyframe for every car already in the room.
+
+Writes never wait on a slow receiver. Once a receiver has more than
+max_buffer bytes queued, its updates are skipped. When it catches up it
+gets keyframes for every car, which replace the deltas it missed. One
+process comfortably serves hundreds of sessions; see ghost_load.py.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+from ghost_net import (CAR_ID, DEFAULT_PORT, MSG_HELLO, MSG_KEYFRAME, MSG_LEAVE, MSG_PING,
+                       MSG_SNAPSHOT, MSG_WELCOME, SEED, ZERO, decode_delta, encode_delta,
+                       frame, read_message)
+
+# Bytes queued for one client before its updates are skipped
+MAX_BUFFER = 16384
+
+# Seconds to wait for a new connection's hello
+HELLO_TIMEOUT = 5.0
+
+
+class Session:
+    """One connected client"""
+
+    def __init__(self, writer, room, car_id):
+        self.writer = writer
+        self.room = room
+        self.id = car_id
+        self.snapshot = ZERO
+        # Skipped updates while its buffer was full; keyframes are owed
+        self.behind = False
+
+
+class Room:
+    """Everyone racing one seed"""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.sessions = {}
+        self.next_id = 1
+
+    def new_id(self):
+        """Next car id not in use in this room"""
+        while True:
+            car_id = self.next_id
+            self.next_id = self.next_id % 0xFFFF + 1
+            if car_id not in self.sessions:
+                return car_id
+
+
+class GhostRelay:
+    """Rooms of ghost racers, served from one asyncio loop"""
+
+    def __init__(self, max_buffer=MAX_BUFFER):
+        self.max_buffer = max_buffer
+        self.rooms = {}
+        self.server = None
+        self.loop = None
+        self.sessions = 0
+        self.messages_in = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.skipped = 0
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Start listening; returns the port bound (useful with port 0)"""
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    def start_thread(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Serve from a daemon thread with its own loop; returns the port bound"""
+        ready = threading.Event()
+        bound = []
+
+        async def serve():
+            bound.append(await self.start(host, port))
+            ready.set()
+            await self.server.serve_forever()
+
+        def run():
+            try:
+                asyncio.run(serve())
+            except asyncio.CancelledError:
+                pass
+
+        threading.Thread(target=run, name='ghost-relay', daemon=True).start()
+        ready.wait()
+        return bound[0]
+
+    def stop(self):
+        """Stop accepting connections (from any thread)"""
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    async def handle(self, reader, writer):
+        try:
+            kind, payload = await asyncio.wait_for(read_message(reader), HELLO_TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            kind = payload = None
+        if kind != MSG_HELLO or len(payload) != SEED.size:
+            writer.close()
+            return
+
+        seed = SEED.unpack(payload)[0]
+        room = self.rooms.get(seed)
+        if room is None:
+            room = self.rooms[seed] = Room(seed)
+        session = Session(writer, room, room.new_id())
+        self.write(session, frame(MSG_WELCOME, CAR_ID.pack(session.id)))
+        self.send_keyframes(session)
+        room.sessions[session.id] = session
+        self.sessions += 1
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                self.messages_in += 1
+                self.bytes_in += 3 + len(payload)
+                if kind == MSG_SNAPSHOT:
+                    session.snapshot, _ = decode_delta(session.snapshot, payload)
+                    self.broadcast(session, frame(MSG_SNAPSHOT, CAR_ID.pack(session.id) + payload))
+                elif kind == MSG_PING:
+                    self.write(session, frame(MSG_PING, payload))
+        except (OSError, asyncio.IncompleteReadError, IndexError):
+            pass
+        finally:
+            del room.sessions[session.id]
+            self.sessions -= 1
+            if room.sessions:
+                self.broadcast(session, frame(MSG_LEAVE, CAR_ID.pack(session.id)), droppable=False)
+            else:
+                del self.rooms[seed]
+            writer.close()
+
+    def write(self, session, data):
+        session.writer.write(data)
+        self.bytes_out += len(data)
+
+    def send_keyframes(self, session):
+        """Every other car in the session's room, as a fresh delta base"""
+        for other in session.room.sessions.values():
+            # Cars that have not sent a snapshot yet have nothing to show
+            if other is not session and other.snapshot != ZERO:
+                keyframe = encode_delta(ZERO, other.snapshot)
+                self.write(session, frame(MSG_KEYFRAME, CAR_ID.pack(other.id) + keyframe))
+
+    def broadcast(self, sender, data, droppable=True):
+        """Send data to everyone else in the sender's room
+
+        Snapshots are droppable: keyframes replace them later. A departure
+        is not, since keyframes only describe the cars still in the room.
+        """
+        for session in sender.room.sessions.values():
+            if session is sender:
+                continue
+            transport = session.writer.transport
+            if transport.is_closing():
+                continue
+            if not droppable:
+                self.write(session, data)
+            elif transport.get_write_buffer_size() > self.max_buffer:
+                session.behind = True
+                self.skipped += 1
+            elif session.behind:
+                # The keyframes include this update
+                session.behind = False
+                self.send_keyframes(session)
+            else:
+                self.write(session, data)
+
+    def stats(self):
+        return {
+            'sessions': self.sessions,
+            'rooms': len(self.rooms),
+            'messages_in': self.messages_in,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'skipped': self.skipped,
+        }
+
+
+async def serve(host, port, stats_interval):
+    relay = GhostRelay()
+    port = await relay.start(host, port)
+    print(f"Ghost relay listening on {host}:{port}")
+    last, last_time = relay.stats(), time.perf_counter()
+    while True:
+        await asyncio.sleep(stats_interval)
+        stats, now = relay.stats(), time.perf_counter()
+        elapsed = now - last_time
+        print(f"{stats['sessions']} sessions in {stats['rooms']} rooms, "
+              f"in {(stats['bytes_in'] - last['bytes_in']) / elapsed / 1024:.1f} KB/s, "
+              f"out {(stats['bytes_out'] - last['bytes_out']) / elapsed / 1024:.1f} KB/s, "
+              f"{stats['skipped']} skipped", flush=True)
+        last, last_time = stats, now
+
+
+def main(argv=None):
+    """Run the relay from the command line"""
+    parser = argparse.ArgumentParser(description="RETRO RACER ghost-race relay")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help="seconds between traffic reports")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Glow effects for RETRO RACER
+
+GlowCache keeps the translucent pieces of the neon look - button halos
+and HUD panels with their glowing borders - pre-rendered, one Surface per
+shape and color, so drawing them allocates nothing and costs one blit.
+Animated intensity is applied with the Surface's alpha at blit time.
+
+Bloom is an optional screen-space pass: the frame is shrunk, everything
+above a brightness threshold is kept, blurred with a separable kernel in
+NumPy at the reduced resolution, scaled back up and added onto the frame.
+All of its Surfaces and arrays are allocated on the first frame and
+reused after that.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from profiler import profiler
+
+# Button halo: layers of this many pixels each, strongest nearest the button
+HALO_LAYERS = 3
+HALO_SPREAD = 4
+HALO_ALPHA = 100
+
+# HUD panel fill alpha, and glowing border rings from the panel edge outwards
+PANEL_ALPHA = 100
+PANEL_BORDER = 3
+
+# Bloom defaults: brightness a channel must pass, shrink factor, blur
+# radius at the reduced size and how strongly the glow is added back
+BLOOM_THRESHOLD = 160
+BLOOM_DOWNSAMPLE = 8
+BLOOM_RADIUS = 2
+BLOOM_STRENGTH = 0.8
+
+
+class GlowCache:
+    """Bounded cache of pre-rendered halos and panels"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.builds = 0
+
+    def lookup(self, key, build):
+        surface = self.entries.get(key)
+        if surface is None:
+            profiler.count('surfaces')
+            self.builds += 1
+            surface = self.entries[key] = build()
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface
+
+    def halo(self, size, color):
+        """Glow around a size-sized rect, as full-intensity nested layers"""
+        return self.lookup(('halo', tuple(size), tuple(color)),
+                           lambda: render_halo(size, color))
+
+    def panel(self, size, color, border_color):
+        """Translucent panel with a solid glowing border around it"""
+        return self.lookup(('panel', tuple(size), tuple(color), tuple(border_color)),
+                           lambda: render_panel(size, color, border_color))
+
+    def draw_halo(self, target, rect, color, intensity):
+        """Blit the halo around rect at an intensity from 0 to 1; returns its Rect"""
+        surface = self.halo(rect.size, color)
+        surface.set_alpha(int(255 * intensity))
+        margin = HALO_LAYERS * HALO_SPREAD // 2
+        return target.blit(surface, (rect.x - margin, rect.y - margin))
+
+    def draw_panel(self, target, rect, color, border_color):
+        """Blit a HUD panel over rect; returns the Rect touched"""
+        surface = self.panel(rect.size, color, border_color)
+        outset = PANEL_BORDER - 1
+        return target.blit(surface, (rect.x - outset, rect.y - outset))
+
+
+def render_halo(size, color):
+    """Stack HALO_LAYERS translucent rects, each HALO_SPREAD pixels smaller"""
+    margin = HALO_LAYERS * HALO_SPREAD // 2
+    surface = pygame.Surface((size[0] + margin * 2, size[1] + margin * 2), pygame.SRCALPHA)
+    # Transparent but already the glow color, so blending never darkens it
+    surface.fill((*color, 0))
+    layer = pygame.Surface(surface.get_size())
+    layer.fill(color)
+    for i in range(HALO_LAYERS, 0, -1):
+        inset = margin - i * HALO_SPREAD // 2
+        layer.set_alpha(HALO_ALPHA // (i + 1))
+        area = pygame.Rect(inset, inset, size[0] + i * HALO_SPREAD, size[1] + i * HALO_SPREAD)
+        surface.blit(layer, area, ((0, 0), area.size))
+    return surface
+
+
+def render_panel(size, color, border_color):
+    """Panel fill at PANEL_ALPHA inside PANEL_BORDER one-pixel border rings"""
+    outset = PANEL_BORDER - 1
+    surface = pygame.Surface((size[0] + outset * 2, size[1] + outset * 2), pygame.SRCALPHA)
+    inner = pygame.Rect(outset, outset, *size)
+    surface.fill((*color, PANEL_ALPHA), inner)
+    for i in range(PANEL_BORDER):
+        pygame.draw.rect(surface, border_color, inner.inflate(i * 2, i * 2), 1)
+    return surface
+
+
+def blur_weights(radius, gain=1.0):
+    """Normalized Gaussian taps for offsets 0..radius, scaled by gain"""
+    offsets = np.arange(radius + 1)
+    weights = np.exp(-0.5 * (offsets / max(radius / 2.0, 0.5)) ** 2)
+    weights /= weights[0] + 2 * weights[1:].sum()
+    # float32 like the light buffers, so scaling them needs no temporary
+    return (weights * gain).astype(np.float32)
+
+
+class Bloom:
+    """Threshold, downsample, separable blur and additive composite"""
+
+    def __init__(self, threshold=BLOOM_THRESHOLD, downsample=BLOOM_DOWNSAMPLE,
+                 radius=BLOOM_RADIUS, strength=BLOOM_STRENGTH):
+        self.threshold = threshold
+        self.downsample = downsample
+        self.radius = radius
+        # Thresholded values are stretched back to the full range, then scaled
+        self.weights = blur_weights(radius, strength * 255.0 / (255 - threshold))
+        self.size = None
+
+    def allocate(self, surface):
+        """Buffers matching surface's size and pixel format"""
+        self.size = width, height = surface.get_size()
+        factor = self.downsample
+        small = (max(width // factor, 1), max(height // factor, 1))
+        profiler.count('surfaces', 3)
+        # A nearest-neighbour halving first keeps the smooth scale cheap
+        self.half = pygame.Surface((max(width // 2, 1), max(height // 2, 1)), 0, surface)
+        self.small = pygame.Surface(small, 0, surface)
+        self.glow = pygame.Surface(self.size, 0, surface)
+
+        # Light buffers in surfarray's (x, y, channel) order with radius
+        # pixels of black around them. Both blur passes are then shifts of
+        # the flat arrays: NumPy handles those without the temporary buffers
+        # strided slices need, and taps past an edge land on the black border.
+        pad = self.radius
+        shape = (small[0] + pad * 2, small[1] + pad * 2, 3)
+        self.light = np.zeros(shape, dtype=np.float32)
+        self.blurred = np.zeros(shape, dtype=np.float32)
+        self.result = np.zeros(shape, dtype=np.float32)
+        self.scratch = np.zeros(self.light.size, dtype=np.float32)
+        inner = (slice(pad, pad + small[0]), slice(pad, pad + small[1]))
+        self.light_inner = self.light[inner]
+        self.result_inner = self.result[inner]
+        # Flat distance between neighbouring pixels along x and along y
+        self.strides = (shape[1] * 3, 3)
+
+    def blur_flat(self, source, out, stride):
+        """Symmetric blur of flat source into out, taps stride elements apart"""
+        np.multiply(source, self.weights[0], out=out)
+        length = len(source)
+        for k, weight in enumerate(self.weights[1:], 1):
+            shift = k * stride
+            if 2 * shift >= length:
+                break
+            scratch = self.scratch[shift:length - shift]
+            np.add(source[:length - 2 * shift], source[2 * shift:], out=scratch)
+            scratch *= weight
+            out[shift:length - shift] += scratch
+        return out
+
+    def apply(self, surface):
+        """Add the bloom of surface's bright areas onto it; returns the Rect changed"""
+        if surface.get_size() != self.size:
+            self.allocate(surface)
+        pygame.transform.scale(surface, self.half.get_size(), self.half)
+        pygame.transform.smoothscale(self.half, self.small.get_size(), self.small)
+
+        pixels = pygame.surfarray.pixels3d(self.small)
+        try:
+            np.copyto(self.light_inner, pixels)
+            light = self.light.reshape(-1)
+            light -= self.threshold
+            np.maximum(light, 0, out=light)
+            # Along x first: the black rows above and below stay black for the y pass
+            blurred = self.blur_flat(light, self.blurred.reshape(-1), self.strides[0])
+            result = self.blur_flat(blurred, self.result.reshape(-1), self.strides[1])
+            np.minimum(result, 255, out=result)
+            np.copyto(pixels, self.result_inner, casting='unsafe')
+        finally:
+            # Release the surface lock before it is scaled
+            del pixels
+
+        pygame.transform.smoothscale(self.small, self.size, self.glow)
+        return surface.blit(self.glow, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+
+_shared_glow = None
+
+
+def shared_glow_cache():
+    """Return the process-wide glow cache"""
+    global _shared_glow
+    if _shared_glow is None:
+        _shared_glow = GlowCache()
+    return _shared_glow
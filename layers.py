@@ -0,0 +1,134 @@
+"""
+Cached static-layer compositor for RETRO RACER
+
+Static layers (the background gradient, the road surface and its edges)
+are rendered once into Surfaces and only rebuilt when their inputs - the
+screen size or the palette - change. Each frame then costs one blit per
+layer, and only the moving parts are drawn on top.
+"""
+import pygame
+
+from profiler import profiler
+from sim_core import SCREEN_WIDTH
+
+# Road and edge widths at the full SCREEN_WIDTH; other sizes scale them
+ROAD_WIDTH = 300
+EDGE_WIDTH = 4
+
+# Default colors for the static layers
+DEFAULT_PALETTE = {
+    'sky_top': (25, 25, 112),
+    'sky_bottom': (255, 20, 147),
+    'asphalt': (40, 40, 40),
+    'road_edge': (0, 255, 255),
+}
+
+
+def prepare_surface(surface):
+    """Convert a layer to the display format when a display exists"""
+    if pygame.display.get_surface() is not None:
+        return surface.convert()
+    return surface
+
+
+def render_background(size, palette):
+    """Render the vertical gradient used behind every screen"""
+    width, height = size
+    top, bottom = palette['sky_top'], palette['sky_bottom']
+    surface = pygame.Surface(size)
+    for y in range(height):
+        ratio = y / height
+        color = tuple(min(255, int(top[i] + (bottom[i] - top[i]) * ratio * 0.3))
+                      for i in range(3))
+        pygame.draw.line(surface, color, (0, y), (width, y))
+    return prepare_surface(surface)
+
+
+def road_width(size):
+    """Road width in pixels for a layer of this size"""
+    return ROAD_WIDTH * size[0] // SCREEN_WIDTH
+
+
+def road_bounds(size):
+    """Return the left and right x coordinates of the road"""
+    center = size[0] // 2
+    return center - road_width(size) // 2, center + road_width(size) // 2
+
+
+def render_road(size, palette):
+    """Render the asphalt and edge lines, cropped to the road itself"""
+    width, height = size
+    road_left, road_right = road_bounds(size)
+
+    edge = max(1, EDGE_WIDTH * width // SCREEN_WIDTH)
+
+    full = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(full, palette['asphalt'], (road_left, 0, road_width(size), height))
+    pygame.draw.line(full, palette['road_edge'], (road_left, 0), (road_left, height), edge)
+    pygame.draw.line(full, palette['road_edge'], (road_right, 0), (road_right, height), edge)
+
+    # The road strip is fully opaque, so store it without per-pixel alpha
+    bounds = full.get_bounding_rect()
+    surface = pygame.Surface(bounds.size)
+    surface.blit(full, (0, 0), bounds)
+    return prepare_surface(surface), bounds.topleft
+
+
+class LayerCompositor:
+    """Keep static layers rendered in cached Surfaces"""
+
+    def __init__(self, size, palette=None):
+        self.size = tuple(size)
+        self.palette = dict(palette or DEFAULT_PALETTE)
+        self.layers = {}  # name -> render function
+        self.cache = {}   # name -> (inputs key, surface, offset)
+        self.rebuilds = 0
+
+    def add_layer(self, name, render):
+        """Register a layer; render(size, palette) returns a Surface or (Surface, offset)"""
+        self.layers[name] = render
+        self.cache.pop(name, None)
+
+    def inputs_key(self):
+        return self.size, tuple(sorted(self.palette.items()))
+
+    def set_size(self, size):
+        """Change the target size, invalidating layers on change"""
+        self.size = tuple(size)
+
+    def set_palette(self, **colors):
+        """Override palette entries, invalidating layers on change"""
+        self.palette.update(colors)
+
+    def invalidate(self, name=None):
+        """Force one layer (or all layers) to rebuild on next use"""
+        if name is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(name, None)
+
+    def get(self, name):
+        """Return (surface, offset) for a layer, rebuilding it if stale"""
+        key = self.inputs_key()
+        cached = self.cache.get(name)
+        if cached is None or cached[0] != key:
+            profiler.count('surfaces')
+            result = self.layers[name](self.size, self.palette)
+            surface, offset = result if isinstance(result, tuple) else (result, (0, 0))
+            cached = (key, surface, offset)
+            self.cache[name] = cached
+            self.rebuilds += 1
+        return cached[1], cached[2]
+
+    def blit(self, target, name):
+        """Draw a cached layer onto the target surface"""
+        surface, offset = self.get(name)
+        return target.blit(surface, offset)
+
+
+def create_default_compositor(size, palette=None):
+    """Build a compositor with the background and road layers registered"""
+    compositor = LayerCompositor(size, palette)
+    compositor.add_layer('background', render_background)
+    compositor.add_layer('road', render_road)
+    return compositor
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Persistent leaderboard and run history for RETRO RACER
+
+Every finished run is stored in a SQLite database in WAL mode, so
+readers never block the writer and a commit is one append to the log.
+The runs table keeps the full history, and an index on score serves the
+top-N query without sorting.
+
+The game thread never touches the database. record() updates the cached
+top-N in memory and puts the run on a bounded queue. A writer thread,
+which owns the only connection, drains the queue and inserts everything
+waiting in one transaction with executemany, so a burst of runs (an
+arcade cabinet logging every credit) costs one commit. The SQL is kept in
+module constants, so sqlite3 prepares each statement once per connection
+and reuses it. If the queue is full or the database cannot be opened,
+runs are counted as dropped and the game carries on.
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# Runs shown on the leaderboard
+TOP_N = 5
+
+# Runs waiting to be written before record() starts dropping them
+QUEUE_SIZE = 256
+
+# Most runs inserted in one transaction
+BATCH_SIZE = 128
+
+# Stored columns of a run, in the order of a run tuple
+RUN_COLUMNS = ('score', 'distance', 'time_ms', 'top_speed', 'seed', 'finished_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    distance INTEGER NOT NULL,
+    time_ms INTEGER NOT NULL,
+    top_speed INTEGER NOT NULL,
+    seed INTEGER,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (score DESC, finished_at);
+"""
+
+INSERT_RUN = (f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) "
+              f"VALUES ({', '.join('?' * len(RUN_COLUMNS))})")
+TOP_RUNS = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs ORDER BY score DESC, finished_at LIMIT ?"
+RECENT_RUNS = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs ORDER BY id DESC LIMIT ?"
+COUNT_RUNS = "SELECT COUNT(*) FROM runs"
+
+
+def default_leaderboard_path():
+    """Database path, in RETRO_RACER_DATA or ~/.local/share/retro_racer"""
+    root = os.environ.get("RETRO_RACER_DATA")
+    if not root:
+        root = os.path.join(os.path.expanduser("~"), ".local", "share", "retro_racer")
+    return os.path.join(root, "leaderboard.db")
+
+
+def connect(path):
+    """Open the database in WAL mode with its schema in place"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only risks the last commits on power loss, never corruption
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def run_tuple(score, distance, time_elapsed, top_speed, seed=None, finished_at=None):
+    """A run as stored, in RUN_COLUMNS order"""
+    if seed is not None and seed >= 1 << 63:
+        # SQLite integers are signed 64-bit, so the top half of seeds is stored negative
+        seed -= 1 << 64
+    return (int(score), int(distance), int(round(time_elapsed * 1000)), int(top_speed),
+            seed, time.time() if finished_at is None else finished_at)
+
+
+def ranked(runs, limit):
+    """The best limit runs: highest score first, earlier runs first on ties"""
+    return tuple(sorted(runs, key=lambda run: (-run[0], run[5]))[:limit])
+
+
+class Leaderboard:
+    """Top-N cache in memory, with the database written from a background thread"""
+
+    def __init__(self, path, top_n=TOP_N, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+        self.path = path
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.queue = queue.Queue(queue_size)
+        # Replaced whole under the lock, so readers can use it without one
+        self.top = ()
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.error = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.thread = None
+
+    def start(self):
+        """Open the database and load the top-N in the background; returns immediately"""
+        self.thread = threading.Thread(target=self.write_loop, name='leaderboard', daemon=True)
+        self.thread.start()
+        return self
+
+    def record(self, score, distance, time_elapsed, top_speed, seed=None):
+        """Queue a finished run; returns its place in the top-N (1 is best) or None"""
+        run = run_tuple(score, distance, time_elapsed, top_speed, seed)
+        with self.lock:
+            self.top = ranked(self.top + (run,), self.top_n)
+            place = self.top.index(run) + 1 if run in self.top else None
+        try:
+            self.queue.put_nowait(run)
+        except queue.Full:
+            self.count_dropped(1)
+        return place
+
+    def write_loop(self):
+        try:
+            connection = connect(self.path)
+            rows = connection.execute(TOP_RUNS, (self.top_n,)).fetchall()
+        except (OSError, sqlite3.Error) as e:
+            self.error = e
+            connection = None
+        else:
+            with self.lock:
+                # Runs recorded meanwhile are still queued, so none are counted twice
+                self.top = ranked(self.top + tuple(rows), self.top_n)
+        self.loaded.set()
+
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            runs = [run for run in batch if run is not None]
+            if runs:
+                self.write(connection, runs)
+            for _ in batch:
+                self.queue.task_done()
+            if stopping:
+                break
+        if connection is not None:
+            connection.close()
+
+    def write(self, connection, runs):
+        """Insert runs in one transaction"""
+        if connection is None:
+            self.count_dropped(len(runs))
+            return
+        try:
+            with connection:
+                connection.executemany(INSERT_RUN, runs)
+        except sqlite3.Error as e:
+            self.error = e
+            self.count_dropped(len(runs))
+            return
+        self.written += len(runs)
+        self.batches += 1
+
+    def count_dropped(self, runs):
+        """Count lost runs under the lock, as both threads drop them"""
+        with self.lock:
+            self.dropped += runs
+
+    def flush(self):
+        """Block until every queued run is written (not for the game loop)"""
+        self.queue.join()
+
+    def close(self, timeout=5.0):
+        """Write what is queued, then stop the writer thread"""
+        if self.thread is not None and self.thread.is_alive():
+            # Blocks only if the queue is full, while the writer is draining it
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+        }
+
+
+def read_runs(path, sql, params=()):
+    """Rows from a query on a separate connection; WAL lets it run beside the writer"""
+    connection = connect(path)
+    try:
+        return connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+
+
+def benchmark(path, runs):
+    """Record runs as fast as possible; returns (record seconds, total seconds, stats)"""
+    # Room for every run, so the timing covers writing rather than dropping
+    board = Leaderboard(path, queue_size=runs).start()
+    board.loaded.wait()
+    start = time.perf_counter()
+    for i in range(runs):
+        board.record(i * 37 % 10007, i * 13 % 5000, i % 300, 200, seed=i)
+    recorded = time.perf_counter() - start
+    board.close(timeout=None)
+    return recorded, time.perf_counter() - start, board.stats()
+
+
+def format_run(run):
+    score, distance, time_ms, top_speed, seed, finished_at = run
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(finished_at))
+    seed_text = '-' if seed is None else seed % (1 << 64)
+    return (f"{score:06d}  {distance // 10:05d}M  {time_ms // 1000:03d}S  "
+            f"{top_speed:03d} KM/H  seed {seed_text}  {when}")
+
+
+def main(argv=None):
+    """Show the leaderboard and recent runs from the command line"""
+    parser = argparse.ArgumentParser(description="RETRO RACER leaderboard")
+    parser.add_argument('--db', default=default_leaderboard_path(), help="leaderboard database")
+    parser.add_argument('--top', type=int, default=10, help="best runs to show")
+    parser.add_argument('--recent', type=int, default=0, help="latest runs to show")
+    parser.add_argument('--bench', type=int, metavar='RUNS',
+                        help="time recording RUNS runs into a scratch copy of --db")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        path = args.db + '.bench'
+        recorded, total, stats = benchmark(path, args.bench)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"{args.bench} runs: record() {recorded / args.bench * 1e6:.1f} us each, "
+              f"all written in {total:.3f}s in {stats['batches']} transactions "
+              f"({stats['dropped']} dropped)")
+        return 0
+
+    print(f"Best {args.top} runs:")
+    for place, run in enumerate(read_runs(args.db, TOP_RUNS, (args.top,)), 1):
+        print(f"{place:3d}. {format_run(run)}")
+    if args.recent:
+        print(f"Latest {args.recent} runs:")
+        for run in read_runs(args.db, RECENT_RUNS, (args.recent,)):
+            print(f"     {format_run(run)}")
+        count = read_runs(args.db, COUNT_RUNS)[0][0]
+        print(f"{count} runs recorded")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
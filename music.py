@@ -0,0 +1,114 @@
+"""
+Procedural synthwave music for RETRO RACER
+
+MusicSynth renders an endless track - a plucked saw bassline, a square
+arpeggio and a kick/snare/hi-hat pattern over an Am-F-C-G progression -
+one NumPy block at a time. Oscillator phases and the beat position carry
+over between blocks, so the tempo can change at any block boundary
+without clicks. Pair it with audio_stream.AudioStream to play it.
+"""
+import numpy as np
+
+from synth import AMPLITUDE, SAMPLE_RATE
+
+# One chord per bar: (root MIDI note, chord tones in semitones)
+PROGRESSION = ((57, (0, 3, 7)), (53, (0, 4, 7)), (48, (0, 4, 7)), (55, (0, 4, 7)))
+ROOTS = np.array([root for root, _ in PROGRESSION])
+CHORD_TONES = np.array([tones for _, tones in PROGRESSION])
+
+# Bass offset from the root, an octave down, per eighth note of the bar
+BASS_PATTERN = np.array([0, 0, 12, 0, 0, 12, 0, 12]) - 12
+
+# Arpeggio per sixteenth: chord tone index and octave
+ARP_TONES = np.array([0, 1, 2, 1, 0, 1, 2, 1])
+ARP_OCTAVES = np.array([1, 1, 1, 2, 1, 1, 1, 2])
+
+# Tempo range in beats per minute, from the slowest to the fastest car speed
+MENU_TEMPO = 92
+MIN_TEMPO = 100
+MAX_TEMPO = 144
+
+# Mix levels
+BASS_LEVEL = 0.35
+ARP_LEVEL = 0.18
+KICK_LEVEL = 0.6
+SNARE_LEVEL = 0.25
+HAT_LEVEL = 0.08
+
+
+def midi_to_hz(notes):
+    return 440.0 * 2.0 ** ((notes - 69) / 12.0)
+
+
+def tempo_for_speed(speed, start_speed=5, max_speed=12):
+    """Map the car speed onto the tempo range"""
+    ratio = min(max((speed - start_speed) / (max_speed - start_speed), 0.0), 1.0)
+    return MIN_TEMPO + (MAX_TEMPO - MIN_TEMPO) * ratio
+
+
+class MusicSynth:
+    """Render the track block by block; tempo may change between blocks"""
+
+    def __init__(self, tempo=MENU_TEMPO, volume=0.5, sample_rate=SAMPLE_RATE, seed=0):
+        self.tempo = tempo
+        self.volume = volume
+        self.sample_rate = sample_rate
+        self.beat = 0.0  # beat position at the start of the next block
+        self.bass_phase = 0.0
+        self.arp_phase = 0.0
+        self.noise = np.random.default_rng(seed)
+        self.last_noise = 0.0
+
+    def oscillator_phase(self, frequencies, phase):
+        """Integrate per-sample frequencies; returns (phases, carried phase)"""
+        phases = phase + np.cumsum(frequencies / self.sample_rate)
+        return phases, phases[-1] % 1.0
+
+    def render(self, out):
+        """Fill an int16 (frames, 2) array with the next block of music"""
+        frames = len(out)
+        tempo = self.tempo
+        beats = self.beat + np.arange(frames) * (tempo / 60.0 / self.sample_rate)
+        self.beat = float(beats[-1] + tempo / 60.0 / self.sample_rate)
+        seconds_per_beat = 60.0 / tempo
+
+        sixteenths = beats * 4.0
+        step = sixteenths.astype(np.int64)
+        bar = (step // 16) % len(PROGRESSION)
+        roots = ROOTS[bar]
+
+        # Plucked saw bass, retriggered every eighth note
+        eighth_time = ((beats * 2.0) % 1.0) * seconds_per_beat / 2
+        bass_freq = midi_to_hz(roots + BASS_PATTERN[(step // 2) % 8])
+        phases, self.bass_phase = self.oscillator_phase(bass_freq, self.bass_phase)
+        bass = (2.0 * (phases % 1.0) - 1.0) * np.exp(-eighth_time * 6.0)
+
+        # Square arpeggio through the chord, one note per sixteenth
+        sixteenth_time = (sixteenths % 1.0) * seconds_per_beat / 4
+        pattern = step % 8
+        arp_notes = roots + CHORD_TONES[bar, ARP_TONES[pattern]] + 12 * ARP_OCTAVES[pattern]
+        phases, self.arp_phase = self.oscillator_phase(midi_to_hz(arp_notes), self.arp_phase)
+        arp = np.where(phases % 1.0 < 0.5, 1.0, -1.0) * np.exp(-sixteenth_time * 18.0)
+
+        # Kick on every beat: a sine swept down from 150 Hz to 50 Hz
+        beat_time = (beats % 1.0) * seconds_per_beat
+        kick = np.sin(2 * np.pi * (50.0 * beat_time + 100.0 / 30.0 * (1.0 - np.exp(-30.0 * beat_time))))
+        kick *= np.exp(-beat_time * 12.0)
+
+        # Snare on beats two and four, hi-hat on every eighth
+        noise = self.noise.standard_normal(frames)
+        backbeat = (beats.astype(np.int64) % 2) == 1
+        snare = noise * np.exp(-beat_time * 20.0) * backbeat
+        hat = np.diff(noise, prepend=self.last_noise) * np.exp(-eighth_time * 60.0)
+        self.last_noise = noise[-1]
+
+        mix = (BASS_LEVEL * bass + KICK_LEVEL * kick + SNARE_LEVEL * snare + HAT_LEVEL * hat)
+        scale = AMPLITUDE * 2 * self.volume
+        # The arpeggio sits slightly left, the hi-hat slightly right
+        left = (mix + ARP_LEVEL * 1.2 * arp - HAT_LEVEL * 0.5 * hat) * scale
+        right = (mix + ARP_LEVEL * 0.8 * arp + HAT_LEVEL * 0.5 * hat) * scale
+        np.clip(left, -32767, 32767, out=left)
+        np.clip(right, -32767, 32767, out=right)
+        out[:, 0] = left
+        out[:, 1] = right
+        return out
@@ -0,0 +1,220 @@
+"""
+Structure-of-arrays obstacle store for RETRO RACER
+
+Obstacles live in parallel NumPy arrays (x, y, width, height, type code
+and an alive mask) instead of a list of dicts. Movement, despawning and
+AABB overlap against the player are each one batched operation, and
+removal is a vectorized swap-remove so cost stays flat at thousands of
+entities. The previous y of each obstacle is kept for render
+interpolation, and its bounding box is cached in columns that move with
+it. Per-tick work writes into preallocated buffers, so a long session
+allocates nothing while the obstacle count stays within capacity. This
+module does not import pygame.
+"""
+import numpy as np
+
+TYPE_CAR = 0
+TYPE_BARRIER = 1
+TYPE_NAMES = ('car', 'barrier')
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+# Collision box size per obstacle type, as (width, height)
+OBSTACLE_SIZES = {
+    'car': (30, 40),
+    'barrier': (40, 20),
+}
+
+
+class ObstacleStore:
+    """Obstacles held in parallel NumPy arrays; live rows are [0, count)"""
+
+    # left, top, right and bottom are the cached bounding box; top_offset
+    # and span (center to top edge, and height) are floats for updating it
+    COLUMNS = ('x', 'y', 'prev_y', 'width', 'height', 'kind', 'alive',
+               'left', 'top', 'right', 'bottom', 'top_offset', 'span')
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """(Re)allocate every column, keeping live rows"""
+        old = {name: getattr(self, name, None) for name in self.COLUMNS}
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.prev_y = np.zeros(capacity, dtype=np.float64)
+        self.width = np.zeros(capacity, dtype=np.int32)
+        self.height = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.left = np.zeros(capacity, dtype=np.float64)
+        self.top = np.zeros(capacity, dtype=np.float64)
+        self.right = np.zeros(capacity, dtype=np.float64)
+        self.bottom = np.zeros(capacity, dtype=np.float64)
+        self.top_offset = np.zeros(capacity, dtype=np.float64)
+        self.span = np.zeros(capacity, dtype=np.float64)
+        # Scratch masks for advance() and overlap tests
+        self.mask = np.zeros(capacity, dtype=bool)
+        self.test = np.zeros(capacity, dtype=bool)
+        if self.count:
+            for name in self.COLUMNS:
+                getattr(self, name)[:self.count] = old[name][:self.count]
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, kind):
+        """Add one obstacle of the given type name and return its row"""
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+        i = self.count
+        width, height = OBSTACLE_SIZES[kind]
+        self.x[i] = x
+        self.y[i] = y
+        self.prev_y[i] = y
+        self.width[i] = width
+        self.height[i] = height
+        self.kind[i] = TYPE_CODES[kind]
+        self.alive[i] = True
+        # pygame.Rect truncates float coordinates toward zero
+        self.left[i] = np.trunc(x - width // 2)
+        self.right[i] = self.left[i] + width
+        self.top_offset[i] = height // 2
+        self.span[i] = height
+        self.count += 1
+        self.update_bounds(slice(i, i + 1))
+        return i
+
+    def spawn_many(self, xs, ys, kinds):
+        """Add a batch of obstacles; kinds are type codes"""
+        xs, ys, kinds = np.asarray(xs), np.asarray(ys), np.asarray(kinds, dtype=np.int8)
+        n = len(xs)
+        if self.count + n > self.capacity:
+            capacity = self.capacity
+            while capacity < self.count + n:
+                capacity *= 2
+            self.allocate(capacity)
+        rows = slice(self.count, self.count + n)
+        sizes = np.array([OBSTACLE_SIZES[name] for name in TYPE_NAMES], dtype=np.int32)
+        self.x[rows] = xs
+        self.y[rows] = ys
+        self.prev_y[rows] = ys
+        self.width[rows] = sizes[kinds, 0]
+        self.height[rows] = sizes[kinds, 1]
+        self.kind[rows] = kinds
+        self.alive[rows] = True
+        self.left[rows] = np.trunc(xs - sizes[kinds, 0] // 2)
+        self.right[rows] = self.left[rows] + sizes[kinds, 0]
+        self.top_offset[rows] = sizes[kinds, 1] // 2
+        self.span[rows] = sizes[kinds, 1]
+        self.count += n
+        self.update_bounds(rows)
+
+    def advance(self, dy, despawn_y):
+        """Move every obstacle down by dy and despawn those past despawn_y
+
+        Returns the number of obstacles removed.
+        """
+        n = self.count
+        if n == 0:
+            return 0
+        y = self.y[:n]
+        self.prev_y[:n] = y
+        y += dy
+        self.update_bounds(slice(0, n))
+        gone = np.greater(y, despawn_y, out=self.mask[:n])
+        if not gone.any():
+            return 0
+        np.logical_not(gone, out=self.alive[:n])
+        return self.compact()
+
+    def update_bounds(self, rows):
+        """Recompute the cached top and bottom of rows from their y"""
+        top = self.top[rows]
+        np.subtract(self.y[rows], self.top_offset[rows], out=top)
+        # pygame.Rect truncates float coordinates toward zero
+        np.trunc(top, out=top)
+        np.add(top, self.span[rows], out=self.bottom[rows])
+
+    def compact(self):
+        """Swap-remove dead rows so live rows stay packed at the front"""
+        n = self.count
+        alive = self.alive[:n]
+        keep = int(np.count_nonzero(alive))
+        # Dead rows inside the kept range are filled from live rows past it
+        holes = np.flatnonzero(~alive[:keep])
+        fillers = np.flatnonzero(alive[keep:]) + keep
+        if len(holes):
+            for name in self.COLUMNS:
+                column = getattr(self, name)
+                column[holes] = column[fillers]
+        self.alive[keep:n] = False
+        self.count = keep
+        return n - keep
+
+    def sync_previous(self):
+        """Make the previous positions equal the current ones"""
+        self.prev_y[:self.count] = self.y[:self.count]
+
+    def bounds(self):
+        """Return (left, top, right, bottom) arrays matching pygame.Rect"""
+        n = self.count
+        return self.left[:n], self.top[:n], self.right[:n], self.bottom[:n]
+
+    def overlap_mask(self, left, top, width, height):
+        """Boolean mask of live obstacles overlapping the given box
+
+        The mask is a reused buffer, valid until the next call.
+        """
+        n = self.count
+        mask, test = self.mask[:n], self.test[:n]
+        np.less(self.left[:n], left + width, out=mask)
+        np.greater(self.right[:n], left, out=test)
+        mask &= test
+        np.less(self.top[:n], top + height, out=test)
+        mask &= test
+        np.greater(self.bottom[:n], top, out=test)
+        mask &= test
+        return mask
+
+    def overlaps(self, left, top, width, height):
+        """True if any live obstacle overlaps the given box"""
+        if self.count == 0:
+            return False
+        return bool(self.overlap_mask(left, top, width, height).any())
+
+    def sprites(self, alpha=1.0):
+        """Return (type name, width, height, x, y) tuples for drawing
+
+        alpha interpolates y between the previous and current tick.
+        """
+        n = self.count
+        names = [TYPE_NAMES[code] for code in self.kind[:n].tolist()]
+        y = self.y[:n]
+        if alpha < 1.0:
+            y = self.prev_y[:n] + (y - self.prev_y[:n]) * alpha
+        return list(zip(names, self.width[:n].tolist(), self.height[:n].tolist(),
+                        self.x[:n].tolist(), y.tolist()))
+
+    def clear(self):
+        """Remove every obstacle"""
+        self.alive[:self.count] = False
+        self.count = 0
+
+    def bytes_per_obstacle(self):
+        """Column bytes held for each obstacle row"""
+        return sum(getattr(self, name).itemsize for name in self.COLUMNS)
+
+    def memory(self):
+        """Memory report: live rows, capacity and bytes in use"""
+        arrays = [getattr(self, name) for name in self.COLUMNS]
+        arrays += [self.mask, self.test]
+        total = sum(array.nbytes for array in arrays)
+        return {
+            'live': self.count,
+            'capacity': self.capacity,
+            'bytes_per_obstacle': self.bytes_per_obstacle(),
+            'total_bytes': total,
+            'bytes_per_live': total / self.count if self.count else 0.0,
+        }
@@ -0,0 +1,197 @@
+"""
+Parallax backdrop for RETRO RACER
+
+Each backdrop layer - twinkling stars, far and near mountains and the
+synthwave ground grid - is drawn once into a strip that tiles seamlessly
+along its scroll axis. A frame then costs one or two blits per layer at
+the layer's own scroll rate; nothing is redrawn per star or per peak.
+Stars twinkle through the palette: their strip is 8-bit, every star's
+pixels hold the index of its twinkle group, and each frame rewrites only
+those few palette entries.
+"""
+import math
+import random
+
+import pygame
+
+from layers import prepare_surface
+from sim_core import SCREEN_WIDTH
+
+# Layer colors
+STAR_COLOR = (255, 255, 255)
+FAR_MOUNTAIN_COLOR = (138, 43, 226)
+NEAR_MOUNTAIN_COLOR = (20, 8, 50)
+GRID_COLOR = (75, 0, 130)
+# Never drawn by a layer, so it marks transparent strip pixels
+TRANSPARENT = (0, 0, 0)
+
+STAR_COUNT = 50
+# Stars twinkle in groups: one palette entry per (phase, brightness) pair
+TWINKLE_PHASES = 8
+STAR_LEVELS = 4
+TWINKLE_SPEED = 3.0
+
+# Mountain rows: (peak spacing, half width, height range) in SCREEN_WIDTH units
+FAR_MOUNTAINS = (80, 40, (50, 100))
+NEAR_MOUNTAINS = (60, 30, (80, 150))
+
+GRID_SIZE = 40
+
+# Scroll rates, in SCREEN_WIDTH units per unit of offset
+STAR_RATE = 0.05
+FAR_RATE = 0.2
+NEAR_RATE = 0.5
+GRID_RATE = -1.0  # the grid moves down with the road
+
+
+class ParallaxLayer:
+    """A seamless strip scrolled through a fixed band of the screen
+
+    axis 0 wraps the strip horizontally, axis 1 vertically. The strip must
+    be at least as long as the band along that axis.
+    """
+
+    def __init__(self, strip, band, rate, axis=0):
+        self.strip = strip
+        self.band = pygame.Rect(band)
+        self.rate = rate
+        self.axis = axis
+        self.length = strip.get_size()[axis]
+
+    def draw(self, target, offset):
+        """Blit the strip scrolled by offset; returns the band Rect"""
+        band = self.band
+        start = int(offset * self.rate) % self.length
+        if self.axis == 0:
+            first = min(self.length - start, band.width)
+            target.blit(self.strip, band.topleft, (start, 0, first, band.height))
+            if first < band.width:
+                target.blit(self.strip, (band.x + first, band.y),
+                            (0, 0, band.width - first, band.height))
+        else:
+            first = min(self.length - start, band.height)
+            target.blit(self.strip, band.topleft, (0, start, band.width, first))
+            if first < band.height:
+                target.blit(self.strip, (band.x, band.y + first),
+                            (0, 0, band.width, band.height - first))
+        return band
+
+
+def keyed_strip(size):
+    """Blank strip whose TRANSPARENT pixels are skipped when blitted"""
+    strip = pygame.Surface(size)
+    strip.fill(TRANSPARENT)
+    return strip
+
+
+def finish_strip(strip):
+    """Convert a keyed strip for fast run-length encoded blits"""
+    strip = prepare_surface(strip)
+    strip.set_colorkey(TRANSPARENT, pygame.RLEACCEL)
+    return strip
+
+
+def wrapped_length(width, spacing):
+    """Strip length covering width that holds a whole number of spacings"""
+    return round(math.ceil(width / spacing) * spacing)
+
+
+def render_stars(width, height, scale, rng):
+    """8-bit star strip; each star's pixels hold its twinkle group's palette index"""
+    strip = pygame.Surface((width, height), depth=8)
+    strip.set_palette([TRANSPARENT] * 256)
+    strip.fill(0)
+    strip.set_colorkey(0)
+    radius = max(1, round(scale))
+    for _ in range(STAR_COUNT):
+        x = rng.randrange(width)
+        y = rng.randrange(max(height - radius, 1))
+        index = 1 + rng.randrange(TWINKLE_PHASES) * STAR_LEVELS + rng.randrange(STAR_LEVELS)
+        for wrap in (-width, 0, width):
+            pygame.draw.circle(strip, index, (x + wrap, y), radius)
+    return strip
+
+
+def render_mountains(width, base, scale, row, color, rng):
+    """Mountain strip whose bottom edge is the base line; returns (strip, top y)"""
+    spacing, half_width, (low, high) = row
+    spacing *= scale
+    length = wrapped_length(width, spacing)
+    peak = high * scale
+    strip = keyed_strip((length, math.ceil(peak)))
+    bottom = strip.get_height()
+    for i in range(round(length / spacing)):
+        x = i * spacing
+        top = bottom - rng.uniform(low, high) * scale
+        for wrap in (-length, 0, length):
+            center = x + wrap
+            pygame.draw.polygon(strip, color, [(center - half_width * scale, bottom),
+                                               (center, top),
+                                               (center + half_width * scale, bottom)])
+    return finish_strip(strip), base - bottom
+
+
+def render_grid(width, height, scale):
+    """Ground grid strip, a whole number of cells tall"""
+    cell = GRID_SIZE * scale
+    length = wrapped_length(height, cell)
+    strip = keyed_strip((width, length))
+    for i in range(round(length / cell)):
+        y = round(i * cell)
+        pygame.draw.line(strip, GRID_COLOR, (0, y), (width, y))
+    for i in range(math.ceil(width / cell)):
+        x = round(i * cell)
+        pygame.draw.line(strip, GRID_COLOR, (x, 0), (x, length))
+    return finish_strip(strip)
+
+
+class Parallax:
+    """Stars, mountains and an optional ground grid above and below a horizon
+
+    horizon is the screen row where the mountains stand. The grid fills
+    the ground below it; leave it out when something else draws there.
+    """
+
+    def __init__(self, size, horizon, ground=True, seed=0):
+        width, height = self.size = tuple(size)
+        self.horizon = horizon
+        scale = width / SCREEN_WIDTH
+        # Cosmetic layout, so it never draws from the simulation's generator
+        rng = random.Random(seed)
+
+        self.layers = []
+        self.stars = render_stars(width, horizon, scale, rng)
+        self.layers.append((ParallaxLayer(self.stars, (0, 0, width, horizon), STAR_RATE * scale), 0))
+        self.star_levels = [0.3 + 0.7 * (level + 1) / STAR_LEVELS for level in range(STAR_LEVELS)]
+
+        far_base = horizon - horizon // 3
+        for row, base, color, rate in ((FAR_MOUNTAINS, far_base, FAR_MOUNTAIN_COLOR, FAR_RATE),
+                                       (NEAR_MOUNTAINS, horizon, NEAR_MOUNTAIN_COLOR, NEAR_RATE)):
+            strip, top = render_mountains(width, base, scale, row, color, rng)
+            self.layers.append((ParallaxLayer(strip, (0, top, width, strip.get_height()), rate * scale), 0))
+
+        if ground:
+            strip = render_grid(width, height - horizon, scale)
+            band = (0, horizon, width, height - horizon)
+            self.layers.append((ParallaxLayer(strip, band, GRID_RATE * scale, axis=1), 1))
+
+    def twinkle(self, clock):
+        """Set every twinkle group's brightness for a time in seconds"""
+        colors = []
+        for phase in range(TWINKLE_PHASES):
+            wave = 0.5 + 0.5 * math.sin(clock * TWINKLE_SPEED + phase * 2 * math.pi / TWINKLE_PHASES)
+            for level in self.star_levels:
+                brightness = max(level * wave, 0.05)
+                colors.append(tuple(int(c * brightness) for c in STAR_COLOR))
+        # Index 0 stays TRANSPARENT; the groups follow it
+        for index, color in enumerate(colors, 1):
+            self.stars.set_palette_at(index, color)
+
+    def draw(self, target, horizontal, vertical, clock=0.0):
+        """Draw every layer; horizontal scrolls the sky, vertical the ground
+
+        Returns the band Rects drawn.
+        """
+        self.twinkle(clock)
+        offsets = (horizontal, vertical)
+        return [layer.draw(target, offsets[axis]) for layer, axis in self.layers]
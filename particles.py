@@ -0,0 +1,188 @@
+"""
+Pooled particle effects for RETRO RACER
+
+Particles live in a fixed-capacity pool of parallel NumPy arrays
+(position, velocity, acceleration, life and color) with the live rows
+packed at the front, as in obstacle_store. Emitting, integrating and
+expiring are each a handful of batched operations, and drawing writes
+every particle straight into the target surface's pixel buffer,
+blending additively so sparks glow over the road. There is no Python
+object or Surface per particle.
+"""
+import numpy as np
+import pygame
+
+DEFAULT_CAPACITY = 16384
+
+# Particles are drawn as PARTICLE_SIZE x PARTICLE_SIZE squares at full resolution
+PARTICLE_SIZE = 2
+
+# Emission presets: count, speed range (px/s), direction range (degrees,
+# 0 = right, 90 = down), life range (s), downward acceleration (px/s^2)
+# and the palette each particle picks its color from
+EFFECTS = {
+    'crash': {
+        'count': 400, 'speed': (60, 420), 'angle': (0, 360), 'life': (0.4, 1.4),
+        'gravity': 240, 'colors': ((255, 120, 40), (255, 220, 80), (255, 20, 147)),
+    },
+    'sparks': {
+        'count': 120, 'speed': (200, 600), 'angle': (200, 340), 'life': (0.15, 0.5),
+        'gravity': 900, 'colors': ((255, 255, 200), (255, 200, 60)),
+    },
+    'exhaust': {
+        'count': 2, 'speed': (30, 90), 'angle': (70, 110), 'life': (0.2, 0.6),
+        'gravity': -40, 'colors': ((0, 200, 255), (150, 50, 255), (90, 90, 120)),
+    },
+}
+
+# Share of velocity kept per second
+DRAG = 0.35
+
+
+class ParticleSystem:
+    """Fixed pool of particles in parallel NumPy arrays; live rows are [0, count)"""
+
+    COLUMNS = ('x', 'y', 'vx', 'vy', 'ay', 'life', 'max_life', 'color')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        # Effects are cosmetic, so they draw from their own generator and
+        # never from the simulation's (replays stay deterministic)
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.ay = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.float32)
+        self.palettes = {name: np.array(effect['colors'], dtype=np.float32)
+                         for name, effect in EFFECTS.items()}
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, effect, x, y, count=None, spread=0.0, velocity=(0.0, 0.0)):
+        """Emit a burst of a named effect around (x, y)
+
+        spread scatters start positions by up to that many pixels, and
+        velocity is added to every particle (e.g. the emitter's motion).
+        Particles that do not fit in the pool are dropped. Returns the
+        number emitted.
+        """
+        preset = EFFECTS[effect]
+        wanted = preset['count'] if count is None else count
+        n = min(wanted, self.capacity - self.count)
+        self.dropped += wanted - n
+        if n <= 0:
+            return 0
+        rng = self.rng
+        rows = slice(self.count, self.count + n)
+        angle = np.radians(rng.uniform(*preset['angle'], n))
+        speed = rng.uniform(*preset['speed'], n)
+        self.x[rows] = x + rng.uniform(-spread, spread, n)
+        self.y[rows] = y + rng.uniform(-spread, spread, n)
+        self.vx[rows] = np.cos(angle) * speed + velocity[0]
+        self.vy[rows] = np.sin(angle) * speed + velocity[1]
+        self.ay[rows] = preset['gravity']
+        life = rng.uniform(*preset['life'], n)
+        self.life[rows] = life
+        self.max_life[rows] = life
+        palette = self.palettes[effect]
+        self.color[rows] = palette[rng.integers(0, len(palette), n)]
+        self.count += n
+        return n
+
+    def update(self, dt, scroll=0.0):
+        """Integrate every particle by dt seconds and expire the dead
+
+        scroll moves everything down by that many pixels, so particles
+        left on the road travel with it.
+        """
+        n = self.count
+        if n == 0:
+            return
+        vx, vy = self.vx[:n], self.vy[:n]
+        vy += self.ay[:n] * dt
+        damping = DRAG ** dt
+        vx *= damping
+        vy *= damping
+        self.x[:n] += vx * dt
+        self.y[:n] += vy * dt + scroll
+        life = self.life[:n]
+        life -= dt
+        dead = life <= 0
+        if dead.any():
+            self.compact(~dead)
+
+    def compact(self, alive):
+        """Swap-remove dead rows so live rows stay packed at the front"""
+        keep = int(np.count_nonzero(alive))
+        # Dead rows inside the kept range are filled from live rows past it
+        holes = np.flatnonzero(~alive[:keep])
+        fillers = np.flatnonzero(alive[keep:]) + keep
+        if len(holes):
+            for name in self.COLUMNS:
+                column = getattr(self, name)
+                column[holes] = column[fillers]
+        self.count = keep
+
+    def draw(self, surface, scale=1.0):
+        """Add every particle's color, faded by its age, into surface's pixels
+
+        scale maps particle positions and size to surface pixels, and
+        surface must be 32 bits per pixel. Returns the Rect that was drawn
+        into, or None when nothing was visible.
+        """
+        n = self.count
+        if n == 0:
+            return None
+        width, height = surface.get_size()
+        size = max(1, round(PARTICLE_SIZE * scale))
+        if scale == 1.0:
+            x = self.x[:n].astype(np.intp)
+            y = self.y[:n].astype(np.intp)
+        else:
+            x = (self.x[:n] * scale).astype(np.intp)
+            y = (self.y[:n] * scale).astype(np.intp)
+        visible = (x >= 0) & (x <= width - size) & (y >= 0) & (y <= height - size)
+        if not visible.any():
+            return None
+        x, y = x[visible], y[visible]
+        fade = self.life[:n][visible] / self.max_life[:n][visible]
+        glow = (self.color[:n][visible] * fade[:, None]).astype(np.uint32)
+
+        # Every pixel under every particle's square, with that particle's glow
+        stride = surface.get_pitch() // 4
+        footprint = (np.arange(size)[:, None] * stride + np.arange(size)).ravel()
+        index = ((y * stride + x)[:, None] + footprint).ravel()
+        glow = np.repeat(glow, len(footprint), axis=0)
+        # Particles sharing a pixel all add to it, so sum them before blending once
+        index, owner = np.unique(index, return_inverse=True)
+
+        # Blend on packed pixels in the surface's own format, one channel at a time
+        shifts = [np.uint32(shift) for shift in surface.get_shifts()[:3]]
+        other_bits = ~np.uint32(sum(surface.get_masks()[:3]))
+        buffer = surface.get_buffer()
+        pixels = np.frombuffer(buffer, dtype=np.uint32)
+        try:
+            old = pixels[index]
+            new = old & other_bits
+            for channel, shift in enumerate(shifts):
+                added = np.bincount(owner, weights=glow[:, channel], minlength=len(index))
+                value = ((old >> shift) & 255) + added.astype(np.uint32)
+                np.minimum(value, 255, out=value)
+                new |= value << shift
+            pixels[index] = new
+        finally:
+            # Release the surface lock before anything blits to it
+            del pixels, buffer
+
+        left, top = int(x.min()), int(y.min())
+        return pygame.Rect(left, top, int(x.max()) - left + size, int(y.max()) - top + size)
@@ -0,0 +1,224 @@
+"""
+Per-subsystem frame profiler for RETRO RACER
+
+Named timing scopes wrap each part of the frame (event polling, input,
+simulation, every draw routine, presenting). When the profiler is
+disabled a scope is a shared no-op object, so instrumentation costs
+next to nothing. When enabled it keeps rolling per-scope timings for an
+on-screen overlay (average, p95, p99 and a frame-time graph), counts
+allocations such as Surfaces created per frame, and records every frame
+for export to CSV or JSON.
+"""
+import csv
+import json
+import sys
+import time
+from collections import deque
+
+# Overlay colors
+OVERLAY_BG = (10, 10, 30)
+OVERLAY_TEXT = (0, 255, 255)
+OVERLAY_GRAPH = (57, 255, 20)
+OVERLAY_BUDGET = (255, 20, 147)
+
+
+class _NullScope:
+    """Scope used while profiling is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    """Adds the time spent inside a with-block to the current frame"""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + elapsed
+        return False
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Profiler:
+    """Collect per-scope frame timings and allocation counters"""
+
+    def __init__(self, enabled=False, history=240, max_records=36000):
+        self.enabled = enabled
+        self.history = history
+        # Frames kept for export (36000 is ten minutes at 60 FPS)
+        self.max_records = max_records
+        self.overlay_visible = False
+        self.reset()
+
+    def reset(self):
+        """Drop all recorded samples"""
+        self.current = {}
+        self.counters = {}
+        self.last_counters = {}
+        self.windows = {}  # scope -> deque of recent per-frame ms
+        self.frame_times = deque(maxlen=self.history)
+        self.records = deque(maxlen=self.max_records)
+        self.frame_index = 0
+        self.frame_start = None
+        self.blocks_at_start = 0
+
+    def scope(self, name):
+        """Context manager timing a named scope (a no-op when disabled)"""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def count(self, name, n=1):
+        """Add to a per-frame counter such as 'surfaces'"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def begin_frame(self):
+        """Start timing a frame"""
+        if not self.enabled:
+            return
+        self.current = {}
+        self.counters = {}
+        self.blocks_at_start = sys.getallocatedblocks()
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Finish the frame and fold its samples into the rolling windows"""
+        if not self.enabled or self.frame_start is None:
+            return
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000.0
+        self.frame_times.append(frame_ms)
+
+        record = {'frame': self.frame_index, 'frame_ms': frame_ms}
+        for name, seconds in self.current.items():
+            ms = seconds * 1000.0
+            window = self.windows.get(name)
+            if window is None:
+                window = self.windows[name] = deque(maxlen=self.history)
+            window.append(ms)
+            record[name + '_ms'] = ms
+        record.update(self.counters)
+        self.last_counters = self.counters
+        # Net Python memory blocks allocated during the frame
+        record['alloc_blocks'] = sys.getallocatedblocks() - self.blocks_at_start
+        self.records.append(record)
+        self.frame_index += 1
+        self.frame_start = None
+
+    def stats(self):
+        """Return {scope: (avg, p95, p99)} in ms over the rolling window"""
+        result = {}
+        for name, window in self.windows.items():
+            values = list(window)
+            result[name] = (sum(values) / len(values), percentile(values, 0.95),
+                            percentile(values, 0.99))
+        frames = list(self.frame_times)
+        if frames:
+            result['frame'] = (sum(frames) / len(frames), percentile(frames, 0.95),
+                               percentile(frames, 0.99))
+        return result
+
+    def columns(self):
+        """Every column that appears in the recorded frames"""
+        names = ['frame', 'frame_ms']
+        for record in self.records:
+            for name in record:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def export_csv(self, path):
+        """Write one row per recorded frame"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns(), restval=0)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def export_json(self, path):
+        """Write the recorded frames plus a summary of the rolling stats"""
+        summary = {name: {'avg_ms': avg, 'p95_ms': p95, 'p99_ms': p99}
+                   for name, (avg, p95, p99) in self.stats().items()}
+        with open(path, 'w') as f:
+            json.dump({'summary': summary, 'frames': list(self.records)}, f, indent=1)
+
+    def export(self, path):
+        """Export to CSV or JSON depending on the file extension"""
+        if path.lower().endswith('.json'):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def toggle_overlay(self):
+        """Show or hide the on-screen overlay"""
+        self.overlay_visible = not self.overlay_visible
+
+    def draw_overlay(self, screen, font, text_cache, budget_ms=1000.0 / 60):
+        """Draw per-scope stats and a frame-time graph; returns the Rect used"""
+        import pygame
+
+        stats = self.stats()
+        line_height = font.get_linesize()
+        # Sized from the font, so the panel fits at any render resolution
+        graph_height = line_height * 4
+        width = line_height * 20
+        height = line_height * (len(stats) + 2) + graph_height + 12
+        panel = pygame.Rect(screen.get_width() - width - 10,
+                            screen.get_height() - height - 10, width, height)
+        screen.fill(OVERLAY_BG, panel)
+        pygame.draw.rect(screen, OVERLAY_TEXT, panel, 1)
+
+        x, y = panel.x + 6, panel.y + 4
+        text_cache.draw_glyphs(screen, font, "SCOPE            AVG    P95    P99", (x, y), OVERLAY_TEXT)
+        for name in sorted(stats, key=lambda n: -stats[n][0]):
+            y += line_height
+            avg, p95, p99 = stats[name]
+            text_cache.draw_glyphs(screen, font, f"{name[:15]:<15}{avg:6.2f} {p95:6.2f} {p99:6.2f}",
+                                   (x, y), OVERLAY_TEXT)
+        y += line_height
+        counters = "  ".join(f"{k}:{v}" for k, v in sorted(self.last_counters.items()))
+        text_cache.draw_glyphs(screen, font, counters or "no allocations", (x, y), OVERLAY_TEXT)
+
+        # Frame-time graph, scaled so twice the frame budget fills the height
+        graph = pygame.Rect(x, y + line_height + 4, width - 12, graph_height)
+        pygame.draw.rect(screen, OVERLAY_TEXT, graph, 1)
+        budget_y = graph.bottom - int(graph_height / 2)
+        pygame.draw.line(screen, OVERLAY_BUDGET, (graph.x, budget_y), (graph.right - 1, budget_y))
+        frames = list(self.frame_times)
+        if len(frames) > 1:
+            step = graph.width / max(1, self.history - 1)
+            points = [(graph.x + i * step,
+                       graph.bottom - 1 - min(graph_height - 2, ms / (budget_ms * 2) * graph_height))
+                      for i, ms in enumerate(frames)]
+            pygame.draw.lines(screen, OVERLAY_GRAPH, False, points)
+        return panel
+
+
+# Shared profiler used by the game and the caches it instruments
+profiler = Profiler()
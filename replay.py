@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay recording and playback for RETRO RACER
+
+A Simulation draws every random number from one RNG seeded at reset, so
+a run is fully described by its seed, its tick rate and the input
+bitmask of every tick. Replays store exactly that: the inputs packed two
+bits per tick and zlib-compressed, plus a CRC32 checksum of the
+simulation state every few ticks (an hour of play is about 35 KB, mostly
+checksums). Playback feeds the inputs back tick by tick and compares
+checksums, so any divergence is caught at the first checkpoint after it
+happens.
+"""
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from sim_core import BASE_TICK_RATE, POLICIES, Simulation
+
+MAGIC = b'RRPL'
+# Bumped whenever the rules change what a seed plays out (2: spawn schedule,
+# 3: spawn timer keeps its overshoot)
+VERSION = 3
+
+# magic, version, tick rate, seed, ticks, checksum interval, final checksum, checksum count
+HEADER = struct.Struct('<4sHHQIHII')
+
+# Scripted drivers that leave the simulation RNG alone, so their runs replay
+REPLAYABLE_POLICIES = ('idle', 'dodge')
+
+# Scalar state folded into each checksum
+STATE = struct.Struct('<IqddddI')
+
+DEFAULT_CHECKSUM_INTERVAL = 30
+
+
+class ReplayError(Exception):
+    """A replay file could not be read"""
+
+
+class ReplayDivergence(Exception):
+    """Playback no longer matches the recorded run"""
+
+    def __init__(self, tick, expected, actual, last_good_tick=0):
+        super().__init__(f"replay diverged between tick {last_good_tick} and tick {tick} "
+                         f"(checksum {actual:08x}, recorded {expected:08x})")
+        self.tick = tick
+        self.expected = expected
+        self.actual = actual
+        self.last_good_tick = last_good_tick
+
+
+def state_checksum(sim):
+    """CRC32 of everything that decides the rest of the run"""
+    obstacles = sim.obstacles
+    n = len(obstacles)
+    crc = zlib.crc32(STATE.pack(sim.tick, sim.score, sim.distance, sim.speed, sim.player_x,
+                                sim.obstacle_spawn_timer, n))
+    for column in (obstacles.x, obstacles.y, obstacles.kind):
+        crc = zlib.crc32(column[:n].tobytes(), crc)
+    # The RNG state catches a divergence before it changes the playfield
+    return zlib.crc32(np.asarray(sim.rng.getstate()[1], dtype=np.uint32).tobytes(), crc)
+
+
+def pack_inputs(inputs):
+    """Pack 2-bit input masks four to a byte"""
+    values = np.frombuffer(bytes(inputs), dtype=np.uint8)
+    padded = np.zeros((len(values) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(values)] = values & 3
+    return (padded[0::4] | padded[1::4] << 2 | padded[2::4] << 4 | padded[3::4] << 6).tobytes()
+
+
+def unpack_inputs(packed, ticks):
+    """Inverse of pack_inputs(); returns a uint8 array of ticks masks"""
+    packed = np.frombuffer(packed, dtype=np.uint8)
+    values = np.empty(len(packed) * 4, dtype=np.uint8)
+    for i in range(4):
+        values[i::4] = (packed >> (i * 2)) & 3
+    return values[:ticks]
+
+
+class Replay:
+    """A recorded run: seed, tick rate, per-tick inputs and state checksums"""
+
+    def __init__(self, seed, tick_rate=BASE_TICK_RATE, inputs=b'', checksums=(),
+                 checksum_interval=DEFAULT_CHECKSUM_INTERVAL, final_checksum=0):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.inputs = bytes(inputs)
+        self.checksums = list(checksums)  # state after every checksum_interval ticks
+        self.checksum_interval = checksum_interval
+        self.final_checksum = final_checksum
+
+    @property
+    def ticks(self):
+        return len(self.inputs)
+
+    def to_bytes(self):
+        """Serialize to the compact binary format"""
+        header = HEADER.pack(MAGIC, VERSION, self.tick_rate, self.seed, self.ticks,
+                             self.checksum_interval, self.final_checksum, len(self.checksums))
+        checksums = np.asarray(self.checksums, dtype='<u4').tobytes()
+        return header + checksums + zlib.compress(pack_inputs(self.inputs), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Parse the binary format"""
+        if len(data) < HEADER.size:
+            raise ReplayError("truncated replay header")
+        magic, version, tick_rate, seed, ticks, interval, final_checksum, count = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("not a RETRO RACER replay")
+        if version != VERSION:
+            raise ReplayError(f"unsupported replay version {version}")
+        offset = HEADER.size + count * 4
+        checksums = np.frombuffer(data[HEADER.size:offset], dtype='<u4').tolist()
+        try:
+            packed = zlib.decompress(data[offset:])
+        except zlib.error as e:
+            raise ReplayError(f"corrupt replay inputs: {e}")
+        if len(checksums) != count or len(packed) * 4 < ticks:
+            raise ReplayError("truncated replay")
+        inputs = unpack_inputs(packed, ticks).tobytes()
+        return cls(seed, tick_rate, inputs, checksums, interval, final_checksum)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """Step a Simulation while recording its inputs and checksums"""
+
+    def __init__(self, checksum_interval=DEFAULT_CHECKSUM_INTERVAL):
+        self.checksum_interval = checksum_interval
+        self.seed = None
+        self.tick_rate = BASE_TICK_RATE
+        self.inputs = bytearray()
+        self.checksums = []
+
+    def start(self, sim):
+        """Begin a recording from a freshly reset Simulation"""
+        if sim.seed is None:
+            raise ValueError("recording needs a seeded Simulation")
+        self.seed = sim.seed
+        self.tick_rate = sim.tick_rate
+        self.inputs = bytearray()
+        self.checksums = []
+
+    def step(self, sim, inputs):
+        """Step the simulation one tick and record it; returns its events"""
+        events = sim.step(inputs)
+        self.inputs.append(inputs & 3)
+        if len(self.inputs) % self.checksum_interval == 0:
+            self.checksums.append(state_checksum(sim))
+        return events
+
+    def finish(self, sim):
+        """Return the Replay of everything recorded so far"""
+        return Replay(self.seed, self.tick_rate, self.inputs, self.checksums,
+                      self.checksum_interval, state_checksum(sim))
+
+
+class ReplayPlayer:
+    """Step a Simulation from a Replay, checking it stays in sync"""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.inputs = replay.inputs
+        self.restart()
+
+    def restart(self, sim=None):
+        """Rewind to the first tick, resetting sim to the recorded seed"""
+        self.position = 0
+        self.last_good_tick = 0
+        if sim is not None:
+            sim.reset(self.replay.seed)
+
+    def create_simulation(self):
+        """A Simulation matching the recording's seed and tick rate"""
+        return Simulation(self.replay.seed, self.replay.tick_rate)
+
+    @property
+    def finished(self):
+        return self.position >= len(self.inputs)
+
+    def step(self, sim):
+        """Step sim with the next recorded input; returns its events
+
+        Raises ReplayDivergence when the state stops matching the recording.
+        """
+        tick = self.position + 1
+        if sim.crashed:
+            self.diverged(tick, sim)
+        events = sim.step(self.inputs[self.position])
+        self.position = tick
+        interval = self.replay.checksum_interval
+        if tick % interval == 0:
+            index = tick // interval - 1
+            if index < len(self.replay.checksums):
+                if state_checksum(sim) != self.replay.checksums[index]:
+                    self.diverged(tick, sim, self.replay.checksums[index])
+                self.last_good_tick = tick
+        if self.finished and state_checksum(sim) != self.replay.final_checksum:
+            self.diverged(tick, sim, self.replay.final_checksum)
+        return events
+
+    def diverged(self, tick, sim, expected=None):
+        if expected is None:
+            expected = self.replay.final_checksum
+        raise ReplayDivergence(tick, expected, state_checksum(sim), self.last_good_tick)
+
+    def run(self, sim=None):
+        """Play the whole replay headless as fast as possible; returns the Simulation"""
+        sim = sim or self.create_simulation()
+        while not self.finished:
+            self.step(sim)
+        return sim
+
+
+def record_headless(seed, ticks, policy, tick_rate=BASE_TICK_RATE,
+                    checksum_interval=DEFAULT_CHECKSUM_INTERVAL):
+    """Record a scripted run that stops at the first crash or after ticks
+
+    The policy must not draw from sim.rng, or playback (which only has the
+    recorded inputs) will diverge.
+    """
+    sim = Simulation(seed, tick_rate)
+    recorder = ReplayRecorder(checksum_interval)
+    recorder.start(sim)
+    while len(recorder.inputs) < ticks and not sim.crashed:
+        recorder.step(sim, policy(sim))
+    return recorder.finish(sim)
+
+
+def main(argv=None):
+    """Record a scripted run, or verify and time an existing replay"""
+    parser = argparse.ArgumentParser(description="RETRO RACER replays")
+    parser.add_argument('replay', help="replay file to verify (or write with --record)")
+    parser.add_argument('--record', action='store_true', help="record a scripted run to the file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=216000)
+    parser.add_argument('--policy', choices=REPLAYABLE_POLICIES, default='dodge')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        replay = record_headless(args.seed, args.ticks, POLICIES[args.policy])
+        replay.save(args.replay)
+        print(f"Recorded {replay.ticks} ticks to {args.replay} ({len(replay.to_bytes())} bytes)")
+        return 0
+
+    try:
+        replay = Replay.load(args.replay)
+    except (OSError, ReplayError) as e:
+        print(f"✗ {e}")
+        return 1
+    start = time.perf_counter()
+    try:
+        sim = ReplayPlayer(replay).run()
+    except ReplayDivergence as e:
+        print(f"✗ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"✓ {replay.ticks} ticks verified in {elapsed:.2f}s "
+          f"({replay.ticks / max(elapsed, 1e-9):,.0f} ticks/s); final score {sim.score}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
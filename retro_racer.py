@@ -1,3 +1,4 @@
+import argparse
 import pygame
 import random
 import math
@@ -5,15 +6,74 @@ import sys
 import time
 import numpy as np
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+from assets import AssetLoader
+from audio_stream import AudioStream
+from dirty import DirtyRects
+from engine_audio import ENGINE_BLOCK_FRAMES, EngineVoice
+from ghost_net import DEFAULT_PORT, STATE_CRASHED, STATE_RACING, STATE_WAITING, GhostClient
+from glow import Bloom, shared_glow_cache
+from layers import create_default_compositor
+from leaderboard import Leaderboard, default_leaderboard_path
+from music import MENU_TEMPO, MusicSynth, tempo_for_speed
+from parallax import Parallax
+from particles import ParticleSystem
+from profiler import profiler
+from road3d import PerspectiveRoad, curve_at, sprite_size
+from replay import Replay, ReplayDivergence, ReplayPlayer, ReplayRecorder
+from sim_core import (BASE_TICK_RATE, EVENT_CRASH, EVENT_ENGINE, EVENT_LEVEL_UP, INPUT_LEFT,
+                      INPUT_RIGHT, PLAYER_HEIGHT, PLAYER_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH,
+                      STEER_LEFT, STEER_RIGHT, Simulation)
+from sprites import SpriteAtlas
+from synth import PCMCache, SAMPLE_RATE, render_beep, render_engine
+from text_cache import shade, shared_text_cache
+from timestep import FixedTimestep
 
 # Constants
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
 FPS = 60
 
+# Process start, for the time-to-first-frame metric
+LAUNCH_TIME = time.perf_counter()
+
+# Sound played for each simulation event
+EVENT_SOUNDS = {
+    EVENT_LEVEL_UP: 'beep',
+    EVENT_ENGINE: 'engine',
+    EVENT_CRASH: 'crash',
+}
+
+# Smallest font size used at low render resolutions
+MIN_FONT_SIZE = 10
+
+# Exhaust particles per second from each pipe, per unit of speed
+EXHAUST_RATE = 8
+# Exhaust pipe offsets from the car's center line
+EXHAUST_PIPES = (-8, 8)
+# Sparks per second while the car scrapes the edge of the road
+SCRAPE_SPARK_RATE = 240
+
+# Backdrop drift in SCREEN_WIDTH units per second, and how far the sky
+# turns per unit of road bend
+BACKDROP_DRIFT = 20
+CURVE_PARALLAX = 2.0
+
+# Leaderboard panel: width and row spacing in screen layout units
+LEADERBOARD_WIDTH = 220
+LEADERBOARD_ROW = 18
+
+
+def init_pygame():
+    """Initialize pygame and the mixer (safe to call more than once)"""
+    if not pygame.get_init():
+        pygame.init()
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+
+
+def sim_attribute(name):
+    """Expose a Simulation attribute on the renderer"""
+    return property(lambda self: getattr(self.sim, name),
+                    lambda self, value: setattr(self.sim, name, value))
+
 # Colors (Enhanced Neon/Synthwave palette)
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -23,7 +83,6 @@ NEON_PURPLE = (138, 43, 226)
 NEON_GREEN = (57, 255, 20)
 NEON_ORANGE = (255, 165, 0)
 DARK_PURPLE = (25, 25, 112)
-GRID_COLOR = (75, 0, 130)
 
 # Gradient colors
 PURPLE_DARK = (25, 25, 112)
@@ -33,54 +92,45 @@ CYAN_DARK = (0, 139, 139)
 BLUE_DARK = (0, 0, 139)
 BLUE_LIGHT = (0, 191, 255)
 
+# Text glow offsets
+BUTTON_GLOW_OFFSETS = ((1, 1), (-1, -1), (1, -1), (-1, 1))
+TITLE_SHADOW_OFFSETS = tuple((i, i) for i in range(5, 0, -1))
+GAME_OVER_GLOW_OFFSETS = tuple((i // 2, i // 2) for i in range(8, 0, -1))
+
 class SynthSounds:
     """Generate retro synth-style sound effects"""
     
+    # Rendered PCM is cached on disk so warm starts skip synthesis
+    pcm_cache = PCMCache()
+    
     @staticmethod
     def generate_beep(frequency=440, duration=0.1, volume=0.3):
         """Generate a simple beep sound"""
-        sample_rate = 22050
-        frames = int(duration * sample_rate)
-        
-        # Create stereo sound array
-        arr = np.zeros((frames, 2), dtype=np.int16)
-        
-        for i in range(frames):
-            wave = 4096 * math.sin(frequency * 2 * math.pi * i / sample_rate)
-            wave = int(wave * volume)
-            arr[i] = [wave, wave]  # Stereo
-        
-        sound = pygame.sndarray.make_sound(arr)
-        return sound
+        init_pygame()
+        pcm = SynthSounds.pcm_cache.get_or_render(
+            'beep', render_beep, frequency=frequency, duration=duration,
+            volume=volume, sample_rate=SAMPLE_RATE)
+        return pygame.sndarray.make_sound(pcm)
     
     @staticmethod
     def generate_engine_sound(base_freq=80, duration=0.2, volume=0.2):
         """Generate engine-like sound"""
-        sample_rate = 22050
-        frames = int(duration * sample_rate)
-        
-        # Create stereo sound array
-        arr = np.zeros((frames, 2), dtype=np.int16)
-        
-        for i in range(frames):
-            # Mix multiple frequencies for engine sound
-            wave1 = math.sin(base_freq * 2 * math.pi * i / sample_rate)
-            wave2 = math.sin((base_freq * 1.5) * 2 * math.pi * i / sample_rate)
-            wave3 = math.sin((base_freq * 2) * 2 * math.pi * i / sample_rate)
-            combined = (wave1 + wave2 * 0.5 + wave3 * 0.3) / 2.8
-            wave = int(4096 * combined * volume)
-            arr[i] = [wave, wave]  # Stereo
-        
-        sound = pygame.sndarray.make_sound(arr)
-        return sound
+        init_pygame()
+        pcm = SynthSounds.pcm_cache.get_or_render(
+            'engine', render_engine, base_freq=base_freq, duration=duration,
+            volume=volume, sample_rate=SAMPLE_RATE)
+        return pygame.sndarray.make_sound(pcm)
 
 class RetroButton:
     """Retro-style chunky pixel button with glow effects"""
     
-    def __init__(self, x, y, width, height, text, font, base_color, glow_color):
+    def __init__(self, x, y, width, height, text, font, base_color, glow_color, text_cache=None,
+                 glow=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.font = font
+        self.text_cache = text_cache or shared_text_cache()
+        self.glow = glow or shared_glow_cache()
         self.base_color = base_color
         self.glow_color = glow_color
         self.is_hovered = False
@@ -99,19 +149,13 @@ class RetroButton:
             self.glow_intensity = max(self.glow_intensity - dt * 3, 0.0)
     
     def draw(self, screen):
-        """Draw the retro button with effects"""
+        """Draw the retro button with effects; returns the Rect touched"""
         # Flickering effect
         flicker = 1.0 if int(self.flicker_timer * 10) % 20 < 18 else 0.7
         
-        # Glow effect (multiple layers)
+        # Glow effect (its layers are pre-rendered; intensity is the blit alpha)
         if self.glow_intensity > 0:
-            glow_alpha = int(self.glow_intensity * 100)
-            for i in range(3, 0, -1):
-                glow_rect = self.rect.inflate(i * 4, i * 4)
-                glow_surf = pygame.Surface((glow_rect.width, glow_rect.height))
-                glow_surf.set_alpha(glow_alpha // (i + 1))
-                glow_surf.fill(self.glow_color)
-                screen.blit(glow_surf, glow_rect)
+            self.glow.draw_halo(screen, self.rect, self.glow_color, self.glow_intensity)
         
         # Main button (chunky pixel style)
         button_color = tuple(int(c * flicker) for c in self.base_color)
@@ -127,313 +171,421 @@ class RetroButton:
         highlight_color = tuple(min(255, int(c * 1.5)) for c in button_color)
         pygame.draw.rect(screen, highlight_color, highlight_rect, 1)
         
-        # Text with glow
-        text_surface = self.font.render(self.text, True, WHITE)
+        # Text (cached), with the glow stack baked into one surface
+        text_surface = self.text_cache.render(self.font, self.text, WHITE)
         text_rect = text_surface.get_rect(center=self.rect.center)
         
-        # Text glow
         if self.glow_intensity > 0:
-            for offset in [(1, 1), (-1, -1), (1, -1), (-1, 1)]:
-                glow_text = self.font.render(self.text, True, self.glow_color)
-                glow_rect = text_rect.copy()
-                glow_rect.x += offset[0]
-                glow_rect.y += offset[1]
-                screen.blit(glow_text, glow_rect)
+            glow_surface, origin = self.text_cache.render_glow(
+                self.font, self.text, WHITE, self.glow_color, BUTTON_GLOW_OFFSETS)
+            screen.blit(glow_surface, (text_rect.x - origin[0], text_rect.y - origin[1]))
+        else:
+            screen.blit(text_surface, text_rect)
         
-        screen.blit(text_surface, text_rect)
+        # Outermost glow layer
+        return self.rect.inflate(12, 12)
     
     def is_clicked(self, mouse_pos, mouse_clicked):
         """Check if button was clicked"""
         return self.rect.collidepoint(mouse_pos) and mouse_clicked
 class RetroRacer:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    """Renderer, audio and input front end over the simulation core"""
+    
+    # Game rules and state live in the pygame-free Simulation
+    score = sim_attribute('score')
+    distance = sim_attribute('distance')
+    speed = sim_attribute('speed')
+    time_elapsed = sim_attribute('time_elapsed')
+    player_x = sim_attribute('player_x')
+    player_y = sim_attribute('player_y')
+    obstacles = sim_attribute('obstacles')
+    
+    def __init__(self, seed=None, tick_rate=BASE_TICK_RATE, render_fps=FPS, max_catch_up=8,
+                 dirty_rects=False, dirty_threshold=0.5, profile_out=None,
+                 record_path=None, replay=None, replay_speed=1.0, launch_time=None, music=True,
+                 engine_sound=True, road_3d=False, render_size=None, bloom=False, ghost=None,
+                 leaderboard_path=None):
+        # Time-to-first-frame is measured from launch_time (default: now)
+        self.launch_time = launch_time if launch_time is not None else time.perf_counter()
+        self.startup_times = {}
+        init_pygame()
+        
+        # Everything is drawn at the render size, laid out in SCREEN_WIDTH x
+        # SCREEN_HEIGHT units scaled by view_scale; pygame.SCALED upscales a
+        # smaller frame to the window by whole pixels and maps the mouse back
+        self.render_size = tuple(render_size or (SCREEN_WIDTH, SCREEN_HEIGHT))
+        if self.render_size[0] * SCREEN_HEIGHT != self.render_size[1] * SCREEN_WIDTH:
+            raise ValueError(f"render size {self.render_size} must be 4:3 like "
+                             f"{SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+        self.view_scale = self.render_size[0] / SCREEN_WIDTH
+        flags = pygame.SCALED if self.view_scale != 1.0 else 0
+        self.screen = pygame.display.set_mode(self.render_size, flags)
         pygame.display.set_caption("RETRO RACER - 80s Style")
         self.clock = pygame.time.Clock()
         
         # Game states
-        self.game_state = "START"  # START, PLAYING, GAME_OVER
-        self.score = 0
-        self.distance = 0
-        self.speed = 5
-        self.time_elapsed = 0
+        self.game_state = "LOADING"  # LOADING, START, PLAYING, GAME_OVER
+        self.seed = seed
+        self.inputs = 0
         self.dt = 0
         
-        # Player car
-        self.player_x = SCREEN_WIDTH // 2
-        self.player_y = SCREEN_HEIGHT - 100
-        self.player_speed = 8
+        # Replays: record each run to record_path, or play one back at replay_speed
+        self.record_path = record_path
+        self.recorder = ReplayRecorder() if record_path else None
+        self.playback = ReplayPlayer(replay) if replay is not None else None
+        self.replay_speed = replay_speed
+        if self.playback is not None:
+            tick_rate = replay.tick_rate
+            max_catch_up = int(max_catch_up * max(1.0, replay_speed))
+        self.sim = Simulation(seed, tick_rate)
+        
+        # Ghost race: stream this car to a relay at ghost=(host, port) and
+        # draw everyone else racing the same seed; the network runs on its own thread
+        self.ghost = None
+        if ghost is not None:
+            if seed is None:
+                raise ValueError("a ghost race needs a seed every racer shares")
+            self.ghost = GhostClient(*ghost, seed=seed).start()
+        self.ghost_error_reported = False
+        
+        # Finished runs go to a SQLite leaderboard at leaderboard_path, written
+        # on its own thread; the menus draw its cached top runs
+        self.leaderboard = Leaderboard(leaderboard_path).start() if leaderboard_path else None
+        self.leaderboard_place = None
+        
+        # Fixed-timestep simulation, rendered with interpolation (0 = uncapped fps)
+        self.timestep = FixedTimestep(tick_rate, max_catch_up)
+        self.render_fps = render_fps
+        self.alpha = 1.0
+        
+        # Optional dirty-rect presentation instead of a full flip per frame
+        self.dirty = DirtyRects(self.render_size, dirty_threshold) if dirty_rects else None
+        self.presented_state = None
+        
+        # Frame profiling (enable with profiler.enabled; F3 toggles the overlay)
+        self.profile_out = profile_out
         
         # Road and simple elements
         self.road_lines = []
         
-        # Obstacles
-        self.obstacles = []
-        self.obstacle_spawn_timer = 0
+        # Glowing HUD animation timers
+        self.hud_glow_timer = 0
+        self.speed_flicker = 0
+        
+        # Static layers (background gradient, road surface) are cached
+        self.layers = create_default_compositor(self.render_size, {
+            'sky_top': PURPLE_DARK,
+            'sky_bottom': PINK_LIGHT,
+            'asphalt': (40, 40, 40),
+            'road_edge': NEON_CYAN,
+        })
+        
+        # Optional pseudo-3D road; the simulation stays flat either way
+        self.road = PerspectiveRoad(self.render_size) if road_3d else None
+        self.road_scroll = 0.0
+        self.road_curve = 0.0
+        
+        # Stars, mountains and grid behind the road, built with the static layers
+        self.backdrop = None
+        self.backdrop_clock = 0.0
+        
+        # Optional bloom over the finished frame; its buffers are reused every frame
+        self.bloom = Bloom() if bloom else None
+        
+        # Sounds, fonts, sprites and text are prepared in the background
+        # while a loading screen is shown; see start_asset_warmup()
+        self.sounds = dict.fromkeys(('beep', 'select', 'crash', 'engine'))
+        self.sound_enabled = False
+        
+        # Background music streams from a feeder thread once sound is ready
+        self.music_enabled = music
+        self.music = None
+        self.music_synth = None
+        
+        # The engine is a continuous voice that follows the car speed
+        self.engine_sound_enabled = engine_sound
+        self.engine = None
+        self.engine_voice = None
+        self.sprites = None
+        
+        # Crash debris, exhaust and sparks share one particle pool
+        self.particles = ParticleSystem()
+        self.exhaust_due = 0.0
+        self.sparks_due = 0.0
+        self.text_cache = shared_text_cache()
+        self.glow = shared_glow_cache()
+        self.loading_font = pygame.font.Font(None, self.px(36))
+        # Rendered before the warm-up starts: the loader fills the text cache
+        # from its own thread while the loading screen is up
+        self.loading_title = self.text_cache.render(self.loading_font, "LOADING", NEON_CYAN)
+        self.applied_assets = set()
+        self.start_asset_warmup()
         
-        # Sound effects (with fallback)
-        self.sounds = {}
+        # Initialize elements
+        self.init_road_lines()
+    
+    def start_asset_warmup(self):
+        """Queue the expensive startup work on the background loader"""
+        self.assets = AssetLoader()
+        # Ordered by when the game needs them: the start screen first
+        self.assets.submit('fonts', self.load_fonts, self.view_scale)
+        self.assets.submit('layers', self.warm_layers)
+        self.assets.submit('text', self.warm_text)
+        self.assets.submit('sprites', self.load_sprites)
+        self.assets.submit('sounds', self.load_sounds)
+    
+    @staticmethod
+    def load_fonts(scale=1.0):
+        """Open the pixel-style fonts, sized for the render resolution"""
+        def size(points):
+            return max(MIN_FONT_SIZE, int(points * scale))
         try:
-            self.sounds = {
+            return {
+                'title': pygame.font.Font(None, size(72)),
+                'ui': pygame.font.Font(None, size(36)),
+                'small': pygame.font.Font(None, size(24)),
+                'hud': pygame.font.Font(None, size(28)),
+            }
+        except (pygame.error, OSError):
+            return {
+                'title': pygame.font.SysFont('Times New Roman', size(72), bold=True),
+                'ui': pygame.font.SysFont('Times New Roman', size(36), bold=True),
+                'small': pygame.font.SysFont('courier', size(24), bold=True),
+                'hud': pygame.font.SysFont('courier', size(28), bold=True),
+            }
+    
+    def warm_layers(self):
+        """Render the cached background and road layers and the parallax strips"""
+        self.layers.get('background')
+        self.layers.get('road')
+        if self.road is not None:
+            # The perspective ground covers everything below its horizon
+            self.backdrop = Parallax(self.render_size, self.road.horizon, ground=False)
+        else:
+            self.backdrop = Parallax(self.render_size, self.px(SCREEN_HEIGHT // 2))
+    
+    def warm_text(self):
+        """Pre-render the start screen, button and HUD text"""
+        fonts = self.assets.get('fonts')
+        cache = self.text_cache
+        cache.render_glow(fonts['title'], "RETRO RACER", NEON_PINK,
+                          shade(NEON_PINK, 0.3), TITLE_SHADOW_OFFSETS)
+        cache.render(fonts['ui'], "ARCADE STYLE", NEON_CYAN)
+        for label in ("START GAME", "PLAY AGAIN", "QUIT GAME"):
+            cache.render(fonts['ui'], label, WHITE)
+        # Every character the HUD counters can show, in each HUD color
+        scratch = pygame.Surface((1, 1))
+        charset = "SCOREPDLVITMKH/: 0123456789"
+        for color in (NEON_CYAN, NEON_PINK, NEON_GREEN, NEON_ORANGE, NEON_PURPLE):
+            cache.draw_glyphs(scratch, fonts['ui'], charset, (0, 0), color)
+    
+    @staticmethod
+    def load_sprites():
+        """Rasterize vehicles and barriers into a sprite atlas"""
+        sprites = SpriteAtlas()
+        sprites.warm([('player', 32, 56), ('ghost', 32, 56), ('car', 30, 40), ('barrier', 40, 20)])
+        return sprites
+    
+    @staticmethod
+    def load_sounds():
+        """Synthesize the sound effects; returns (sounds, enabled)"""
+        try:
+            return {
                 'beep': SynthSounds.generate_beep(880, 0.1, 0.3),
                 'select': SynthSounds.generate_beep(1200, 0.15, 0.4),
                 'crash': SynthSounds.generate_engine_sound(60, 0.5, 0.5),
                 'engine': SynthSounds.generate_engine_sound(100, 0.3, 0.2)
-            }
-            self.sound_enabled = True
+            }, True
         except Exception as e:
             print(f"Warning: Could not initialize sounds: {e}")
-            self.sound_enabled = False
-            # Create dummy sound objects
-            self.sounds = {
-                'beep': None,
-                'select': None,
-                'crash': None,
-                'engine': None
-            }
-        
-        # Fonts (pixel-style)
-        try:
-            self.title_font = pygame.font.Font(None, 72)
-            self.ui_font = pygame.font.Font(None, 36)
-            self.small_font = pygame.font.Font(None, 24)
-            self.hud_font = pygame.font.Font(None, 28)
-        except:
-            self.title_font = pygame.font.SysFont('Times New Roman', 72, bold=True)
-            self.ui_font = pygame.font.SysFont('Times New Roman', 36, bold=True)
-            self.small_font = pygame.font.SysFont('courier', 24, bold=True)
-            self.hud_font = pygame.font.SysFont('courier', 28, bold=True)
-        
-        # Retro buttons
-        self.start_button = RetroButton(SCREEN_WIDTH//2 - 100, 400, 200, 50, 
-                                      "START GAME", self.ui_font, NEON_PINK, PINK_LIGHT)
-        self.restart_button = RetroButton(SCREEN_WIDTH//2 - 100, 400, 200, 50, 
-                                        "PLAY AGAIN", self.ui_font, NEON_CYAN, BLUE_LIGHT)
-        self.quit_button = RetroButton(SCREEN_WIDTH//2 - 100, 470, 200, 50, 
-                                     "QUIT GAME", self.ui_font, NEON_PURPLE, PURPLE_LIGHT)
-        
-        # Initialize elements
-        self.init_road_lines()
+            return dict.fromkeys(('beep', 'select', 'crash', 'engine')), False
+    
+    def apply_asset(self, name):
+        """Install a finished asset on the game (once)"""
+        if name in self.applied_assets:
+            return
+        result = self.assets.get(name)
+        if name == 'fonts':
+            self.title_font = result['title']
+            self.ui_font = result['ui']
+            self.small_font = result['small']
+            self.hud_font = result['hud']
+            self.create_buttons()
+        elif name == 'sprites':
+            self.sprites = result
+        elif name == 'sounds':
+            self.sounds, self.sound_enabled = result
+            if self.sound_enabled and self.music_enabled:
+                self.start_music()
+            if self.sound_enabled and self.engine_sound_enabled:
+                self.start_engine()
+        self.applied_assets.add(name)
+    
+    def require_assets(self, *names):
+        """Block until the named assets (default: all) are ready and installed"""
+        for name in names or tuple(self.assets.futures):
+            self.apply_asset(name)
+    
+    def apply_ready_assets(self):
+        """Install whatever the loader has finished, without blocking"""
+        for name in self.assets.futures:
+            if name not in self.applied_assets and self.assets.ready(name):
+                self.apply_asset(name)
+    
+    def update_loading(self):
+        """Go to the start screen once the assets it draws with are ready"""
+        if self.game_state == "LOADING" and self.assets.ready('fonts', 'layers', 'text'):
+            # Install them before this frame draws the start screen; they are
+            # ready, so this does not block
+            self.require_assets('fonts', 'layers', 'text')
+            self.game_state = "START"
+    
+    def start_music(self):
+        """Start the procedural soundtrack on its own channel"""
+        self.music_synth = MusicSynth(tempo=MENU_TEMPO)
+        self.music = AudioStream(self.music_synth.render)
+        self.music.start()
+    
+    def update_music(self):
+        """Follow the car speed while playing; slow groove on the menus"""
+        if self.music_synth is not None:
+            if self.game_state == "PLAYING":
+                self.music_synth.tempo = tempo_for_speed(self.speed)
+            else:
+                self.music_synth.tempo = MENU_TEMPO
+    
+    def start_engine(self):
+        """Start the speed-tracking engine voice on its own channel"""
+        self.engine_voice = EngineVoice()
+        self.engine = AudioStream(self.engine_voice.render, channel=1,
+                                  block_frames=ENGINE_BLOCK_FRAMES)
+        self.engine.start()
+    
+    def update_engine(self):
+        """Rev with the car while playing; fade out on the menus and after a crash"""
+        if self.engine_voice is not None:
+            self.engine_voice.speed = self.speed
+            self.engine_voice.level = 1.0 if self.game_state == "PLAYING" else 0.0
+    
+    def create_buttons(self):
+        """Build the menu buttons once the UI font is loaded"""
+        px = self.px
+        self.start_button = RetroButton(px(SCREEN_WIDTH//2 - 100), px(400), px(200), px(50),
+                                      "START GAME", self.ui_font, NEON_PINK, PINK_LIGHT,
+                                      self.text_cache)
+        self.restart_button = RetroButton(px(SCREEN_WIDTH//2 - 100), px(400), px(200), px(50),
+                                        "PLAY AGAIN", self.ui_font, NEON_CYAN, BLUE_LIGHT,
+                                        self.text_cache)
+        self.quit_button = RetroButton(px(SCREEN_WIDTH//2 - 100), px(470), px(200), px(50),
+                                     "QUIT GAME", self.ui_font, NEON_PURPLE, PURPLE_LIGHT,
+                                     self.text_cache)
     
     def init_road_lines(self):
         """Initialize road center lines"""
         for i in range(0, SCREEN_HEIGHT + 50, 50):
             self.road_lines.append(i)
     
-    def init_stars(self):
-        """Initialize background stars"""
-        for _ in range(50):
-            star = {
-                'x': random.randint(0, SCREEN_WIDTH),
-                'y': random.randint(0, SCREEN_HEIGHT // 2),
-                'brightness': random.uniform(0.3, 1.0),
-                'twinkle': random.uniform(0, 2 * math.pi)
-            }
-            self.stars.append(star)
+    def px(self, value):
+        """A length or coordinate in SCREEN_WIDTH x SCREEN_HEIGHT units, in render pixels"""
+        return int(value * self.view_scale)
+    
+    def mark(self, rect):
+        """Record a changed screen area for dirty-rect updates"""
+        if self.dirty is not None:
+            self.dirty.add(rect)
+        return rect
+    
+    def present(self):
+        """Show the frame: dirty rects when enabled, otherwise a full flip"""
+        self.record_startup_time()
+        if self.dirty is None:
+            pygame.display.flip()
+            return
+        if self.game_state != self.presented_state:
+            self.dirty.invalidate()
+            self.presented_state = self.game_state
+        self.dirty.present()
+    
+    def record_startup_time(self):
+        """Note when the first frame and the first start screen are shown"""
+        times = self.startup_times
+        since_launch = (time.perf_counter() - self.launch_time) * 1000.0
+        if 'first_frame' not in times:
+            times['first_frame'] = since_launch
+        if self.game_state == "START" and 'start_screen' not in times:
+            times['start_screen'] = since_launch
+            if profiler.enabled:
+                print(f"Startup: first frame {times['first_frame']:.0f} ms, "
+                      f"start screen {times['start_screen']:.0f} ms")
+    
+    def draw_loading_screen(self):
+        """Minimal loading screen: title and a progress bar"""
+        self.screen.fill(BLACK)
+        title = self.loading_title
+        px = self.px
+        self.screen.blit(title, title.get_rect(center=(px(SCREEN_WIDTH // 2), px(SCREEN_HEIGHT // 2 - 30))))
+        bar = pygame.Rect(px(SCREEN_WIDTH // 2 - 150), px(SCREEN_HEIGHT // 2), px(300), px(16))
+        pygame.draw.rect(self.screen, NEON_PINK, bar, 2)
+        fill = bar.inflate(-px(6), -px(6))
+        fill.width = int(fill.width * self.assets.progress())
+        self.screen.fill(NEON_PINK, fill)
+        self.mark(self.screen.get_rect())
     
     def play_sound(self, sound_name):
         """Play a sound with error handling"""
         if self.sound_enabled and sound_name in self.sounds and self.sounds[sound_name]:
             try:
                 self.sounds[sound_name].play()
-            except:
+            except pygame.error:
                 pass  # Silently ignore sound errors
     
-    def init_mountains(self):
-        """Initialize parallax mountain layers"""
-        # Far mountains
-        for i in range(0, SCREEN_WIDTH + 100, 80):
-            self.far_mountains.append({
-                'x': i,
-                'height': random.randint(50, 100)
-            })
-        
-        # Near mountains
-        for i in range(0, SCREEN_WIDTH + 60, 60):
-            self.near_mountains.append({
-                'x': i,
-                'height': random.randint(80, 150)
-            })
-    
-    def draw_gradient_background(self):
-        """Draw gradient background from purple to pink"""
-        for y in range(SCREEN_HEIGHT):
-            # Calculate gradient ratio
-            ratio = y / SCREEN_HEIGHT
-            
-            # Interpolate between purple and pink
-            r = int(PURPLE_DARK[0] + (PINK_LIGHT[0] - PURPLE_DARK[0]) * ratio)
-            g = int(PURPLE_DARK[1] + (PINK_LIGHT[1] - PURPLE_DARK[1]) * ratio)
-            b = int(PURPLE_DARK[2] + (PINK_LIGHT[2] - PURPLE_DARK[2]) * ratio)
-            
-            color = (min(255, r), min(255, g), min(255, b))
-            pygame.draw.line(self.screen, color, (0, y), (SCREEN_WIDTH, y))
-    
-    def draw_stars(self):
-        """Draw twinkling stars"""
-        for star in self.stars:
-            star['twinkle'] += 0.1
-            brightness = star['brightness'] * (0.5 + 0.5 * math.sin(star['twinkle']))
-            color = tuple(int(255 * brightness) for _ in range(3))
-            pygame.draw.circle(self.screen, color, (int(star['x']), int(star['y'])), 1)
-    
-    def draw_parallax_mountains(self):
-        """Draw parallax scrolling mountains"""
-        # Far mountains (slower parallax)
-        for mountain in self.far_mountains:
-            mountain_x = (mountain['x'] - self.horizon_offset * 0.2) % (SCREEN_WIDTH + 100)
-            points = [
-                (mountain_x - 40, SCREEN_HEIGHT // 3),
-                (mountain_x, SCREEN_HEIGHT // 3 - mountain['height']),
-                (mountain_x + 40, SCREEN_HEIGHT // 3)
-            ]
-            pygame.draw.polygon(self.screen, PURPLE_LIGHT, points)
-        
-        # Near mountains (faster parallax)
-        for mountain in self.near_mountains:
-            mountain_x = (mountain['x'] - self.horizon_offset * 0.5) % (SCREEN_WIDTH + 60)
-            points = [
-                (mountain_x - 30, SCREEN_HEIGHT // 2),
-                (mountain_x, SCREEN_HEIGHT // 2 - mountain['height']),
-                (mountain_x + 30, SCREEN_HEIGHT // 2)
-            ]
-            pygame.draw.polygon(self.screen, DARK_PURPLE, points)
-    
-    def draw_animated_grid(self):
-        """Draw animated grid overlay"""
-        grid_size = 40
-        
-        # Vertical lines
-        for x in range(0, SCREEN_WIDTH, grid_size):
-            for y in range(int(self.grid_offset), SCREEN_HEIGHT, grid_size):
-                if y < SCREEN_HEIGHT // 2:  # Only in upper portion
-                    alpha = int(100 * (1 - y / (SCREEN_HEIGHT // 2)))
-                    color = (*GRID_COLOR, alpha)
-                    pygame.draw.line(self.screen, GRID_COLOR, (x, y), (x, y + 20), 1)
-        
-        # Horizontal lines
-        for y in range(int(self.grid_offset), SCREEN_HEIGHT // 2, grid_size):
-            alpha = int(100 * (1 - y / (SCREEN_HEIGHT // 2)))
-            pygame.draw.line(self.screen, GRID_COLOR, (0, y), (SCREEN_WIDTH, y), 1)
-        
-        self.grid_offset += 1
-        if self.grid_offset >= grid_size:
-            self.grid_offset = 0
-    
     def draw_simple_road(self):
         """Draw simple road without complex perspective"""
-        road_width = 300
-        road_left = SCREEN_WIDTH // 2 - road_width // 2
-        road_right = SCREEN_WIDTH // 2 + road_width // 2
-        
-        # Road surface
-        road_rect = pygame.Rect(road_left, 0, road_width, SCREEN_HEIGHT)
-        pygame.draw.rect(self.screen, (40, 40, 40), road_rect)
+        # Asphalt and edges come from the cached road layer
+        self.layers.blit(self.screen, 'road')
         
-        # Road edges
-        pygame.draw.line(self.screen, NEON_CYAN, (road_left, 0), (road_left, SCREEN_HEIGHT), 4)
-        pygame.draw.line(self.screen, NEON_CYAN, (road_right, 0), (road_right, SCREEN_HEIGHT), 4)
-        
-        # Center line stripes
-        for i, line_y in enumerate(self.road_lines):
+        # Center line stripes are the only moving part
+        px = self.px
+        line_x, line_width, line_length = px(SCREEN_WIDTH // 2 - 3), px(6), px(40)
+        for line_y in self.road_lines:
             if 0 <= line_y <= SCREEN_HEIGHT:
-                pygame.draw.rect(self.screen, NEON_PINK, 
-                               (SCREEN_WIDTH // 2 - 3, line_y, 6, 40))
+                self.screen.fill(NEON_PINK, (line_x, px(line_y), line_width, line_length))
+        self.mark(pygame.Rect(line_x, 0, line_width, self.render_size[1]))
         
         # Move road lines
         for i in range(len(self.road_lines)):
-            self.road_lines[i] += self.speed
+            self.road_lines[i] += self.speed * BASE_TICK_RATE * self.dt
             if self.road_lines[i] > SCREEN_HEIGHT:
                 self.road_lines[i] = -50
+    def draw_perspective_road(self):
+        """Draw the pseudo-3D road, bending with the distance travelled"""
+        self.road_curve = curve_at(self.distance)
+        self.mark(self.road.draw(self.screen, self.road_scroll, self.road_curve))
+    
+    def draw_projected_obstacles(self):
+        """Draw obstacles placed and scaled through the perspective tables"""
+        sprites = self.obstacles.sprites(self.alpha)
+        if not sprites:
+            return
+        kinds, widths, heights, xs, ys = zip(*sprites)
+        screen_x, screen_y, scale, visible = self.road.project(xs, ys, self.road_curve)
+        # Farthest first, so nearer obstacles are drawn over them
+        batch = []
+        for i in np.argsort(ys).tolist():
+            if visible[i]:
+                width, height = sprite_size(widths[i], heights[i], scale[i])
+                batch.append((kinds[i], width, height, int(screen_x[i]), int(screen_y[i])))
+        rects = self.sprites.blits(self.screen, batch, doreturn=self.dirty is not None)
+        if rects:
+            self.dirty.add_all(rects)
+    
     def draw_simple_obstacles(self):
         """Draw realistic obstacles with proper car shapes and wheels"""
-        for obstacle in self.obstacles:
-            if obstacle['type'] == 'car':
-                # Enemy car with realistic design
-                car_width = obstacle['width']
-                car_height = obstacle['height']
-                
-                # Car body (main rectangle)
-                car_rect = pygame.Rect(obstacle['x'] - car_width//2, 
-                                     obstacle['y'] - car_height//2,
-                                     car_width, car_height)
-                pygame.draw.rect(self.screen, NEON_PURPLE, car_rect)
-                
-                # Car roof (smaller rectangle)
-                roof_width = car_width - 6
-                roof_height = car_height // 3
-                roof_rect = pygame.Rect(obstacle['x'] - roof_width//2, 
-                                       obstacle['y'] - car_height//2 + 6, 
-                                       roof_width, roof_height)
-                pygame.draw.rect(self.screen, (100, 30, 150), roof_rect)  # Darker purple
-                
-                # Windows
-                if car_width > 20:  # Only draw details if car is large enough
-                    # Front windshield
-                    windshield_rect = pygame.Rect(obstacle['x'] - (roof_width-3)//2, 
-                                                obstacle['y'] - car_height//2 + 8, 
-                                                roof_width - 3, 6)
-                    pygame.draw.rect(self.screen, NEON_PINK, windshield_rect)
-                    
-                    # Rear window
-                    rear_window_rect = pygame.Rect(obstacle['x'] - (roof_width-3)//2, 
-                                                 obstacle['y'] - car_height//2 + roof_height - 1, 
-                                                 roof_width - 3, 4)
-                    pygame.draw.rect(self.screen, NEON_PINK, rear_window_rect)
-                
-                # Car outline
-                pygame.draw.rect(self.screen, WHITE, car_rect, 2)
-                if car_width > 15:
-                    pygame.draw.rect(self.screen, WHITE, roof_rect, 1)
-                
-                # Headlights (if car is large enough)
-                if car_width > 20:
-                    pygame.draw.circle(self.screen, WHITE, 
-                                     (obstacle['x'] - 6, obstacle['y'] - car_height//2 + 3), 2)
-                    pygame.draw.circle(self.screen, WHITE, 
-                                     (obstacle['x'] + 6, obstacle['y'] - car_height//2 + 3), 2)
-                
-                # Wheels (4 wheels positioned correctly)
-                wheel_color = (60, 60, 60)  # Dark gray
-                wheel_rim_color = (150, 150, 150)  # Light gray
-                wheel_size = max(3, car_width // 8)
-                rim_size = max(2, wheel_size - 1)
-                
-                # Front wheels
-                front_wheel_y = obstacle['y'] - car_height//2 + 8
-                pygame.draw.circle(self.screen, wheel_color, 
-                                 (obstacle['x'] - car_width//2 - 1, front_wheel_y), wheel_size)
-                pygame.draw.circle(self.screen, wheel_rim_color, 
-                                 (obstacle['x'] - car_width//2 - 1, front_wheel_y), rim_size)
-                pygame.draw.circle(self.screen, wheel_color, 
-                                 (obstacle['x'] + car_width//2 + 1, front_wheel_y), wheel_size)
-                pygame.draw.circle(self.screen, wheel_rim_color, 
-                                 (obstacle['x'] + car_width//2 + 1, front_wheel_y), rim_size)
-                
-                # Rear wheels
-                rear_wheel_y = obstacle['y'] + car_height//2 - 8
-                pygame.draw.circle(self.screen, wheel_color, 
-                                 (obstacle['x'] - car_width//2 - 1, rear_wheel_y), wheel_size)
-                pygame.draw.circle(self.screen, wheel_rim_color, 
-                                 (obstacle['x'] - car_width//2 - 1, rear_wheel_y), rim_size)
-                pygame.draw.circle(self.screen, wheel_color, 
-                                 (obstacle['x'] + car_width//2 + 1, rear_wheel_y), wheel_size)
-                pygame.draw.circle(self.screen, wheel_rim_color, 
-                                 (obstacle['x'] + car_width//2 + 1, rear_wheel_y), rim_size)
-                
-            else:  # barrier
-                # Keep barriers simple
-                barrier_rect = pygame.Rect(obstacle['x'] - obstacle['width']//2, 
-                                         obstacle['y'] - obstacle['height']//2,
-                                         obstacle['width'], obstacle['height'])
-                pygame.draw.rect(self.screen, NEON_GREEN, barrier_rect)
-                
-                # Barrier stripes
-                for i in range(0, obstacle['width'], 8):
-                    stripe_rect = pygame.Rect(obstacle['x'] - obstacle['width']//2 + i, 
-                                            obstacle['y'] - obstacle['height']//2,
-                                            4, obstacle['height'])
-                    pygame.draw.rect(self.screen, WHITE, stripe_rect)
+        # Cars and barriers are pre-rendered, so this is a single blits() call
+        rects = self.sprites.blits(self.screen, self.obstacles.sprites(self.alpha),
+                                   doreturn=self.dirty is not None, scale=self.view_scale)
+        if rects:
+            self.dirty.add_all(rects)
     
     def draw_glowing_hud(self):
         """Draw glowing HUD with pixel fonts"""
@@ -443,17 +595,10 @@ class RetroRacer:
         # Base glow intensity
         glow_base = 0.7 + 0.3 * math.sin(self.hud_glow_timer * 2)
         
-        # HUD background panel
-        hud_rect = pygame.Rect(10, 10, 250, 120)
-        hud_surf = pygame.Surface((hud_rect.width, hud_rect.height))
-        hud_surf.set_alpha(100)
-        hud_surf.fill(DARK_PURPLE)
-        self.screen.blit(hud_surf, hud_rect)
-        
-        # HUD border glow
-        for i in range(3):
-            border_rect = hud_rect.inflate(i * 2, i * 2)
-            pygame.draw.rect(self.screen, NEON_CYAN, border_rect, 1)
+        # HUD background panel and border glow, pre-rendered together
+        px = self.px
+        hud_rect = pygame.Rect(px(10), px(10), px(250), px(120))
+        self.mark(self.glow.draw_panel(self.screen, hud_rect, DARK_PURPLE, NEON_CYAN))
         
         # Score with glow
         score_text = f"SCORE: {self.score:06d}"
@@ -474,16 +619,8 @@ class RetroRacer:
         self.draw_glowing_text(time_text, self.hud_font, 20, 95, NEON_ORANGE, glow_base)
         
         # Right side HUD
-        right_hud_rect = pygame.Rect(SCREEN_WIDTH - 200, 10, 180, 80)
-        right_hud_surf = pygame.Surface((right_hud_rect.width, right_hud_rect.height))
-        right_hud_surf.set_alpha(100)
-        right_hud_surf.fill(DARK_PURPLE)
-        self.screen.blit(right_hud_surf, right_hud_rect)
-        
-        # Right HUD border
-        for i in range(3):
-            border_rect = right_hud_rect.inflate(i * 2, i * 2)
-            pygame.draw.rect(self.screen, NEON_PURPLE, border_rect, 1)
+        right_hud_rect = pygame.Rect(px(SCREEN_WIDTH - 200), px(10), px(180), px(80))
+        self.mark(self.glow.draw_panel(self.screen, right_hud_rect, DARK_PURPLE, NEON_PURPLE))
         
         # Level indicator
         level = int(self.speed - 4)
@@ -493,150 +630,67 @@ class RetroRacer:
         # Danger indicator
         if len(self.obstacles) > 3:
             danger_text = "DANGER!"
-            danger_color = tuple(int(c * (0.5 + 0.5 * math.sin(self.hud_glow_timer * 10))) for c in (255, 0, 0))
+            danger_color = shade((255, 0, 0), 0.5 + 0.5 * math.sin(self.hud_glow_timer * 10), levels=8)
             self.draw_glowing_text(danger_text, self.hud_font, SCREEN_WIDTH - 190, 45, danger_color, 1.0)
     
     def draw_glowing_text(self, text, font, x, y, color, glow_intensity=1.0):
-        """Draw text with glow effect"""
-        # Glow layers
-        glow_offsets = [(2, 2), (-2, -2), (2, -2), (-2, 2), (0, 2), (0, -2), (2, 0), (-2, 0)]
-        glow_color = tuple(int(c * 0.5 * glow_intensity) for c in color)
-        
-        for offset in glow_offsets:
-            glow_surface = font.render(text, True, glow_color)
-            self.screen.blit(glow_surface, (x + offset[0], y + offset[1]))
-        
-        # Main text
-        text_surface = font.render(text, True, color)
-        self.screen.blit(text_surface, (x, y))
+        """Draw text with glow effect at (x, y) in screen layout units"""
+        # Glow and text come from cached per-glyph surfaces
+        glow_color = shade(color, 0.5 * glow_intensity)
+        return self.mark(self.text_cache.draw_glyphs(self.screen, font, text, (self.px(x), self.px(y)),
+                                                     color, glow_color))
     def draw_simple_player_car(self):
         """Draw realistic player car with proper car shape and wheels"""
-        car_width = 32
-        car_height = 56
-        
-        # Car body (main rectangle)
-        car_rect = pygame.Rect(self.player_x - car_width//2, self.player_y - car_height//2, 
-                              car_width, car_height)
-        pygame.draw.rect(self.screen, NEON_ORANGE, car_rect)
-        
-        # Car roof (smaller rectangle on top)
-        roof_width = car_width - 8
-        roof_height = car_height // 3
-        roof_rect = pygame.Rect(self.player_x - roof_width//2, 
-                               self.player_y - car_height//2 + 8, 
-                               roof_width, roof_height)
-        pygame.draw.rect(self.screen, (255, 140, 0), roof_rect)  # Darker orange
-        
-        # Windshield (front window)
-        windshield_rect = pygame.Rect(self.player_x - (roof_width-4)//2, 
-                                    self.player_y - car_height//2 + 10, 
-                                    roof_width - 4, 8)
-        pygame.draw.rect(self.screen, NEON_CYAN, windshield_rect)
-        
-        # Rear window
-        rear_window_rect = pygame.Rect(self.player_x - (roof_width-4)//2, 
-                                     self.player_y - car_height//2 + roof_height - 2, 
-                                     roof_width - 4, 6)
-        pygame.draw.rect(self.screen, NEON_CYAN, rear_window_rect)
-        
-        # Car outline
-        pygame.draw.rect(self.screen, WHITE, car_rect, 2)
-        pygame.draw.rect(self.screen, WHITE, roof_rect, 1)
-        
-        # Headlights
-        pygame.draw.circle(self.screen, WHITE, (self.player_x - 8, self.player_y - car_height//2 + 4), 3)
-        pygame.draw.circle(self.screen, WHITE, (self.player_x + 8, self.player_y - car_height//2 + 4), 3)
-        
-        # Wheels (4 wheels positioned correctly)
-        wheel_color = (60, 60, 60)  # Dark gray
-        wheel_rim_color = (200, 200, 200)  # Light gray
-        
-        # Front wheels
-        front_wheel_y = self.player_y - car_height//2 + 12
-        pygame.draw.circle(self.screen, wheel_color, (self.player_x - car_width//2 - 2, front_wheel_y), 6)
-        pygame.draw.circle(self.screen, wheel_rim_color, (self.player_x - car_width//2 - 2, front_wheel_y), 4)
-        pygame.draw.circle(self.screen, wheel_color, (self.player_x + car_width//2 + 2, front_wheel_y), 6)
-        pygame.draw.circle(self.screen, wheel_rim_color, (self.player_x + car_width//2 + 2, front_wheel_y), 4)
-        
-        # Rear wheels
-        rear_wheel_y = self.player_y + car_height//2 - 12
-        pygame.draw.circle(self.screen, wheel_color, (self.player_x - car_width//2 - 2, rear_wheel_y), 6)
-        pygame.draw.circle(self.screen, wheel_rim_color, (self.player_x - car_width//2 - 2, rear_wheel_y), 4)
-        pygame.draw.circle(self.screen, wheel_color, (self.player_x + car_width//2 + 2, rear_wheel_y), 6)
-        pygame.draw.circle(self.screen, wheel_rim_color, (self.player_x + car_width//2 + 2, rear_wheel_y), 4)
+        player_x = self.sim.render_player_x(self.alpha)
+        self.mark(self.sprites.blit(self.screen, 'player', 32, 56, player_x, self.player_y,
+                                    self.view_scale))
     def draw_simple_background(self):
         """Draw simple gradient background"""
-        # Simple gradient from dark purple to pink
-        for y in range(SCREEN_HEIGHT):
-            ratio = y / SCREEN_HEIGHT
-            r = int(PURPLE_DARK[0] + (PINK_LIGHT[0] - PURPLE_DARK[0]) * ratio * 0.3)
-            g = int(PURPLE_DARK[1] + (PINK_LIGHT[1] - PURPLE_DARK[1]) * ratio * 0.3)
-            b = int(PURPLE_DARK[2] + (PINK_LIGHT[2] - PURPLE_DARK[2]) * ratio * 0.3)
-            color = (min(255, r), min(255, g), min(255, b))
-            pygame.draw.line(self.screen, color, (0, y), (SCREEN_WIDTH, y))
+        # Gradient from dark purple to pink, rendered once and cached
+        self.layers.blit(self.screen, 'background')
+        if self.backdrop is not None:
+            self.draw_backdrop()
+    
+    def draw_backdrop(self):
+        """Scroll the parallax stars, mountains and grid"""
+        self.backdrop_clock += self.dt
+        horizontal = self.backdrop_clock * BACKDROP_DRIFT + self.road_curve * CURVE_PARALLAX
+        rects = self.backdrop.draw(self.screen, horizontal, self.road_scroll, self.backdrop_clock)
+        if self.dirty is not None:
+            self.dirty.add_all(rects)
     
     def draw_simple_hud(self):
         """Draw simple HUD without complex effects"""
-        # Score
-        score_text = self.ui_font.render(f"SCORE: {self.score:06d}", True, NEON_CYAN)
-        self.screen.blit(score_text, (10, 10))
-        
-        # Speed
-        speed_text = self.ui_font.render(f"SPEED: {int(self.speed * 20):03d} KM/H", True, NEON_PINK)
-        self.screen.blit(speed_text, (10, 45))
-        
-        # Distance
-        distance_text = self.ui_font.render(f"DISTANCE: {int(self.distance/10):05d}M", True, NEON_GREEN)
-        self.screen.blit(distance_text, (10, 80))
-        
-        # Time
-        time_text = self.ui_font.render(f"TIME: {int(self.time_elapsed):03d}S", True, NEON_ORANGE)
-        self.screen.blit(time_text, (SCREEN_WIDTH - 200, 10))
-        
-        # Level
-        level = int(self.speed - 4)
-        level_text = self.ui_font.render(f"LEVEL: {level:02d}", True, NEON_PURPLE)
-        self.screen.blit(level_text, (SCREEN_WIDTH - 200, 45))
-    def handle_input(self):
-        """Handle player input with updated car boundaries"""
-        keys = pygame.key.get_pressed()
-        
-        if self.game_state == "PLAYING":
-            road_width = 300
-            road_left = SCREEN_WIDTH // 2 - road_width // 2
-            road_right = SCREEN_WIDTH // 2 + road_width // 2
-            
-            # Account for new car width (32 pixels) plus wheel overhang
-            car_half_width = 18  # 16 for car + 2 for wheel overhang
-            
-            if keys[pygame.K_LEFT] and self.player_x > road_left + car_half_width:
-                self.player_x -= self.player_speed
-            if keys[pygame.K_RIGHT] and self.player_x < road_right - car_half_width:
-                self.player_x += self.player_speed
-    
+        # Counters change every frame, so draw them from the glyph atlas
+        hud_lines = [
+            (f"SCORE: {self.score:06d}", NEON_CYAN, (10, 10)),
+            (f"SPEED: {int(self.speed * 20):03d} KM/H", NEON_PINK, (10, 45)),
+            (f"DISTANCE: {int(self.distance/10):05d}M", NEON_GREEN, (10, 80)),
+            (f"TIME: {int(self.time_elapsed):03d}S", NEON_ORANGE, (SCREEN_WIDTH - 200, 10)),
+            (f"LEVEL: {int(self.speed - 4):02d}", NEON_PURPLE, (SCREEN_WIDTH - 200, 45)),
+        ]
+        for text, color, (x, y) in hud_lines:
+            self.mark(self.text_cache.draw_glyphs(self.screen, self.ui_font, text,
+                                                  (self.px(x), self.px(y)), color))
     def draw_enhanced_start_screen(self):
         """Draw enhanced start screen with retro effects"""
         # Animated title with glow
         title_glow = 0.8 + 0.2 * math.sin(time.time() * 3)
         
-        # Title shadow/glow layers
-        for i in range(5, 0, -1):
-            shadow_color = tuple(int(c * 0.3 * title_glow) for c in NEON_PINK)
-            title_shadow = self.title_font.render("RETRO RACER", True, shadow_color)
-            shadow_rect = title_shadow.get_rect(center=(SCREEN_WIDTH//2 + i, 150 + i))
-            self.screen.blit(title_shadow, shadow_rect)
-        
-        # Main title
-        title_text = self.title_font.render("RETRO RACER", True, NEON_PINK)
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-        self.screen.blit(title_text, title_rect)
+        # Title with its shadow layers baked into one surface
+        shadow_color = shade(NEON_PINK, 0.3 * title_glow)
+        title_surface, origin = self.text_cache.render_glow(
+            self.title_font, "RETRO RACER", NEON_PINK, shadow_color, TITLE_SHADOW_OFFSETS)
+        title_rect = self.text_cache.render(self.title_font, "RETRO RACER", NEON_PINK).get_rect(
+            center=(self.px(SCREEN_WIDTH//2), self.px(150)))
+        self.mark(self.screen.blit(title_surface, (title_rect.x - origin[0], title_rect.y - origin[1])))
         
         # Subtitle with flicker
         flicker = 1.0 if int(time.time() * 6) % 8 < 7 else 0.6
         subtitle_color = tuple(int(c * flicker) for c in NEON_CYAN)
-        subtitle_text = self.ui_font.render("ARCADE STYLE", True, subtitle_color)
-        subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH//2, 200))
-        self.screen.blit(subtitle_text, subtitle_rect)
+        subtitle_text = self.text_cache.render(self.ui_font, "ARCADE STYLE", subtitle_color)
+        subtitle_rect = subtitle_text.get_rect(center=(self.px(SCREEN_WIDTH//2), self.px(200)))
+        self.mark(self.screen.blit(subtitle_text, subtitle_rect))
         
         # Animated instructions
         instructions = [
@@ -648,28 +702,30 @@ class RetroRacer:
         for i, instruction in enumerate(instructions):
             wave_offset = math.sin(time.time() * 2 + i * 0.5) * 3
             color_intensity = 0.7 + 0.3 * math.sin(time.time() * 1.5 + i * 0.8)
-            color = tuple(int(c * color_intensity) for c in NEON_GREEN)
+            color = shade(NEON_GREEN, color_intensity)
             
-            text = self.small_font.render(instruction, True, color)
-            text_rect = text.get_rect(center=(SCREEN_WIDTH//2, 280 + i * 25 + wave_offset))
+            text = self.text_cache.render(self.small_font, instruction, color)
+            text_rect = text.get_rect(center=(self.px(SCREEN_WIDTH//2), self.px(280 + i * 25 + wave_offset)))
+            # Include the full wave travel so the vacated rows are repaired
             self.screen.blit(text, text_rect)
+            self.mark(text_rect.inflate(0, self.px(8)))
+        
+        if self.leaderboard is not None:
+            self.draw_leaderboard(SCREEN_WIDTH//2 - LEADERBOARD_WIDTH//2, 465)
     
     def draw_enhanced_game_over_screen(self):
         """Draw enhanced game over screen"""
         # Game Over title with dramatic effect
         game_over_glow = 0.6 + 0.4 * math.sin(time.time() * 4)
         
-        # Multiple glow layers
-        for i in range(8, 0, -1):
-            glow_color = tuple(int(c * 0.2 * game_over_glow) for c in NEON_PINK)
-            game_over_shadow = self.title_font.render("GAME OVER", True, glow_color)
-            shadow_rect = game_over_shadow.get_rect(center=(SCREEN_WIDTH//2 + i//2, 150 + i//2))
-            self.screen.blit(game_over_shadow, shadow_rect)
-        
-        # Main text
-        game_over_text = self.title_font.render("GAME OVER", True, NEON_PINK)
-        game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-        self.screen.blit(game_over_text, game_over_rect)
+        # Glow layers and main text baked into one surface
+        glow_color = shade(NEON_PINK, 0.2 * game_over_glow)
+        game_over_surface, origin = self.text_cache.render_glow(
+            self.title_font, "GAME OVER", NEON_PINK, glow_color, GAME_OVER_GLOW_OFFSETS)
+        game_over_rect = self.text_cache.render(self.title_font, "GAME OVER", NEON_PINK).get_rect(
+            center=(self.px(SCREEN_WIDTH//2), self.px(150)))
+        self.mark(self.screen.blit(game_over_surface,
+                                   (game_over_rect.x - origin[0], game_over_rect.y - origin[1])))
         
         # Stats with glow
         stats = [
@@ -681,49 +737,99 @@ class RetroRacer:
         
         for text, color, y_pos in stats:
             self.draw_glowing_text(text, self.ui_font, SCREEN_WIDTH//2 - 150, y_pos, color, 0.8)
+        
+        if self.leaderboard is not None:
+            self.draw_leaderboard(SCREEN_WIDTH - LEADERBOARD_WIDTH - 15, 245,
+                                  self.leaderboard_place)
+    
+    def draw_leaderboard(self, x, y, highlight=None):
+        """Draw the cached top runs in a panel at (x, y); never waits on the database"""
+        top = self.leaderboard.top
+        rows = max(len(top), 1)
+        panel = pygame.Rect(self.px(x), self.px(y), self.px(LEADERBOARD_WIDTH),
+                            self.px(LEADERBOARD_ROW * (rows + 1) + 14))
+        self.mark(self.glow.draw_panel(self.screen, panel, DARK_PURPLE, NEON_ORANGE))
+        self.draw_glowing_text("HIGH SCORES", self.small_font, x + 10, y + 6, NEON_ORANGE, 0.6)
+        if not top:
+            self.draw_glowing_text("NO RUNS YET", self.small_font, x + 10, y + 6 + LEADERBOARD_ROW,
+                                   NEON_CYAN, 0.5)
+        for place, (score, distance, *_) in enumerate(top, 1):
+            color = NEON_GREEN if place == highlight else NEON_CYAN
+            self.draw_glowing_text(f"{place}. {score:06d}  {distance // 10:05d}M", self.small_font,
+                                   x + 10, y + 6 + place * LEADERBOARD_ROW, color, 0.5)
     def update_game(self):
-        """Update game logic with sound effects"""
+        """Step the simulation one tick and play sounds for its events"""
         if self.game_state == "PLAYING":
-            # Update distance and time
-            self.distance += self.speed
-            self.time_elapsed += self.dt
-            
-            # Increase difficulty over time
-            old_speed = int(self.speed)
-            if self.distance > 0 and self.distance % 1000 == 0:
-                self.speed = min(self.speed + 0.5, 12)
-                if int(self.speed) > old_speed:
-                    self.play_sound('beep')  # Level up sound
-            
-            # Update score based on distance
-            self.score += 1
-            
-            # Play engine sound occasionally
-            if random.randint(1, 120) == 1:
-                self.play_sound('engine')
+            try:
+                events = self.step_simulation()
+            except ReplayDivergence as e:
+                print(f"Replay stopped: {e}")
+                self.game_state = "GAME_OVER"
+                return
+            for event in events:
+                if event == EVENT_CRASH:
+                    self.emit_crash_particles()
+                if event == EVENT_ENGINE and self.engine is not None:
+                    continue  # the engine voice already plays continuously
+                self.play_sound(EVENT_SOUNDS[event])
             
-            # Check for collisions
-            if self.check_collisions():
-                self.play_sound('crash')
+            if self.sim.crashed or (self.playback is not None and self.playback.finished):
                 self.game_state = "GAME_OVER"
+                if self.leaderboard is not None and self.playback is None:
+                    self.record_run()
+                if self.recorder is not None:
+                    self.recorder.finish(self.sim).save(self.record_path)
     
-    def handle_input(self):
-        """Handle player input with improved road boundaries"""
-        keys = pygame.key.get_pressed()
-        
+    def emit_crash_particles(self):
+        """Burst debris and sparks from the wrecked car"""
+        x, y = self.sim.player_x, self.player_y
+        self.particles.emit('crash', x, y, spread=PLAYER_WIDTH // 2)
+        self.particles.emit('sparks', x, y - PLAYER_HEIGHT // 2, spread=PLAYER_WIDTH // 2)
+    
+    def update_particles(self):
+        """Emit exhaust and scraping sparks, then move every particle by this frame"""
+        dt = self.dt * self.replay_speed
+        scroll = 0.0
         if self.game_state == "PLAYING":
-            # Calculate road boundaries at player position
-            player_perspective = (self.player_y - SCREEN_HEIGHT // 2) / (SCREEN_HEIGHT // 2)
-            player_perspective = max(player_perspective, 0.8)  # Player is near bottom, so high perspective
+            x = self.sim.render_player_x(self.alpha)
+            rear = self.player_y + PLAYER_HEIGHT // 2
+            # Accumulate fractional particles so emission is smooth at any frame rate
+            self.exhaust_due += EXHAUST_RATE * self.speed * dt
+            count = int(self.exhaust_due)
+            self.exhaust_due -= count
+            for pipe in EXHAUST_PIPES:
+                self.particles.emit('exhaust', x + pipe, rear, count=count, spread=1.5)
             
-            road_width = int(300 * player_perspective)
-            road_left = SCREEN_WIDTH // 2 - road_width // 2
-            road_right = SCREEN_WIDTH // 2 + road_width // 2
-            
-            if keys[pygame.K_LEFT] and self.player_x > road_left + 25:
-                self.player_x -= self.player_speed
-            if keys[pygame.K_RIGHT] and self.player_x < road_right - 25:
-                self.player_x += self.player_speed
+            # Sparks fly while steering into the edge of the road
+            scraping = ((self.inputs & INPUT_LEFT and self.sim.player_x <= STEER_LEFT) or
+                        (self.inputs & INPUT_RIGHT and self.sim.player_x >= STEER_RIGHT))
+            if scraping:
+                self.sparks_due += SCRAPE_SPARK_RATE * dt
+                count = int(self.sparks_due)
+                self.sparks_due -= count
+                side = -1 if self.inputs & INPUT_LEFT else 1
+                self.particles.emit('sparks', x + side * PLAYER_WIDTH // 2, rear - 8, count=count)
+            # Particles left behind travel down with the road
+            scroll = self.speed * BASE_TICK_RATE * dt
+        self.particles.update(dt, scroll)
+    
+    def step_simulation(self):
+        """Advance the simulation one tick from live input, or from the replay"""
+        if self.playback is not None:
+            return self.playback.step(self.sim)
+        if self.recorder is not None:
+            return self.recorder.step(self.sim, self.inputs)
+        return self.sim.step(self.inputs)
+    
+    def handle_input(self):
+        """Sample the steering keys into the simulation input bitmask"""
+        self.inputs = 0
+        if self.game_state == "PLAYING" and self.playback is None:
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_LEFT]:
+                self.inputs |= INPUT_LEFT
+            if keys[pygame.K_RIGHT]:
+                self.inputs |= INPUT_RIGHT
     
     def run(self):
         """Enhanced main game loop"""
@@ -732,147 +838,300 @@ class RetroRacer:
         mouse_clicked = False
         
         while running:
-            self.dt = self.clock.tick(FPS) / 1000.0  # Delta time in seconds
+            self.dt = self.clock.tick(self.render_fps) / 1000.0  # Delta time in seconds
+            profiler.begin_frame()
             mouse_clicked = False
             
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                
-                if event.type == pygame.MOUSEMOTION:
-                    mouse_pos = event.pos
-                
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_clicked = True
-                
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE:
-                        if self.game_state == "START":
-                            self.play_sound('select')
-                            self.game_state = "PLAYING"
-                            self.reset_game()
-                        elif self.game_state == "GAME_OVER":
-                            self.play_sound('select')
-                            self.game_state = "START"
+            with profiler.scope('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    
+                    if event.type == pygame.MOUSEMOTION:
+                        mouse_pos = event.pos
+                    
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        mouse_clicked = True
                     
-                    if event.key == pygame.K_ESCAPE:
-                        if self.game_state == "GAME_OVER":
-                            running = False
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_SPACE:
+                            if self.game_state == "START":
+                                self.play_sound('select')
+                                self.game_state = "PLAYING"
+                                self.reset_game()
+                            elif self.game_state == "GAME_OVER":
+                                self.play_sound('select')
+                                self.game_state = "START"
+                        
+                        if event.key == pygame.K_ESCAPE:
+                            if self.game_state == "GAME_OVER":
+                                running = False
+                        
+                        if event.key == pygame.K_F3:
+                            profiler.toggle_overlay()
+                            if self.dirty is not None:
+                                self.dirty.invalidate()
             
-            # Update buttons
-            if self.game_state == "START":
-                self.start_button.update(mouse_pos, self.dt)
-                if self.start_button.is_clicked(mouse_pos, mouse_clicked):
-                    self.play_sound('select')
-                    self.game_state = "PLAYING"
-                    self.reset_game()
+            # Install assets the background loader has finished
+            self.apply_ready_assets()
+            self.update_music()
+            self.update_engine()
+            self.update_loading()
             
-            elif self.game_state == "GAME_OVER":
-                self.restart_button.update(mouse_pos, self.dt)
-                self.quit_button.update(mouse_pos, self.dt)
+            # Update buttons
+            with profiler.scope('buttons'):
+                if self.game_state == "START":
+                    self.start_button.update(mouse_pos, self.dt)
+                    if self.start_button.is_clicked(mouse_pos, mouse_clicked):
+                        self.play_sound('select')
+                        self.game_state = "PLAYING"
+                        self.reset_game()
                 
-                if self.restart_button.is_clicked(mouse_pos, mouse_clicked):
-                    self.play_sound('select')
-                    self.game_state = "START"
-                elif self.quit_button.is_clicked(mouse_pos, mouse_clicked):
-                    running = False
+                elif self.game_state == "GAME_OVER":
+                    self.restart_button.update(mouse_pos, self.dt)
+                    self.quit_button.update(mouse_pos, self.dt)
+                    
+                    if self.restart_button.is_clicked(mouse_pos, mouse_clicked):
+                        self.play_sound('select')
+                        self.game_state = "START"
+                    elif self.quit_button.is_clicked(mouse_pos, mouse_clicked):
+                        running = False
             
             # Handle continuous input
-            self.handle_input()
+            with profiler.scope('input'):
+                self.handle_input()
             
-            # Update game
-            self.update_game()
-            if self.game_state == "PLAYING":
-                self.update_obstacles()
+            # Update game in fixed ticks, then render between the last two
+            with profiler.scope('update_game'):
+                if self.game_state == "PLAYING":
+                    for _ in range(self.timestep.advance(self.dt * self.replay_speed)):
+                        self.update_game()
+                    self.alpha = self.timestep.alpha
+                else:
+                    self.alpha = 1.0
+                if self.ghost is not None:
+                    self.publish_ghost()
+                    self.check_ghost()
+            
+            with profiler.scope('update_particles'):
+                if self.game_state in ("PLAYING", "GAME_OVER"):
+                    self.update_particles()
             
             # Draw everything with simple graphics
-            self.draw_simple_background()
+            if self.game_state == "LOADING":
+                with profiler.scope('draw_screen'):
+                    self.draw_loading_screen()
+            else:
+                with profiler.scope('draw_background'):
+                    self.draw_simple_background()
             
             if self.game_state == "START":
-                self.draw_enhanced_start_screen()
-                self.start_button.draw(self.screen)
+                with profiler.scope('draw_screen'):
+                    self.draw_enhanced_start_screen()
+                with profiler.scope('draw_buttons'):
+                    self.mark(self.start_button.draw(self.screen))
                 
             elif self.game_state == "PLAYING":
-                self.draw_simple_road()
-                self.draw_simple_obstacles()
-                self.draw_simple_player_car()
-                self.draw_simple_hud()
+                self.draw_playfield()
+                with profiler.scope('draw_hud'):
+                    self.draw_simple_hud()
                 
             elif self.game_state == "GAME_OVER":
-                self.draw_simple_road()
-                self.draw_simple_obstacles()
-                self.draw_simple_player_car()
-                self.draw_enhanced_game_over_screen()
-                self.restart_button.draw(self.screen)
-                self.quit_button.draw(self.screen)
+                self.draw_playfield()
+                with profiler.scope('draw_screen'):
+                    self.draw_enhanced_game_over_screen()
+                with profiler.scope('draw_buttons'):
+                    self.mark(self.restart_button.draw(self.screen))
+                    self.mark(self.quit_button.draw(self.screen))
             
-            pygame.display.flip()
-        
+            if self.bloom is not None and self.game_state != "LOADING":
+                with profiler.scope('bloom'):
+                    self.mark(self.bloom.apply(self.screen))
+            
+            if profiler.overlay_visible and self.game_state != "LOADING":
+                self.mark(profiler.draw_overlay(self.screen, self.small_font, self.text_cache,
+                                                1000.0 / (self.render_fps or FPS)))
+            
+            with profiler.scope('present'):
+                self.present()
+            profiler.end_frame()
+        
+        self.assets.shutdown()
+        if self.music is not None:
+            self.music.stop()
+        if self.engine is not None:
+            self.engine.stop()
+        if self.ghost is not None:
+            self.ghost.close()
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+        if self.profile_out:
+            profiler.export(self.profile_out)
+        if self.recorder is not None and self.game_state == "PLAYING":
+            # Keep the run that was interrupted
+            self.recorder.finish(self.sim).save(self.record_path)
         pygame.quit()
         sys.exit()
     
-    def create_obstacle(self):
-        """Create a simple obstacle"""
-        road_width = 300
-        road_left = SCREEN_WIDTH // 2 - road_width // 2
-        road_right = SCREEN_WIDTH // 2 + road_width // 2
-        
-        obstacle_x = random.randint(road_left + 30, road_right - 30)
-        obstacle_type = random.choice(['car', 'barrier'])
-        
-        obstacle = {
-            'x': obstacle_x,
-            'y': -50,  # Start from top of screen
-            'type': obstacle_type,
-            'width': 30 if obstacle_type == 'car' else 40,
-            'height': 40 if obstacle_type == 'car' else 20
-        }
-        
-        self.obstacles.append(obstacle)
-    
-    def update_obstacles(self):
-        """Update obstacle positions - simple movement"""
-        # Move obstacles down
-        for obstacle in self.obstacles[:]:
-            obstacle['y'] += self.speed + 2
-            
-            # Remove obstacles that are off screen
-            if obstacle['y'] > SCREEN_HEIGHT + 50:
-                self.obstacles.remove(obstacle)
-                self.score += 10  # Points for passing obstacles
-        
-        # Spawn new obstacles
-        self.obstacle_spawn_timer += 1
-        spawn_rate = max(40 - (self.speed - 5) * 4, 20)
-        
-        if self.obstacle_spawn_timer >= spawn_rate:
-            self.create_obstacle()
-            self.obstacle_spawn_timer = 0
+    def draw_playfield(self):
+        """Draw the road, obstacles, particles and player car, each in its own profiler scope"""
+        with profiler.scope('draw_road'):
+            if self.road is not None:
+                self.draw_perspective_road()
+            else:
+                self.draw_simple_road()
+            self.road_scroll += self.speed * BASE_TICK_RATE * self.dt
+        with profiler.scope('draw_obstacles'):
+            if self.road is not None:
+                self.draw_projected_obstacles()
+            else:
+                self.draw_simple_obstacles()
+        with profiler.scope('draw_particles'):
+            self.mark(self.particles.draw(self.screen, self.view_scale))
+        if self.ghost is not None:
+            with profiler.scope('draw_ghosts'):
+                self.draw_ghosts()
+        with profiler.scope('draw_player'):
+            self.draw_simple_player_car()
+    
+    def publish_ghost(self):
+        """Hand this car's latest state to the ghost connection (never blocks)"""
+        if self.game_state == "PLAYING":
+            state = STATE_CRASHED if self.sim.crashed else STATE_RACING
+        elif self.game_state == "GAME_OVER":
+            state = STATE_CRASHED
+        else:
+            state = STATE_WAITING
+        self.ghost.publish(self.time_elapsed, self.sim.player_x, self.distance, self.score, state)
+    
+    def check_ghost(self):
+        """Report once that the relay could not be reached or dropped the connection"""
+        error = self.ghost.error
+        if error is not None and not self.ghost_error_reported:
+            self.ghost_error_reported = True
+            print(f"Ghost race: relay {self.ghost.host}:{self.ghost.port} unavailable "
+                  f"({str(error) or type(error).__name__}); racing without ghosts")
+    
+    def draw_ghosts(self):
+        """Draw the other racers as see-through cars, as far ahead or behind as they are"""
+        ghosts = [(x, self.player_y - (distance - self.distance))
+                  for _, x, distance, _, state in self.ghost.ghosts() if state != STATE_WAITING]
+        if not ghosts:
+            return
+        if self.road is not None:
+            xs, ys = zip(*ghosts)
+            screen_x, screen_y, scale, visible = self.road.project(xs, ys, self.road_curve)
+            batch = [('ghost', *sprite_size(PLAYER_WIDTH, PLAYER_HEIGHT, scale[i]),
+                      int(screen_x[i]), int(screen_y[i]))
+                     for i in range(len(ghosts)) if visible[i]]
+            rects = self.sprites.blits(self.screen, batch, doreturn=self.dirty is not None)
+        else:
+            batch = [('ghost', PLAYER_WIDTH, PLAYER_HEIGHT, x, y) for x, y in ghosts
+                     if -PLAYER_HEIGHT < y < SCREEN_HEIGHT + PLAYER_HEIGHT]
+            rects = self.sprites.blits(self.screen, batch, doreturn=self.dirty is not None,
+                                       scale=self.view_scale)
+        if rects:
+            self.dirty.add_all(rects)
+    
+    def record_run(self):
+        """Queue the finished run for the leaderboard and remember its place"""
+        self.leaderboard_place = self.leaderboard.record(
+            self.score, self.distance, self.time_elapsed, self.speed * 20, self.sim.seed)
     
     def check_collisions(self):
         """Simple collision detection with updated car dimensions"""
-        # Updated player car collision box to match new design
-        player_rect = pygame.Rect(self.player_x - 16, self.player_y - 28, 32, 56)
-        
-        for obstacle in self.obstacles:
-            obstacle_rect = pygame.Rect(obstacle['x'] - obstacle['width']//2,
-                                      obstacle['y'] - obstacle['height']//2,
-                                      obstacle['width'], obstacle['height'])
-            
-            if player_rect.colliderect(obstacle_rect):
-                return True
-        return False
+        return self.sim.check_collisions()
     
     def reset_game(self):
         """Reset game to initial state"""
-        self.score = 0
-        self.distance = 0
-        self.speed = 5
-        self.time_elapsed = 0
-        self.player_x = SCREEN_WIDTH // 2
-        self.obstacles.clear()
-        self.obstacle_spawn_timer = 0
+        # Playing needs the sprite atlas; wait for it if it is still rasterizing
+        self.require_assets('sprites')
+        if self.playback is not None:
+            self.playback.restart(self.sim)
+        else:
+            # Every run gets a concrete seed so it can be recorded and replayed
+            seed = self.seed if self.seed is not None else random.getrandbits(32)
+            self.sim.reset(seed)
+            if self.recorder is not None:
+                self.recorder.start(self.sim)
+        self.timestep.reset()
+        self.particles.clear()
+        self.exhaust_due = self.sparks_due = 0.0
+        self.leaderboard_place = None
 
-if __name__ == "__main__":
-    game = RetroRacer()
+def parse_size(text):
+    """Parse a WIDTHxHEIGHT resolution such as 400x300"""
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width * SCREEN_HEIGHT != height * SCREEN_WIDTH:
+        raise argparse.ArgumentTypeError(f"{text} is not 4:3 like {SCREEN_WIDTH}x{SCREEN_HEIGHT}")
+    return width, height
+
+def parse_address(text):
+    """Parse a relay address such as localhost or 192.168.1.5:8765"""
+    host, _, port = text.rpartition(':')
+    if not host:
+        return text, DEFAULT_PORT
+    try:
+        return host, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST or HOST:PORT, got {text!r}")
+
+def main(argv=None):
+    """Parse command-line options and run the game"""
+    parser = argparse.ArgumentParser(description="RETRO RACER - 80s Style")
+    parser.add_argument('--seed', type=int, default=None, help="seed every run for reproducible games")
+    parser.add_argument('--tick-rate', type=int, default=BASE_TICK_RATE,
+                        help="simulation ticks per second")
+    parser.add_argument('--fps', type=int, default=FPS, help="render frame cap (0 = uncapped)")
+    parser.add_argument('--max-catch-up', type=int, default=8,
+                        help="most simulation ticks run in one frame")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="present only changed screen areas instead of a full flip")
+    parser.add_argument('--dirty-threshold', type=float, default=0.5,
+                        help="fraction of the screen above which a full flip is used")
+    parser.add_argument('--render-size', type=parse_size, default=None, metavar='WxH',
+                        help="draw at this 4:3 resolution (e.g. 400x300) and upscale to the window")
+    parser.add_argument('--road-3d', action='store_true',
+                        help="draw an OutRun-style pseudo-3D road instead of the flat one")
+    parser.add_argument('--bloom', action='store_true',
+                        help="add a screen-space bloom pass over bright areas")
+    parser.add_argument('--no-music', action='store_true', help="turn off the background music")
+    parser.add_argument('--no-engine-sound', action='store_true',
+                        help="turn off the continuous engine sound")
+    parser.add_argument('--record', metavar='FILE',
+                        help="record each run as a replay (the latest run is kept in FILE)")
+    parser.add_argument('--replay', metavar='FILE', help="play back a recorded replay")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="playback speed multiplier for --replay")
+    parser.add_argument('--ghost', type=parse_address, metavar='HOST[:PORT]',
+                        help="ghost-race everyone on this relay playing the same --seed")
+    parser.add_argument('--leaderboard', metavar='FILE', default=default_leaderboard_path(),
+                        help="SQLite database of finished runs shown on the menus")
+    parser.add_argument('--no-leaderboard', action='store_true',
+                        help="do not record runs or show the leaderboard")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each part of the frame (F3 shows the overlay)")
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help="write per-frame timings to FILE on exit (.csv or .json); implies --profile")
+    args = parser.parse_args(argv)
+    if args.ghost is not None and args.seed is None:
+        parser.error("--ghost needs a --seed shared by every racer")
+    
+    profiler.enabled = args.profile or bool(args.profile_out)
+    replay = Replay.load(args.replay) if args.replay else None
+    
+    game = RetroRacer(seed=args.seed, tick_rate=args.tick_rate, render_fps=args.fps,
+                      max_catch_up=args.max_catch_up, dirty_rects=args.dirty_rects,
+                      dirty_threshold=args.dirty_threshold, profile_out=args.profile_out,
+                      record_path=args.record, replay=replay, replay_speed=args.replay_speed,
+                      launch_time=LAUNCH_TIME, music=not args.no_music,
+                      engine_sound=not args.no_engine_sound, road_3d=args.road_3d,
+                      render_size=args.render_size, bloom=args.bloom, ghost=args.ghost,
+                      leaderboard_path=None if args.no_leaderboard else args.leaderboard)
     game.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Pseudo-3D perspective road for RETRO RACER
+
+An OutRun-style view of the same flat playfield the simulation runs on.
+Every ground scanline gets an entry in projection tables built once per
+resolution: its depth ahead of the player, its scale, the road and
+rumble-strip half-widths, the center-line half-width and how strongly a
+curve bends it. Each frame the whole ground is rasterized from those
+tables with a few NumPy operations into preallocated buffers and written
+straight into the surface's pixels, with no per-scanline draw calls.
+Obstacles are placed through the same tables, so they sit on the road.
+
+The projection is fixed so the player's row keeps scale 1 and one
+simulation pixel per screen row there: steering, the car and collisions
+look exactly as they do on the flat road.
+"""
+import numpy as np
+import pygame
+
+from sim_core import PLAYER_Y, ROAD_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH
+
+# Horizon height as a fraction of the screen
+HORIZON = 0.4
+
+# Length of one light/dark band along the road, in simulation pixels
+STRIPE_LENGTH = 60
+
+# Rumble strip and center line widths at scale 1, in simulation pixels
+RUMBLE_WIDTH = 14
+LINE_WIDTH = 6
+
+# Colors per region, as (dark band, light band)
+GROUND_COLORS = {
+    'line': ((40, 40, 40), (255, 20, 147)),  # dashed: asphalt on the dark band
+    'road': ((40, 40, 40), (48, 48, 52)),
+    'rumble': ((255, 20, 147), (0, 255, 255)),
+    'grass': ((30, 10, 60), (45, 15, 85)),
+}
+REGIONS = ('line', 'road', 'rumble', 'grass')
+
+# Projected sprite sizes are rounded to this many pixels, so the sprite
+# atlas holds a bounded set of variants
+SPRITE_SIZE_STEP = 2
+
+# Largest sideways bend at the horizon, in simulation pixels
+MAX_CURVE = 160
+# Simulation pixels of distance per full left-right-left cycle of bends
+CURVE_PERIOD = 24000
+
+
+def curve_at(distance):
+    """Road bend for a distance travelled (cosmetic, so it only depends on distance)"""
+    return MAX_CURVE * np.sin(2 * np.pi * distance / CURVE_PERIOD)
+
+
+def sprite_size(width, height, scale):
+    """Sprite size for an obstacle drawn at scale, rounded to SPRITE_SIZE_STEP"""
+    step = SPRITE_SIZE_STEP
+    return (max(int(width * scale / step + 0.5), 1) * step,
+            max(int(height * scale / step + 0.5), 1) * step)
+
+
+class PerspectiveRoad:
+    """Projection tables and rasterizer for one resolution"""
+
+    def __init__(self, size):
+        self.size = width, height = tuple(size)
+        # Screen pixels per simulation pixel
+        self.unit = width / SCREEN_WIDTH
+        self.horizon = int(height * HORIZON)
+        player_row = PLAYER_Y * height / SCREEN_HEIGHT
+        # Rows between the horizon and the player: also the eye distance in
+        # screen pixels, which makes the scale at the player's row exactly 1
+        self.eye = player_row - self.horizon
+
+        # One entry per ground scanline, below the horizon to the bottom
+        rows = np.arange(self.horizon + 1, height)
+        self.top = self.horizon + 1
+        self.scale = (rows - self.horizon) / self.eye
+        # Simulation pixels ahead of the player at each row (negative below it)
+        self.depth = (1.0 / self.scale - 1.0) * self.eye / self.unit
+        half = ROAD_WIDTH / 2 * self.unit * self.scale
+        self.road_half = half.astype(np.int32)
+        self.rumble_half = (half + RUMBLE_WIDTH * self.unit * self.scale).astype(np.int32)
+        self.line_half = np.maximum(LINE_WIDTH / 2 * self.unit * self.scale, 0.5).astype(np.int32)
+        # Bends grow with distance, reaching the full curve at the horizon
+        self.curve_weight = np.maximum(1.0 - self.scale, 0.0) ** 2 * self.unit
+
+        # Frame buffers, reused every draw
+        count = len(rows)
+        self.columns = np.arange(width, dtype=np.int32)
+        self.center = np.empty(count)
+        self.center_int = np.empty(count, dtype=np.int32)
+        self.bands = np.empty(count)
+        self.stripe = np.empty(count, dtype=np.uint8)
+        self.line_limit = np.empty(count, dtype=np.int32)
+        self.offset = np.empty((count, width), dtype=np.int32)
+        self.outside = np.empty((count, width), dtype=bool)
+        self.region = np.empty((count, width), dtype=np.uint8)
+        self.colors = np.empty((count, width), dtype=np.uint32)
+        self.rect = pygame.Rect(0, self.top, width, count)
+
+    def palette(self, surface):
+        """Region colors mapped to surface's pixel format, indexed by region * 2 + band"""
+        return np.array([surface.map_rgb(GROUND_COLORS[name][band])
+                         for name in REGIONS for band in (0, 1)], dtype=np.uint32)
+
+    def shift(self, index, curve):
+        """Sideways bend in screen pixels at table rows"""
+        return self.curve_weight[index] * curve
+
+    def draw(self, surface, scroll=0.0, curve=0.0):
+        """Rasterize the ground below the horizon into a 32-bit surface
+
+        scroll is the distance travelled in simulation pixels (it moves the
+        bands) and curve the current bend. Returns the Rect drawn.
+        """
+        # Road center per row
+        np.multiply(self.curve_weight, curve, out=self.center)
+        self.center += self.size[0] / 2
+        np.copyto(self.center_int, self.center, casting='unsafe')
+
+        # Alternating bands by depth; the center line is only painted on light ones
+        np.add(self.depth, scroll, out=self.bands)
+        self.bands /= STRIPE_LENGTH
+        np.floor(self.bands, out=self.bands)
+        np.remainder(self.bands, 2, out=self.bands)
+        np.copyto(self.stripe, self.bands, casting='unsafe')
+        np.copyto(self.line_limit, self.line_half)
+        self.line_limit[self.stripe == 0] = -1
+
+        # Distance of every pixel from its row's center, then the region it falls in
+        offset = self.offset
+        np.subtract(self.columns[None, :], self.center_int[:, None], out=offset)
+        np.abs(offset, out=offset)
+        region = self.region
+        np.greater(offset, self.line_limit[:, None], out=self.outside)
+        np.copyto(region, self.outside)
+        for limit in (self.road_half, self.rumble_half):
+            np.greater(offset, limit[:, None], out=self.outside)
+            region += self.outside
+        region <<= 1
+        region |= self.stripe[:, None]
+        np.take(self.palette(surface), region, out=self.colors, mode='clip')
+
+        buffer = surface.get_buffer()
+        pixels = np.frombuffer(buffer, dtype=np.uint32)
+        try:
+            screen = pixels.reshape(self.size[1], surface.get_pitch() // 4)
+            screen[self.top:, :self.size[0]] = self.colors
+        finally:
+            # Release the surface lock before anything blits to it
+            del pixels, buffer
+        return self.rect
+
+    def project(self, xs, ys, curve=0.0):
+        """Place simulation positions on the road
+
+        Returns (screen x, screen y, scale, visible) arrays, where scale is
+        screen pixels per simulation pixel. Positions behind the camera or
+        off the bottom of the screen are not visible.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        # Inverse of the depth table: row offset from the horizon is eye / (1 + depth)
+        distance = 1.0 + (PLAYER_Y - ys) * self.unit / self.eye
+        visible = distance > 0
+        rows = self.horizon + self.eye / np.where(visible, distance, 1.0)
+        index = rows.astype(np.int64) - self.top
+        visible &= (index >= 0) & (index < len(self.scale))
+        index = np.clip(index, 0, len(self.scale) - 1)
+        scale = self.scale[index]
+        center = SCREEN_WIDTH / 2
+        screen_x = (center + (xs - center) * scale) * self.unit + self.shift(index, curve)
+        return screen_x, rows, scale * self.unit, visible
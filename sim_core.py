@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Pygame-free simulation core for RETRO RACER
+
+All game rules live here: steering, distance and difficulty, scoring,
+obstacle spawning and movement, and collision. A Simulation is stepped
+with an explicit input bitmask and draws every random number from one
+seeded RNG (its spawn schedule is seeded from it), so it runs headless
+at thousands of ticks per second and the same seed and inputs always
+produce the same run.
+
+Rules are tuned per 1/60 s tick; at other tick rates every rate is
+scaled so game speed stays the same in real time.
+"""
+import argparse
+import random
+import sys
+import time
+
+from obstacle_store import ObstacleStore
+from spawn_schedule import SpawnScheduler
+
+# Tick rate the game rules were tuned for
+BASE_TICK_RATE = 60
+
+# Playfield
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+ROAD_WIDTH = 300
+ROAD_LEFT = SCREEN_WIDTH // 2 - ROAD_WIDTH // 2
+ROAD_RIGHT = SCREEN_WIDTH // 2 + ROAD_WIDTH // 2
+
+# Player car
+PLAYER_Y = SCREEN_HEIGHT - 100
+PLAYER_WIDTH = 32
+PLAYER_HEIGHT = 56
+PLAYER_SPEED = 8
+
+# Steering is limited to the road width seen in perspective at the
+# player's row (a factor of at least 0.8), minus a margin for the car
+PLAYER_PERSPECTIVE = max((PLAYER_Y - SCREEN_HEIGHT // 2) / (SCREEN_HEIGHT // 2), 0.8)
+STEER_ROAD_WIDTH = int(ROAD_WIDTH * PLAYER_PERSPECTIVE)
+STEER_LEFT = SCREEN_WIDTH // 2 - STEER_ROAD_WIDTH // 2 + 25
+STEER_RIGHT = SCREEN_WIDTH // 2 + STEER_ROAD_WIDTH // 2 - 25
+
+# Obstacles
+OBSTACLE_SPAWN_Y = -50
+OBSTACLE_DESPAWN_Y = SCREEN_HEIGHT + 50
+OBSTACLE_MARGIN = 30
+OBSTACLE_SCORE = 10
+
+# Difficulty
+START_SPEED = 5
+MAX_SPEED = 12
+SPEED_STEP = 0.5
+LEVEL_DISTANCE = 1000
+SPAWN_INTERVAL = 40      # base ticks between spawns at START_SPEED
+SPAWN_SPEEDUP = 4        # fewer ticks between spawns per unit of speed
+MIN_SPAWN_INTERVAL = 20
+PATTERN_CHANCE = 0.4     # share of waves that are authored patterns at top speed
+ENGINE_SOUND_CHANCE = 1 / 120
+
+# Input bitmask
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+
+# Events reported by Simulation.step()
+EVENT_LEVEL_UP = 'level_up'
+EVENT_ENGINE = 'engine'
+EVENT_CRASH = 'crash'
+
+
+class Difficulty:
+    """Tunable difficulty curve; the defaults are the shipped game"""
+
+    FIELDS = ('start_speed', 'max_speed', 'speed_step', 'level_distance',
+              'spawn_interval', 'spawn_speedup', 'min_spawn_interval', 'pattern_chance')
+
+    def __init__(self, start_speed=START_SPEED, max_speed=MAX_SPEED, speed_step=SPEED_STEP,
+                 level_distance=LEVEL_DISTANCE, spawn_interval=SPAWN_INTERVAL,
+                 spawn_speedup=SPAWN_SPEEDUP, min_spawn_interval=MIN_SPAWN_INTERVAL,
+                 pattern_chance=PATTERN_CHANCE):
+        self.start_speed = start_speed
+        self.max_speed = max_speed
+        self.speed_step = speed_step
+        self.level_distance = level_distance
+        self.spawn_interval = spawn_interval
+        self.spawn_speedup = spawn_speedup
+        self.min_spawn_interval = min_spawn_interval
+        self.pattern_chance = pattern_chance
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __repr__(self):
+        return "Difficulty(%s)" % ", ".join(f"{k}={v}" for k, v in self.as_dict().items())
+
+
+def make_spawner(difficulty, seed=None):
+    """Spawn scheduler for the road, the steering bounds and the player car"""
+    return SpawnScheduler(difficulty, (ROAD_LEFT + OBSTACLE_MARGIN, ROAD_RIGHT - OBSTACLE_MARGIN),
+                          (STEER_LEFT, STEER_RIGHT), (PLAYER_WIDTH, PLAYER_HEIGHT), PLAYER_SPEED,
+                          seed)
+
+
+class Simulation:
+    """One game of RETRO RACER, advanced one tick at a time"""
+
+    def __init__(self, seed=None, tick_rate=BASE_TICK_RATE, difficulty=None):
+        self.difficulty = difficulty or Difficulty()
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        # Fraction of a base (1/60 s) tick covered by one tick
+        self.tick_scale = BASE_TICK_RATE / tick_rate
+        self.obstacles = ObstacleStore()
+        self.spawner = make_spawner(self.difficulty)
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Start a new run; a seed makes it reproducible"""
+        # Any int seeds a run, kept to the 64 bits replays and the relay store
+        self.seed = None if seed is None else seed % (1 << 64)
+        self.rng = random.Random(self.seed)
+        self.tick = 0
+        self.score = 0
+        self.score_timer = 0.0
+        self.distance = 0
+        self.next_level_distance = self.difficulty.level_distance
+        self.speed = self.difficulty.start_speed
+        self.time_elapsed = 0
+        self.player_x = SCREEN_WIDTH // 2
+        self.prev_player_x = self.player_x
+        self.player_y = PLAYER_Y
+        self.obstacles.clear()
+        # The first draw of the run's RNG seeds its schedule (vec_env relies on this)
+        self.spawner.reset(self.rng.getrandbits(64))
+        self.obstacle_spawn_timer = 0
+        self.crashed = False
+
+    def step(self, inputs=0):
+        """Advance one fixed tick with the given input bitmask; return events"""
+        events = []
+        if self.crashed:
+            return events
+        self.tick += 1
+        self.prev_player_x = self.player_x
+
+        self.apply_input(inputs)
+        self.update_progress(events)
+        if self.check_collisions():
+            self.crashed = True
+            events.append(EVENT_CRASH)
+            # Freeze interpolation on the final state
+            self.prev_player_x = self.player_x
+            self.obstacles.sync_previous()
+            return events
+        self.update_obstacles()
+        return events
+
+    def apply_input(self, inputs):
+        """Steer the player within the road bounds"""
+        step = PLAYER_SPEED * self.tick_scale
+        if inputs & INPUT_LEFT and self.player_x > STEER_LEFT:
+            self.player_x -= step
+        if inputs & INPUT_RIGHT and self.player_x < STEER_RIGHT:
+            self.player_x += step
+
+    def update_progress(self, events):
+        """Advance distance, time, difficulty and score"""
+        self.distance += self.speed * self.tick_scale
+        self.time_elapsed += self.tick_dt
+
+        # Increase difficulty each time another level distance is covered
+        difficulty = self.difficulty
+        if self.distance >= self.next_level_distance:
+            self.next_level_distance += difficulty.level_distance
+            old_speed = int(self.speed)
+            self.speed = min(self.speed + difficulty.speed_step, difficulty.max_speed)
+            if int(self.speed) > old_speed:
+                events.append(EVENT_LEVEL_UP)
+
+        # One point per base tick survived
+        self.score_timer += self.tick_scale
+        while self.score_timer >= 1.0:
+            self.score_timer -= 1.0
+            self.score += 1
+
+        # Engine sound occasionally
+        if self.rng.random() < ENGINE_SOUND_CHANCE * self.tick_scale:
+            events.append(EVENT_ENGINE)
+
+    def spawn_rate(self):
+        """Base ticks between obstacle spawns at the current speed"""
+        difficulty = self.difficulty
+        return max(difficulty.spawn_interval
+                   - (self.speed - difficulty.start_speed) * difficulty.spawn_speedup,
+                   difficulty.min_spawn_interval)
+
+    def spawn_wave(self):
+        """Spawn the next scheduled wave with its first row on the spawn line"""
+        wave = self.spawner.next_wave(self.speed)
+        if len(wave):
+            self.obstacles.spawn_many(wave.xs, OBSTACLE_SPAWN_Y - wave.offsets, wave.kinds)
+        # Keep the overshoot past the spawn rate, so spawns stay on time at any
+        # tick rate, and add the time the wave's rows take to come on, so the
+        # next wave keeps the usual spacing from its last row
+        self.obstacle_spawn_timer -= self.spawn_rate() + wave.extent / (self.speed + 2)
+
+    def update_obstacles(self):
+        """Move, despawn (with scoring) and spawn obstacles"""
+        passed = self.obstacles.advance((self.speed + 2) * self.tick_scale, OBSTACLE_DESPAWN_Y)
+        self.score += OBSTACLE_SCORE * passed
+
+        self.obstacle_spawn_timer += self.tick_scale
+        if self.obstacle_spawn_timer >= self.spawn_rate():
+            self.spawn_wave()
+
+    def check_collisions(self):
+        """True if the player car overlaps any obstacle"""
+        return self.obstacles.overlaps(self.player_x - PLAYER_WIDTH // 2,
+                                       self.player_y - PLAYER_HEIGHT // 2,
+                                       PLAYER_WIDTH, PLAYER_HEIGHT)
+
+    def render_player_x(self, alpha):
+        """Player x interpolated between the previous and current tick"""
+        return self.prev_player_x + (self.player_x - self.prev_player_x) * alpha
+
+
+def idle_policy(sim):
+    """Never steer"""
+    return 0
+
+
+def random_policy(sim):
+    """Steer randomly, drawing from the simulation's own RNG"""
+    return sim.rng.choice((0, INPUT_LEFT, INPUT_RIGHT))
+
+
+def dodge_policy(sim):
+    """Steer away from the nearest obstacle ahead in the player's path"""
+    n = len(sim.obstacles)
+    if n == 0:
+        return 0
+    xs = sim.obstacles.x[:n]
+    ys = sim.obstacles.y[:n]
+    widths = sim.obstacles.width[:n]
+    ahead = (ys < sim.player_y) & (abs(xs - sim.player_x) < widths // 2 + PLAYER_WIDTH)
+    if not ahead.any():
+        return 0
+    nearest = xs[ahead][ys[ahead].argmax()]
+    if nearest >= sim.player_x:
+        return INPUT_LEFT if sim.player_x > STEER_LEFT else INPUT_RIGHT
+    return INPUT_RIGHT if sim.player_x < STEER_RIGHT else INPUT_LEFT
+
+
+POLICIES = {
+    'idle': idle_policy,
+    'random': random_policy,
+    'dodge': dodge_policy,
+}
+
+
+def run_headless(ticks, seed=0, policy=dodge_policy):
+    """Simulate ticks of play, restarting after each crash
+
+    Returns totals over all games played.
+    """
+    sim = Simulation(seed)
+    games = 0
+    best_score = 0
+    total_score = 0
+    for _ in range(ticks):
+        sim.step(policy(sim))
+        if sim.crashed:
+            games += 1
+            best_score = max(best_score, sim.score)
+            total_score += sim.score
+            sim.reset(sim.rng.getrandbits(32))
+    return {
+        'ticks': ticks,
+        'games': games,
+        'best_score': best_score,
+        'mean_score': total_score / games if games else 0.0,
+    }
+
+
+def main(argv=None):
+    """Run a headless fast-forward simulation from the command line"""
+    parser = argparse.ArgumentParser(description="Headless RETRO RACER simulation")
+    parser.add_argument('--ticks', type=int, default=216000, help="ticks to simulate (60 per second)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='dodge')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = run_headless(args.ticks, args.seed, POLICIES[args.policy])
+    elapsed = time.perf_counter() - start
+
+    print(f"Simulated {args.ticks} ticks ({args.ticks / 60 / 60:.1f} min of play) "
+          f"in {elapsed:.2f}s ({args.ticks / elapsed:,.0f} ticks/s)")
+    print(f"Games: {result['games']}  best score: {result['best_score']}  "
+          f"mean score: {result['mean_score']:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
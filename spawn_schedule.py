@@ -0,0 +1,280 @@
+"""
+Batched, seeded obstacle spawn schedule for RETRO RACER
+
+Instead of deciding each spawn as it comes due, a SpawnScheduler
+draws waves a batch at a time from a seeded NumPy generator and keeps
+them in a lookahead queue. Taking the next wave is a queue pop, and the
+upcoming stream can be inspected or reproduced from the seed.
+
+A wave is either a single obstacle anywhere across the spawn range or
+one of the authored PATTERNS (pairs, gates, slaloms, lane walls and
+chicanes) laid out on LANES lanes, in rows above the spawn line. Patterns
+are mixed in more often as the speed rises. Each wave is checked against
+the steering bounds as it leaves the queue: a car steering at its top
+rate must be able to reach a gap in every row from a gap in the row
+before, including the last row of the previous wave, at the fastest
+obstacle speed. A pattern that fails is replaced by a single obstacle,
+and a single obstacle that fails by an empty wave. Checks run in queue
+order, so the schedule is the same however far ahead it is inspected,
+and a run that ends early skips checking the rest of its batch. This
+module does not import pygame.
+"""
+import copy
+from collections import deque
+
+import numpy as np
+
+from obstacle_store import OBSTACLE_SIZES, TYPE_CODES, TYPE_NAMES
+
+# Waves generated per batch, and how few may be left queued before the next batch
+BATCH_WAVES = 16
+LOOKAHEAD_WAVES = 4
+
+# Lanes across the spawn range that patterns are laid out on
+LANES = 5
+
+# Pixels between the rows of multi-row patterns
+SLALOM_SPACING = 160
+CHICANE_SPACING = 240
+
+# Authored patterns: name -> (progress needed, weight, obstacles). Progress
+# runs from 0 at the start speed to 1 at the top speed, and each obstacle
+# is (pixels above the spawn line, lane, type). Every pattern is also used
+# mirrored.
+PATTERNS = {
+    'pair': (0.0, 3, ((0, 0, 'car'), (0, 1, 'car'))),
+    'gate': (0.2, 2, ((0, 0, 'barrier'), (0, 2, 'car'), (0, 4, 'barrier'))),
+    'slalom': (0.3, 2, ((0, 1, 'car'), (SLALOM_SPACING, 3, 'car'),
+                        (SLALOM_SPACING * 2, 1, 'car'))),
+    'wall': (0.4, 2, ((0, 0, 'barrier'), (0, 2, 'barrier'), (0, 3, 'barrier'),
+                      (0, 4, 'barrier'))),
+    'center_wall': (0.5, 1, ((0, 0, 'barrier'), (0, 1, 'barrier'), (0, 3, 'barrier'),
+                             (0, 4, 'barrier'))),
+    'chicane': (0.6, 1, ((0, 0, 'barrier'), (0, 2, 'barrier'), (0, 3, 'barrier'),
+                         (0, 4, 'barrier'), (CHICANE_SPACING, 0, 'barrier'),
+                         (CHICANE_SPACING, 1, 'barrier'), (CHICANE_SPACING, 2, 'barrier'),
+                         (CHICANE_SPACING, 4, 'barrier'))),
+}
+
+# Obstacle (width, height) indexed by type code
+SIZES = np.array([OBSTACLE_SIZES[name] for name in TYPE_NAMES], dtype=np.int32)
+
+
+def min_wave_gap(difficulty):
+    """Fewest pixels between consecutive waves anywhere on the difficulty curve
+
+    A wave is spawned at least spawn_rate base ticks after the one before
+    and that one moves speed + 2 pixels per base tick meanwhile. The speed
+    can go up by a step between the two, which shortens the spawn rate.
+    """
+    def spawn_rate(speed):
+        return max(difficulty.spawn_interval
+                   - (speed - difficulty.start_speed) * difficulty.spawn_speedup,
+                   difficulty.min_spawn_interval)
+
+    gaps = []
+    speed = difficulty.start_speed
+    while True:
+        faster = min(speed + difficulty.speed_step, difficulty.max_speed)
+        gaps.append(spawn_rate(faster) * (speed + 2))
+        if difficulty.speed_step <= 0 or speed >= difficulty.max_speed:
+            return min(gaps)
+        speed = faster
+
+
+class Wave:
+    """Obstacles spawned together: x positions, pixels above the spawn line and type codes"""
+
+    def __init__(self, name, xs, offsets, kinds, rows):
+        self.name = name
+        self.xs = xs
+        self.offsets = offsets
+        self.kinds = kinds
+        # (offset, half height, blocked player positions) per row, nearest first
+        self.rows = rows
+        # Pixels from the first row to the last
+        self.extent = rows[-1][0] if rows else 0.0
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __repr__(self):
+        return f"Wave({self.name!r}, {len(self)} obstacles, extent {self.extent:g})"
+
+
+class SpawnScheduler:
+    """Seeded source of obstacle waves, generated a batch at a time
+
+    spawn_range is the span of obstacle centers across the road and
+    steer_range the span of player centers the car can steer to.
+    player_size and steer_speed (pixels per base tick) describe the car
+    every wave must let through.
+    """
+
+    def __init__(self, difficulty, spawn_range, steer_range, player_size, steer_speed,
+                 seed=None, batch=BATCH_WAVES, lookahead=LOOKAHEAD_WAVES):
+        self.difficulty = difficulty
+        self.spawn_range = spawn_range
+        self.player_size = player_size
+        self.steer_speed = steer_speed
+        self.batch = batch
+        self.lookahead = lookahead
+        # Player centers the passability check considers
+        self.positions = np.arange(steer_range[0], steer_range[1] + 1)
+        # Running count of set positions, and window ends per reach, for dilate()
+        self.counts = np.zeros(len(self.positions) + 1, dtype=np.intp)
+        self.windows = {}
+        self.lane_x = np.linspace(spawn_range[0], spawn_range[1], LANES)
+        self.wave_gap = min_wave_gap(difficulty)
+        self.empty = self.make_wave('empty', [], [], [])
+        self.single_offsets = np.zeros(1)
+        self.templates = {}
+        for name, (_, _, obstacles) in PATTERNS.items():
+            offsets = [offset for offset, _, _ in obstacles]
+            kinds = [TYPE_CODES[kind] for _, _, kind in obstacles]
+            for mirrored in (False, True):
+                lanes = [LANES - 1 - lane if mirrored else lane for _, lane, _ in obstacles]
+                self.templates[name, mirrored] = self.make_wave(name, self.lane_x[lanes],
+                                                                offsets, kinds)
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Start a new schedule; a seed makes it reproducible"""
+        self.rng = np.random.default_rng(seed)
+        self.queue = deque()
+        # Where the car can be once the last queued wave has passed
+        self.reachable = np.ones(len(self.positions), dtype=bool)
+        self.last_half = 0.0
+        self.rejected = 0
+
+    def fork(self, seed=None):
+        """A scheduler with its own schedule, sharing this one's geometry and patterns
+
+        Forks also share the scratch buffers, so they must be used from
+        one thread. Each costs a generator and a reachability mask.
+        """
+        forked = copy.copy(self)
+        forked.reset(seed)
+        return forked
+
+    def make_wave(self, name, xs, offsets, kinds):
+        """Wave from obstacle lists, with its rows worked out for the passability check"""
+        xs = np.asarray(xs, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.float64)
+        kinds = np.asarray(kinds, dtype=np.int8)
+        rows = []
+        for offset in np.unique(offsets):
+            row = offsets == offset
+            half = SIZES[kinds[row], 1].max() / 2
+            rows.append((float(offset), half, self.blocked(xs[row], kinds[row])))
+        return Wave(name, xs, offsets, kinds, rows)
+
+    def blocked(self, xs, kinds):
+        """Player centers that overlap any of one row's obstacles"""
+        return self.blocked_each(xs, kinds).any(axis=0)
+
+    def blocked_each(self, xs, kinds):
+        """Player centers that overlap each obstacle, one row per obstacle"""
+        width = self.player_size[0]
+        left = self.positions - width // 2
+        o_width = SIZES[kinds, 0][:, None]
+        # pygame.Rect truncates float coordinates toward zero
+        o_left = np.trunc(np.asarray(xs, dtype=np.float64)[:, None] - o_width // 2)
+        return (o_left < left + width) & (left < o_left + o_width)
+
+    def dilate(self, mask, reach):
+        """Positions within reach of any set position in mask"""
+        if reach <= 0:
+            return mask
+        window = self.windows.get(reach)
+        if window is None:
+            n = len(mask)
+            index = np.arange(n)
+            window = self.windows[reach] = (np.minimum(index + reach + 1, n),
+                                            np.maximum(index - reach, 0))
+        counts = self.counts
+        np.cumsum(mask, out=counts[1:])
+        return counts[window[0]] > counts[window[1]]
+
+    def pass_rows(self, rows):
+        """Positions the car can hold after the rows, or None if it cannot get through"""
+        reachable = self.reachable
+        fastest = self.difficulty.max_speed + 2
+        previous_offset, previous_half = -self.wave_gap, self.last_half
+        for offset, half, blocked in rows:
+            # Pixels the road moves while the car is clear of both rows, in
+            # which it can steer freely
+            clear = offset - previous_offset - previous_half - half - self.player_size[1]
+            reach = int(max(clear, 0) // fastest) * self.steer_speed
+            reachable = self.dilate(reachable, reach) & ~blocked
+            if not reachable.any():
+                return None
+            previous_offset, previous_half = offset, half
+        return reachable
+
+    def accept(self, wave):
+        """Return wave if the car can get through it after the queued waves, else None"""
+        reachable = self.pass_rows(wave.rows)
+        if reachable is None:
+            self.rejected += 1
+            return None
+        if wave.rows:
+            self.reachable = reachable
+            self.last_half = wave.rows[-1][1]
+        return wave
+
+    def progress(self, speed):
+        """0 at the start speed to 1 at the top speed"""
+        difficulty = self.difficulty
+        span = difficulty.max_speed - difficulty.start_speed
+        if span <= 0:
+            return 1.0
+        return min(max((speed - difficulty.start_speed) / span, 0.0), 1.0)
+
+    def refill(self, speed):
+        """Generate a batch of waves, mixed for a speed, onto the end of the queue"""
+        progress = self.progress(speed)
+        eligible = [name for name, (needed, _, _) in PATTERNS.items() if needed <= progress]
+        weights = np.array([PATTERNS[name][1] for name in eligible], dtype=np.float64)
+        # Half the pattern chance at the start speed, all of it at the top speed
+        chance = self.difficulty.pattern_chance * (0.5 + 0.5 * progress)
+
+        # Every random number for the batch is drawn up front
+        rng, n = self.rng, self.batch
+        use_pattern = rng.random(n) < chance
+        picks = rng.choice(len(weights), n, p=weights / weights.sum()) if eligible else None
+        mirrored = rng.random(n) < 0.5
+        xs = rng.integers(self.spawn_range[0], self.spawn_range[1] + 1, n).astype(np.float64)
+        kinds = rng.integers(0, len(TYPE_NAMES), n).astype(np.int8)
+
+        # Single-obstacle fallbacks for the whole batch at once
+        singles = (xs, kinds, SIZES[kinds, 1] / 2, self.blocked_each(xs, kinds))
+        patterns = [self.templates[eligible[picks[i]], bool(mirrored[i])]
+                    if use_pattern[i] and eligible else None for i in range(n)]
+        # Waves are checked when they reach the front, so a run that ends
+        # early skips checking the rest
+        self.queue.extend(zip(patterns, [singles] * n, range(n)))
+
+    def resolve(self, candidates):
+        """The first passable wave of a queued (pattern, singles, index), else an empty wave"""
+        pattern, (xs, kinds, halves, blocked), i = candidates
+        wave = None if pattern is None else self.accept(pattern)
+        if wave is None:
+            wave = self.accept(Wave('single', xs[i:i + 1], self.single_offsets, kinds[i:i + 1],
+                                    [(0.0, halves[i], blocked[i])]))
+        return self.empty if wave is None else wave
+
+    def next_wave(self, speed):
+        """Take the next wave, generating another batch first when the queue runs low"""
+        if len(self.queue) <= self.lookahead:
+            self.refill(speed)
+        wave = self.queue.popleft()
+        return wave if isinstance(wave, Wave) else self.resolve(wave)
+
+    def upcoming(self):
+        """Queued waves, next first"""
+        # Checks run in queue order, so the checked waves are always a prefix
+        for i, wave in enumerate(self.queue):
+            if not isinstance(wave, Wave):
+                self.queue[i] = self.resolve(wave)
+        return list(self.queue)
@@ -0,0 +1,212 @@
+"""
+Pre-rendered sprite atlas for RETRO RACER vehicles and barriers
+
+Each vehicle and barrier variant is rasterized once, keyed by type and
+size, into a shared atlas Surface. Drawing an entity is then a single
+blit from the atlas, and a whole frame of obstacles is one blits() call.
+"""
+import pygame
+
+from profiler import profiler
+
+WHITE = (255, 255, 255)
+NEON_PINK = (255, 20, 147)
+NEON_CYAN = (0, 255, 255)
+NEON_PURPLE = (138, 43, 226)
+NEON_GREEN = (57, 255, 20)
+NEON_ORANGE = (255, 165, 0)
+WHEEL_COLOR = (60, 60, 60)
+# Color and alpha multiplier for ghost racers
+GHOST_TINT = (160, 255, 255, 110)
+
+# Space around a sprite for wheel overhang and headlights while rasterizing
+RASTER_MARGIN = 16
+
+
+def draw_player_car(surface, x, y, car_width=32, car_height=56):
+    """Draw the player car centered on (x, y)"""
+    # Car body (main rectangle)
+    car_rect = pygame.Rect(x - car_width//2, y - car_height//2, car_width, car_height)
+    pygame.draw.rect(surface, NEON_ORANGE, car_rect)
+
+    # Car roof (smaller rectangle on top)
+    roof_width = car_width - 8
+    roof_height = car_height // 3
+    roof_rect = pygame.Rect(x - roof_width//2, y - car_height//2 + 8, roof_width, roof_height)
+    pygame.draw.rect(surface, (255, 140, 0), roof_rect)  # Darker orange
+
+    # Windshield and rear window
+    pygame.draw.rect(surface, NEON_CYAN,
+                     (x - (roof_width-4)//2, y - car_height//2 + 10, roof_width - 4, 8))
+    pygame.draw.rect(surface, NEON_CYAN,
+                     (x - (roof_width-4)//2, y - car_height//2 + roof_height - 2, roof_width - 4, 6))
+
+    # Car outline
+    pygame.draw.rect(surface, WHITE, car_rect, 2)
+    pygame.draw.rect(surface, WHITE, roof_rect, 1)
+
+    # Headlights
+    pygame.draw.circle(surface, WHITE, (x - 8, y - car_height//2 + 4), 3)
+    pygame.draw.circle(surface, WHITE, (x + 8, y - car_height//2 + 4), 3)
+
+    # Wheels (front and rear)
+    for wheel_y in (y - car_height//2 + 12, y + car_height//2 - 12):
+        for wheel_x in (x - car_width//2 - 2, x + car_width//2 + 2):
+            pygame.draw.circle(surface, WHEEL_COLOR, (wheel_x, wheel_y), 6)
+            pygame.draw.circle(surface, (200, 200, 200), (wheel_x, wheel_y), 4)
+
+
+def draw_enemy_car(surface, x, y, car_width=30, car_height=40):
+    """Draw an enemy car centered on (x, y)"""
+    # Car body (main rectangle)
+    car_rect = pygame.Rect(x - car_width//2, y - car_height//2, car_width, car_height)
+    pygame.draw.rect(surface, NEON_PURPLE, car_rect)
+
+    # Car roof (smaller rectangle)
+    roof_width = car_width - 6
+    roof_height = car_height // 3
+    roof_rect = pygame.Rect(x - roof_width//2, y - car_height//2 + 6, roof_width, roof_height)
+    pygame.draw.rect(surface, (100, 30, 150), roof_rect)  # Darker purple
+
+    # Windows (only if the car is large enough)
+    if car_width > 20:
+        pygame.draw.rect(surface, NEON_PINK,
+                         (x - (roof_width-3)//2, y - car_height//2 + 8, roof_width - 3, 6))
+        pygame.draw.rect(surface, NEON_PINK,
+                         (x - (roof_width-3)//2, y - car_height//2 + roof_height - 1, roof_width - 3, 4))
+
+    # Car outline
+    pygame.draw.rect(surface, WHITE, car_rect, 2)
+    if car_width > 15:
+        pygame.draw.rect(surface, WHITE, roof_rect, 1)
+
+    # Headlights (if car is large enough)
+    if car_width > 20:
+        pygame.draw.circle(surface, WHITE, (x - 6, y - car_height//2 + 3), 2)
+        pygame.draw.circle(surface, WHITE, (x + 6, y - car_height//2 + 3), 2)
+
+    # Wheels (front and rear)
+    wheel_size = max(3, car_width // 8)
+    rim_size = max(2, wheel_size - 1)
+    for wheel_y in (y - car_height//2 + 8, y + car_height//2 - 8):
+        for wheel_x in (x - car_width//2 - 1, x + car_width//2 + 1):
+            pygame.draw.circle(surface, WHEEL_COLOR, (wheel_x, wheel_y), wheel_size)
+            pygame.draw.circle(surface, (150, 150, 150), (wheel_x, wheel_y), rim_size)
+
+
+def draw_barrier(surface, x, y, width=40, height=20):
+    """Draw a striped barrier centered on (x, y)"""
+    pygame.draw.rect(surface, NEON_GREEN, (x - width//2, y - height//2, width, height))
+    for i in range(0, width, 8):
+        pygame.draw.rect(surface, WHITE, (x - width//2 + i, y - height//2, 4, height))
+
+
+def draw_ghost_car(surface, x, y, car_width=32, car_height=56):
+    """Draw another racer's car, tinted and see-through, centered on (x, y)"""
+    draw_player_car(surface, x, y, car_width, car_height)
+    # The scratch surface holds only this sprite, so tint all of it
+    surface.fill(GHOST_TINT, special_flags=pygame.BLEND_RGBA_MULT)
+
+
+SPRITE_RENDERERS = {
+    'player': draw_player_car,
+    'ghost': draw_ghost_car,
+    'car': draw_enemy_car,
+    'barrier': draw_barrier,
+}
+
+
+def rasterize(kind, width, height, scale=1.0):
+    """Rasterize one variant and return (surface, anchor of its center)
+
+    With a scale other than 1 the sprite is drawn at full size and then
+    resized with nearest-neighbour sampling, so its details keep their
+    proportions at low render resolutions.
+    """
+    profiler.count('surfaces', 2)
+    scratch = pygame.Surface((width + RASTER_MARGIN * 2, height + RASTER_MARGIN * 2),
+                             pygame.SRCALPHA)
+    center = (scratch.get_width() // 2, scratch.get_height() // 2)
+    SPRITE_RENDERERS[kind](scratch, center[0], center[1], width, height)
+
+    bounds = scratch.get_bounding_rect()
+    sprite = pygame.Surface(bounds.size, pygame.SRCALPHA)
+    sprite.blit(scratch, (0, 0), bounds)
+    anchor = (center[0] - bounds.x, center[1] - bounds.y)
+    if scale != 1.0:
+        profiler.count('surfaces')
+        size = (max(1, round(bounds.width * scale)), max(1, round(bounds.height * scale)))
+        sprite = pygame.transform.scale(sprite, size)
+        anchor = (round(anchor[0] * scale), round(anchor[1] * scale))
+    return sprite, anchor
+
+
+class SpriteAtlas:
+    """Shelf-packed atlas of pre-rendered sprites keyed by (type, width, height, scale)"""
+
+    def __init__(self, size=(256, 128), padding=1):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.padding = padding
+        self.entries = {}  # (kind, width, height, scale) -> (area Rect, anchor)
+        self.shelf_x = 0
+        self.shelf_y = 0
+        self.shelf_height = 0
+
+    def grow(self, min_width, min_height):
+        """Enlarge the atlas, keeping every sprite at its current position"""
+        width = max(self.surface.get_width(), min_width)
+        height = max(self.surface.get_height() * 2, min_height)
+        profiler.count('surfaces')
+        grown = pygame.Surface((width, height), pygame.SRCALPHA)
+        grown.blit(self.surface, (0, 0))
+        self.surface = grown
+
+    def place(self, sprite_size):
+        """Find a free spot for a sprite, starting a new shelf when needed"""
+        width, height = sprite_size[0] + self.padding, sprite_size[1] + self.padding
+        if self.shelf_x + width > self.surface.get_width():
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+        if self.shelf_x + width > self.surface.get_width() or \
+                self.shelf_y + height > self.surface.get_height():
+            self.grow(width, self.shelf_y + height)
+        pos = (self.shelf_x, self.shelf_y)
+        self.shelf_x += width
+        self.shelf_height = max(self.shelf_height, height)
+        return pos
+
+    def get(self, kind, width, height, scale=1.0):
+        """Return (area, anchor) for a variant, rasterizing it on first use"""
+        key = (kind, width, height, scale)
+        entry = self.entries.get(key)
+        if entry is None:
+            sprite, anchor = rasterize(kind, width, height, scale)
+            pos = self.place(sprite.get_size())
+            self.surface.blit(sprite, pos)
+            entry = (pygame.Rect(pos, sprite.get_size()), anchor)
+            self.entries[key] = entry
+        return entry
+
+    def warm(self, variants, scale=1.0):
+        """Rasterize (kind, width, height) variants up front"""
+        for variant in variants:
+            self.get(*variant, scale)
+
+    def blit(self, target, kind, width, height, x, y, scale=1.0):
+        """Draw one sprite centered on (x, y); scale maps size and position to target pixels"""
+        area, anchor = self.get(kind, width, height, scale)
+        return target.blit(self.surface, (x * scale - anchor[0], y * scale - anchor[1]), area)
+
+    def blits(self, target, sprites, doreturn=False, scale=1.0):
+        """Draw (kind, width, height, x, y) sprites in a single blits() call
+
+        scale maps sizes and positions to target pixels. With doreturn,
+        returns the list of Rects drawn.
+        """
+        atlas = self.surface
+        batch = []
+        for kind, width, height, x, y in sprites:
+            area, anchor = self.get(kind, width, height, scale)
+            batch.append((atlas, (x * scale - anchor[0], y * scale - anchor[1]), area))
+        return target.blits(batch, doreturn=doreturn)
@@ -0,0 +1,144 @@
+"""
+Vectorized synth engine with an on-disk PCM cache for RETRO RACER
+
+Waveforms are built as whole NumPy arrays (oscillators, harmonics and
+envelopes) instead of one sample at a time. Rendered PCM is stored in a
+content-addressed cache keyed by its parameters and loaded memory-mapped
+on later launches, so a warm start skips synthesis entirely.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+SAMPLE_RATE = 22050
+AMPLITUDE = 4096
+
+# Bump when the synthesis math changes so stale cache entries are ignored
+ENGINE_VERSION = 2
+
+# Engine partials as (frequency ratio, weight) pairs
+ENGINE_PARTIALS = ((1.0, 1.0), (1.5, 0.5), (2.0, 0.3))
+ENGINE_NORMALIZE = 2.8
+
+# Fade in and out of one-shot clips, so they start and stop without a click
+CLICK_FADE = 0.005
+
+
+def sample_indices(duration, sample_rate=SAMPLE_RATE):
+    """Return the sample index array for a clip of the given duration"""
+    frames = int(duration * sample_rate)
+    return np.arange(frames, dtype=np.float64)
+
+
+def sine(frequency, indices, sample_rate=SAMPLE_RATE):
+    """Sine oscillator evaluated at every sample index"""
+    return np.sin(frequency * 2 * np.pi * indices / sample_rate)
+
+
+def harmonics(base_freq, indices, partials, sample_rate=SAMPLE_RATE):
+    """Sum of sine partials given as (frequency ratio, weight) pairs"""
+    wave = np.zeros(len(indices), dtype=np.float64)
+    for ratio, weight in partials:
+        wave += sine(base_freq * ratio, indices, sample_rate) * weight
+    return wave
+
+
+def envelope(frames, attack=0.0, release=0.0, sample_rate=SAMPLE_RATE):
+    """Linear attack/release envelope (all ones when both are zero)"""
+    env = np.ones(frames, dtype=np.float64)
+    attack_frames = min(int(attack * sample_rate), frames)
+    release_frames = min(int(release * sample_rate), frames)
+    if attack_frames > 0:
+        env[:attack_frames] *= np.linspace(0.0, 1.0, attack_frames, endpoint=False)
+    if release_frames > 0:
+        env[frames - release_frames:] *= np.linspace(1.0, 0.0, release_frames)
+    return env
+
+
+def to_stereo_pcm(wave, volume):
+    """Scale a [-1, 1] waveform to int16 stereo PCM"""
+    # astype truncates toward zero, matching int() on each sample
+    mono = (AMPLITUDE * wave * volume).astype(np.int16)
+    return np.ascontiguousarray(np.column_stack((mono, mono)))
+
+
+def render_beep(frequency=440, duration=0.1, volume=0.3, sample_rate=SAMPLE_RATE):
+    """Render a simple beep as int16 stereo PCM"""
+    indices = sample_indices(duration, sample_rate)
+    wave = sine(frequency, indices, sample_rate)
+    wave *= envelope(len(indices), CLICK_FADE, CLICK_FADE, sample_rate)
+    return to_stereo_pcm(wave, volume)
+
+
+def render_engine(base_freq=80, duration=0.2, volume=0.2, sample_rate=SAMPLE_RATE):
+    """Render an engine-like hum as int16 stereo PCM"""
+    indices = sample_indices(duration, sample_rate)
+    wave = harmonics(base_freq, indices, ENGINE_PARTIALS, sample_rate) / ENGINE_NORMALIZE
+    wave *= envelope(len(indices), CLICK_FADE, CLICK_FADE, sample_rate)
+    return to_stereo_pcm(wave, volume)
+
+
+def default_cache_dir():
+    """Cache directory, overridable with the RETRO_RACER_CACHE variable"""
+    root = os.environ.get("RETRO_RACER_CACHE")
+    if not root:
+        root = os.path.join(os.path.expanduser("~"), ".cache", "retro_racer")
+    return os.path.join(root, "pcm")
+
+
+class PCMCache:
+    """Content-addressed store of rendered PCM, loaded memory-mapped"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind, **params):
+        """Hash the clip kind and its parameters into a cache key"""
+        payload = json.dumps({"kind": kind, "version": ENGINE_VERSION, "params": params},
+                             sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def load(self, key):
+        """Return the cached PCM memory-mapped, or None if absent or corrupt"""
+        try:
+            return np.load(self.path(key), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, pcm):
+        """Write PCM atomically; an unwritable cache is not an error"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, pcm)
+            os.replace(tmp_path, self.path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get_or_render(self, kind, render, **params):
+        """Return cached PCM for these parameters, rendering it on a miss"""
+        key = self.key(kind, **params)
+        pcm = self.load(key)
+        if pcm is not None:
+            self.hits += 1
+            return pcm
+
+        self.misses += 1
+        pcm = render(**params)
+        self.store(key, pcm)
+        return pcm
@@ -95,6 +95,1237 @@ def test_retro_racer_import():
         print(f"✗ retro_racer import error: {e}")
         return False
 
+def test_synth_cache():
+    """Test vectorized synthesis and the on-disk PCM cache"""
+    print("\nTesting vectorized synth and PCM cache...")
+    try:
+        import math
+        import tempfile
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from synth import CLICK_FADE, PCMCache, render_beep, render_engine
+        
+        # Vectorized output must match the original per-sample loop, faded in and out
+        frames = int(0.1 * 22050)
+        fade = int(CLICK_FADE * 22050)
+        expected = np.zeros((frames, 2), dtype=np.int16)
+        for i in range(frames):
+            gain = min(1.0, i / fade, (frames - 1 - i) / (fade - 1))
+            wave = int(4096 * math.sin(880 * 2 * math.pi * i / 22050) * 0.3 * gain)
+            expected[i] = [wave, wave]
+        beep = render_beep(880, 0.1, 0.3)
+        assert np.abs(beep.astype(np.int32) - expected).max() <= 1
+        assert beep[0, 0] == 0 and beep[-1, 0] == 0
+        print("✓ render_beep() matches the per-sample reference and starts and ends silent")
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PCMCache(cache_dir)
+            params = dict(base_freq=100, duration=0.3, volume=0.2, sample_rate=22050)
+            cold = cache.get_or_render('engine', render_engine, **params)
+            warm = cache.get_or_render('engine', render_engine, **params)
+            assert (cache.hits, cache.misses) == (1, 1)
+            assert isinstance(warm, np.memmap)
+            assert np.array_equal(cold, warm)
+            print("✓ PCM cache serves warm starts memory-mapped")
+        
+        return True
+    except Exception as e:
+        print(f"✗ synth cache error: {e}")
+        return False
+
+def test_layer_compositor():
+    """Test cached static layers and their invalidation"""
+    print("\nTesting static-layer compositor...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from layers import create_default_compositor
+        
+        pygame.init()
+        screen = pygame.display.set_mode((800, 600))
+        compositor = create_default_compositor((800, 600))
+        for _ in range(10):
+            compositor.blit(screen, 'background')
+            compositor.blit(screen, 'road')
+        assert compositor.rebuilds == 2
+        print("✓ static layers are rendered once and reused")
+        
+        compositor.set_palette(asphalt=(20, 20, 20))
+        compositor.blit(screen, 'road')
+        compositor.set_size((400, 300))
+        compositor.blit(screen, 'road')
+        assert compositor.rebuilds == 4
+        assert compositor.get('road')[0].get_height() == 300
+        print("✓ layers rebuild when palette or size change")
+        
+        pygame.quit()
+        return True
+    except Exception as e:
+        print(f"✗ layer compositor error: {e}")
+        return False
+
+def test_text_cache():
+    """Test the LRU text cache, baked glow and glyph atlas"""
+    print("\nTesting text surface cache...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from text_cache import TextCache
+        
+        pygame.init()
+        screen = pygame.display.set_mode((800, 600))
+        font = pygame.font.Font(None, 28)
+        cache = TextCache(max_entries=3)
+        
+        first = cache.render(font, "READY", (255, 255, 255))
+        assert cache.render(font, "READY", (255, 255, 255)) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+        for word in ("ONE", "TWO", "THREE"):
+            cache.render(font, word, (255, 255, 255))
+        assert cache.evictions == 1 and len(cache.entries) == 3
+        print("✓ LRU cache counts hits, misses and evictions")
+        
+        cache = TextCache()
+        baked, origin = cache.render_glow(font, "GO", (255, 0, 0), (128, 0, 0))
+        assert origin == (2, 2) and baked.get_width() == font.size("GO")[0] + 4
+        print("✓ glow stack bakes into a single surface")
+        
+        for score in range(0, 1000, 7):
+            cache.draw_glyphs(screen, font, f"SCORE: {score:06d}", (20, 20), (0, 255, 255), (0, 127, 127))
+        misses = cache.misses
+        for score in range(1000, 100000, 7):
+            cache.draw_glyphs(screen, font, f"SCORE: {score:06d}", (20, 20), (0, 255, 255), (0, 127, 127))
+        assert cache.misses == misses
+        print("✓ glyph atlas keeps changing counters from thrashing the cache")
+        
+        pygame.quit()
+        return True
+    except Exception as e:
+        print(f"✗ text cache error: {e}")
+        return False
+
+def test_sprite_atlas():
+    """Test lazily rasterized vehicle and barrier sprites"""
+    print("\nTesting sprite atlas...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from sprites import SpriteAtlas, draw_enemy_car
+        
+        pygame.init()
+        screen = pygame.display.set_mode((800, 600))
+        atlas = SpriteAtlas(size=(64, 64))
+        
+        # A sprite blit must match drawing the primitives directly
+        screen.fill((0, 0, 0))
+        draw_enemy_car(screen, 400, 300, 30, 40)
+        expected = pygame.image.tostring(screen, 'RGB')
+        screen.fill((0, 0, 0))
+        atlas.blit(screen, 'car', 30, 40, 400, 300)
+        assert pygame.image.tostring(screen, 'RGB') == expected
+        print("✓ atlas sprite matches the primitive drawing")
+        
+        atlas.blits(screen, [('barrier', 40, 20, 350, 100), ('player', 32, 56, 400, 500),
+                             ('car', 30, 40, 450, 200)])
+        assert len(atlas.entries) == 3
+        assert atlas.surface.get_height() > 64
+        print("✓ variants are added lazily and the atlas grows to fit")
+        
+        pygame.quit()
+        return True
+    except Exception as e:
+        print(f"✗ sprite atlas error: {e}")
+        return False
+
+def test_obstacle_store():
+    """Test batched obstacle movement, despawn and collision"""
+    print("\nTesting structure-of-arrays obstacle store...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from obstacle_store import ObstacleStore
+        
+        store = ObstacleStore(capacity=2)
+        for i in range(5):
+            store.spawn(300 + i * 40, 600 - i * 100, 'car' if i % 2 == 0 else 'barrier')
+        assert len(store) == 5 and store.capacity >= 5
+        print("✓ store grows past its initial capacity")
+        
+        passed = store.advance(60, 650)
+        assert passed == 1 and len(store) == 4
+        assert sorted(store.y[:len(store)].tolist()) == [260.0, 360.0, 460.0, 560.0]
+        print("✓ advance() moves and swap-removes despawned obstacles")
+        
+        # Barrier at (340, 560) spans x 320..360 and y 550..570
+        assert store.overlaps(340, 540, 32, 56)
+        assert not store.overlaps(500, 540, 32, 56)
+        print("✓ batched AABB overlap against the player")
+        
+        import pygame
+        import tracemalloc
+        for i in range(len(store)):
+            x, y = store.x[i], store.y[i]
+            rect = pygame.Rect(x - store.width[i] // 2, y - store.height[i] // 2,
+                               store.width[i], store.height[i])
+            box = [b[i] for b in store.bounds()]
+            assert box == [rect.left, rect.top, rect.right, rect.bottom]
+        print("✓ cached bounding boxes match pygame.Rect")
+        
+        import numpy as np
+        store = ObstacleStore(capacity=2048)
+        rng = np.random.default_rng(0)
+        store.spawn_many(rng.integers(280, 520, 1000), -rng.integers(0, 650, 1000),
+                         rng.integers(0, 2, 1000))
+        store.advance(1, 650)
+        store.overlaps(384, 472, 32, 56)
+        tracemalloc.start()
+        for _ in range(200):
+            store.advance(3, 650)
+            store.overlaps(384, 472, 32, 56)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak < 8192, peak
+        report = store.memory()
+        assert report['live'] == len(store) and report['bytes_per_obstacle'] < 100
+        print(f"✓ ticks allocate nothing per obstacle ({report['bytes_per_obstacle']} bytes/row)")
+        
+        return True
+    except Exception as e:
+        print(f"✗ obstacle store error: {e}")
+        return False
+
+def test_simulation_core():
+    """Test the pygame-free simulation core"""
+    print("\nTesting headless simulation core...")
+    try:
+        import subprocess
+        here = os.path.dirname(os.path.abspath(__file__))
+        sys.path.insert(0, here)
+        from sim_core import INPUT_LEFT, STEER_LEFT, Simulation, run_headless
+        
+        check = "import sys, sim_core; sys.exit('pygame' in sys.modules)"
+        assert subprocess.run([sys.executable, "-c", check], cwd=here).returncode == 0
+        print("✓ sim_core imports without pygame")
+        
+        def play(seed):
+            sim = Simulation(seed)
+            trace = []
+            while not sim.crashed and sim.tick < 5000:
+                sim.step(INPUT_LEFT if sim.tick % 90 < 30 else 0)
+                trace.append((sim.player_x, sim.score, len(sim.obstacles)))
+            return trace
+        assert play(7) == play(7)
+        print("✓ same seed and inputs replay the same run")
+        
+        sim = Simulation(1)
+        for _ in range(100):
+            sim.step(INPUT_LEFT)
+        assert sim.player_x >= STEER_LEFT - 8
+        print("✓ steering stays within the road bounds")
+        
+        result = run_headless(3000, seed=3)
+        assert result['ticks'] == 3000 and result['games'] >= 1
+        print("✓ run_headless() fast-forwards and restarts after crashes")
+        
+        return True
+    except Exception as e:
+        print(f"✗ simulation core error: {e}")
+        return False
+
+def test_fixed_timestep():
+    """Test fixed-timestep accumulation and tick-rate independence"""
+    print("\nTesting fixed-timestep simulation...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from sim_core import Difficulty, Simulation
+        from timestep import FixedTimestep
+        
+        clock = FixedTimestep(tick_rate=120, max_catch_up=4)
+        assert clock.advance(1 / 60) == 2
+        assert clock.advance(0.004) == 0 and 0.4 < clock.alpha < 0.6
+        assert clock.advance(1.0) == 4 and clock.dropped_ticks > 0
+        print("✓ accumulator runs catch-up ticks up to the cap")
+        
+        slow, fast = Simulation(1, tick_rate=60), Simulation(1, tick_rate=120)
+        for _ in range(60):
+            slow.update_progress([])
+        for _ in range(120):
+            fast.update_progress([])
+        assert abs(slow.distance - fast.distance) < 1e-6 and slow.score == fast.score
+        print("✓ game speed is the same at 60 Hz and 120 Hz")
+        
+        # Spawn rates that are not a whole number of ticks keep their overshoot
+        spawns = []
+        for tick_rate in (60, 144):
+            sim = Simulation(1, tick_rate, Difficulty(pattern_chance=0.0))
+            timers = []
+            for _ in range(tick_rate * 600):
+                sim.speed = 5.5
+                timers.append(sim.obstacle_spawn_timer)
+                sim.update_obstacles()
+            spawns.append(sum(after < before for before, after in zip(timers, timers[1:])))
+        assert abs(spawns[0] - spawns[1]) <= 1, spawns
+        print(f"✓ {spawns[0]} waves in ten minutes at 60 Hz and {spawns[1]} at 144 Hz")
+        
+        sim = Simulation(1)
+        while sim.distance < 3000:
+            sim.update_progress([])
+        assert sim.speed == 6.5
+        print("✓ level-ups no longer depend on exact float landings")
+        
+        return True
+    except Exception as e:
+        print(f"✗ fixed timestep error: {e}")
+        return False
+
+def test_dirty_rects():
+    """Test dirty-rect tracking and the full-flip fallback"""
+    print("\nTesting dirty-rect display updates...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from dirty import DirtyRects
+        
+        pygame.init()
+        pygame.display.set_mode((800, 600))
+        dirty = DirtyRects((800, 600), full_threshold=0.5)
+        dirty.present()
+        assert dirty.full_flips == 1
+        print("✓ first frame is a full flip")
+        
+        dirty.add(pygame.Rect(10, 10, 50, 50))
+        dirty.add(pygame.Rect(40, 40, 50, 50))
+        dirty.add(pygame.Rect(-20, 590, 40, 40))
+        assert len(dirty.merged()) == 2
+        dirty.present()
+        assert dirty.partial_updates == 1 and dirty.full_flips == 1
+        print("✓ small changes are pushed as merged, clipped rects")
+        
+        dirty.add(pygame.Rect(0, 0, 800, 400))
+        dirty.present()
+        assert dirty.full_flips == 2
+        print("✓ large dirty areas fall back to a full flip")
+        
+        pygame.quit()
+        return True
+    except Exception as e:
+        print(f"✗ dirty rect error: {e}")
+        return False
+
+def test_profiler():
+    """Test profiler scopes, percentiles and export"""
+    print("\nTesting frame profiler...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import csv
+        import json
+        import tempfile
+        from profiler import Profiler, percentile
+        
+        disabled = Profiler()
+        disabled.begin_frame()
+        with disabled.scope('draw'):
+            pass
+        disabled.count('surfaces')
+        disabled.end_frame()
+        assert not disabled.records and not disabled.counters
+        print("✓ disabled profiler records nothing")
+        
+        prof = Profiler(enabled=True)
+        for _ in range(10):
+            prof.begin_frame()
+            with prof.scope('draw'):
+                pass
+            with prof.scope('draw'):
+                pass
+            prof.count('surfaces', 2)
+            prof.end_frame()
+        stats = prof.stats()
+        assert 'draw' in stats and 'frame' in stats
+        assert stats['draw'][0] <= stats['frame'][1]
+        assert prof.last_counters == {'surfaces': 2}
+        assert percentile(list(range(1, 101)), 0.95) == 95
+        assert percentile(list(range(1, 101)), 0.99) == 99
+        print("✓ enabled profiler records scopes, counters and percentiles")
+        
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'frames.csv')
+            json_path = os.path.join(directory, 'frames.json')
+            prof.export(csv_path)
+            prof.export(json_path)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+            with open(json_path) as f:
+                data = json.load(f)
+        assert len(rows) == 10 and 'draw_ms' in rows[0] and rows[0]['surfaces'] == '2'
+        assert len(data['frames']) == 10 and 'draw' in data['summary']
+        print("✓ frames export to CSV and JSON")
+        
+        return True
+    except Exception as e:
+        print(f"✗ profiler error: {e}")
+        return False
+
+def test_benchmark_baseline():
+    """Test benchmark baseline storage and regression detection"""
+    print("\nTesting benchmark regression thresholds...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tempfile
+        from benchmarks import find_regressions, load_baseline, save_baseline
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            assert load_baseline(path) is None
+            save_baseline(path, {'draw_simple_road': 0.1, 'check_collisions_5': 0.02})
+            baseline = load_baseline(path)
+        assert baseline == {'draw_simple_road': 0.1, 'check_collisions_5': 0.02}
+        print("✓ baseline round-trips through JSON")
+        
+        current = {'draw_simple_road': 0.12, 'check_collisions_5': 0.03, 'new_path': 1.0}
+        assert find_regressions(current, baseline, 0.25) == [('check_collisions_5', 0.02, 0.03)]
+        assert find_regressions(current, baseline, 0.6) == []
+        print("✓ slowdowns past the threshold are reported")
+        
+        return True
+    except Exception as e:
+        print(f"✗ benchmark baseline error: {e}")
+        return False
+
+def test_replay():
+    """Test replay recording, packing, playback and divergence detection"""
+    print("\nTesting deterministic replays...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from replay import (Replay, ReplayDivergence, ReplayError, ReplayPlayer,
+                            pack_inputs, record_headless, unpack_inputs)
+        
+        inputs = bytes([0, 1, 2, 3, 1, 0, 2])
+        assert len(pack_inputs(inputs)) == 2
+        assert unpack_inputs(pack_inputs(inputs), len(inputs)).tobytes() == inputs
+        print("✓ inputs pack to two bits per tick")
+        
+        weave = lambda sim: (sim.tick // 40) % 3
+        replay = record_headless(seed=21, ticks=5000, policy=weave, checksum_interval=10)
+        loaded = Replay.from_bytes(replay.to_bytes())
+        assert loaded.inputs == replay.inputs and loaded.checksums == replay.checksums
+        sim = ReplayPlayer(loaded).run()
+        assert sim.tick == replay.ticks
+        print(f"✓ {replay.ticks} ticks replay exactly from {len(replay.to_bytes())} bytes")
+        
+        tampered = bytearray(replay.inputs)
+        tampered[15] ^= 1
+        bad = Replay(replay.seed, replay.tick_rate, tampered, replay.checksums,
+                     replay.checksum_interval, replay.final_checksum)
+        try:
+            ReplayPlayer(bad).run()
+            assert False, "divergence not detected"
+        except ReplayDivergence as e:
+            assert e.last_good_tick == 10 and e.tick == 20
+        print("✓ divergence is reported at the next checkpoint")
+        
+        # Negative seeds wrap to 64 bits and still record, load and replay
+        replay = record_headless(seed=-5, ticks=300, policy=weave)
+        loaded = Replay.from_bytes(replay.to_bytes())
+        assert loaded.seed == (1 << 64) - 5
+        assert ReplayPlayer(loaded).run().tick == replay.ticks
+        print("✓ negative seeds record and replay")
+        
+        try:
+            Replay.from_bytes(b'nope')
+            assert False, "bad header accepted"
+        except ReplayError:
+            pass
+        print("✓ corrupt files are rejected")
+        
+        return True
+    except Exception as e:
+        print(f"✗ replay error: {e}")
+        return False
+
+def test_difficulty_analyzer():
+    """Test the Monte Carlo difficulty sweep"""
+    print("\nTesting difficulty analyzer...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from difficulty_analyzer import analyze, make_tasks, parameter_grid
+        from sim_core import Difficulty, Simulation
+        
+        sim = Simulation(0, difficulty=Difficulty(spawn_interval=30, min_spawn_interval=10))
+        assert sim.spawn_rate() == 30
+        sim.speed = 12
+        assert sim.spawn_rate() == 10
+        print("✓ difficulty parameters drive the simulation")
+        
+        grid = {'spawn_interval': [30, 40], 'max_speed': [12]}
+        assert len(parameter_grid(grid)) == 2
+        tasks = make_tasks(parameter_grid(grid), 'dodge', 10, 0, 4, 600)
+        assert len(tasks) == 6 and tasks[2][3] == [8, 9]
+        print("✓ games are sharded into chunks of seeds")
+        
+        first = analyze(grid, 'dodge', games=6, chunk_size=2, max_ticks=600, processes=2)
+        second = analyze(grid, 'dodge', games=6, chunk_size=3, max_ticks=600, processes=1)
+        assert len(first) == 2 and all(row['games'] == 6 for row in first)
+        assert [row['score'] for row in first] == [row['score'] for row in second]
+        print("✓ sweeps are reproducible across chunking and process counts")
+        
+        return True
+    except Exception as e:
+        print(f"✗ difficulty analyzer error: {e}")
+        return False
+
+def test_vec_env():
+    """Test the batched environment rules, auto-reset and determinism"""
+    print("\nTesting vectorized environment...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from vec_env import VecEnv
+        
+        env = VecEnv(3)
+        obs = env.reset([1, 2, 3])
+        assert obs.shape == (3, env.observation_size) and obs.dtype == np.float32
+        
+        # Game 0 has an obstacle on the player, game 1 one about to despawn
+        env.alive[0, 0] = env.alive[1, 0] = True
+        env.obstacle_x[:2, 0] = env.player_x[:2]
+        env.obstacle_y[0, 0], env.obstacle_y[1, 0] = 500, 645
+        env.obstacle_width[:2, 0], env.obstacle_height[:2, 0] = 30, 40
+        env.obstacle_half_width[:2, 0], env.obstacle_half_height[:2, 0] = 15, 20
+        obs, rewards, dones, info = env.step([0, 0, 2])
+        assert dones.tolist() == [True, False, False]
+        assert info['final_score'][0] == 1 and rewards.tolist() == [1, 11, 1]
+        assert env.score[0] == 0 and not env.alive[0].any()
+        assert env.player_x[2] == env.player_x[1] + 8
+        print("✓ crashes, despawn scoring and steering follow the game rules")
+        
+        def rollout():
+            env = VecEnv(64)
+            env.reset(np.arange(64))
+            actions = np.random.default_rng(0).integers(0, 3, (600, 64))
+            finished = 0
+            for step_actions in actions:
+                _, _, dones, _ = env.step(step_actions)
+                finished += int(dones.sum())
+            return finished, env.score.copy()
+        
+        first, second = rollout(), rollout()
+        assert first[0] > 0 and first[0] == second[0]
+        assert (first[1] == second[1]).all()
+        print(f"✓ {first[0]} episodes auto-reset reproducibly")
+        
+        # Same seed and inputs as a Simulation: the same obstacles every tick
+        from sim_core import Simulation, dodge_policy
+        largest_wave = 0
+        for seed in range(8):
+            sim = Simulation(seed)
+            env = VecEnv(1)
+            env.reset([seed])
+            for _ in range(3000):
+                action = dodge_policy(sim)
+                count = len(sim.obstacles)
+                sim.step(action)
+                _, _, dones, info = env.step([action])
+                if dones[0]:
+                    break
+                n = len(sim.obstacles)
+                largest_wave = max(largest_wave, n - count)
+                live = env.alive[0]
+                assert (sorted(zip(sim.obstacles.x[:n].tolist(), sim.obstacles.y[:n].tolist()))
+                        == sorted(zip(env.obstacle_x[0, live].tolist(),
+                                      env.obstacle_y[0, live].tolist())))
+            assert sim.crashed == bool(dones[0]) and info['final_score'][0] == sim.score
+        assert largest_wave >= 2 and env.overflow == 0
+        print("✓ episodes match Simulation(seed) tick for tick, patterns included")
+        
+        # Auto-reset episodes report seeds that replay in the game
+        env = VecEnv(4)
+        env.reset(np.arange(4))
+        actions = np.random.default_rng(1).integers(0, 3, (400, 4))
+        history = [[] for _ in range(4)]
+        replayed = 0
+        for step_actions in actions:
+            _, _, dones, info = env.step(step_actions)
+            for game in range(4):
+                history[game].append(int(step_actions[game]))
+                if dones[game]:
+                    sim = Simulation(int(info['seeds'][game]))
+                    for action in history[game]:
+                        sim.step(action)
+                    assert sim.crashed and sim.score == info['final_score'][game]
+                    history[game] = []
+                    replayed += 1
+        assert replayed > 4
+        print(f"✓ {replayed} finished episodes replayed from their reported seeds")
+        
+        return True
+    except Exception as e:
+        print(f"✗ vec env error: {e}")
+        return False
+
+def test_asset_warmup():
+    """Test background asset loading and the loading screen"""
+    print("\nTesting asynchronous asset warm-up...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import threading
+        from assets import AssetLoader
+        
+        gate = threading.Event()
+        loader = AssetLoader()
+        loader.submit('slow', gate.wait)
+        loader.submit('after', lambda: loader.get('slow') and 'done')
+        loader.submit('broken', lambda: 1 / 0)
+        assert not loader.ready('slow') and loader.progress() == 0.0
+        gate.set()
+        assert loader.get('after') == 'done'
+        try:
+            loader.get('broken')
+            assert False, "error not re-raised"
+        except ZeroDivisionError:
+            pass
+        loader.wait_all()
+        assert loader.progress() == 1.0 and not loader.pending()
+        loader.shutdown()
+        print("✓ assets load in order off the main thread and surface errors")
+        
+        from retro_racer import RetroRacer
+        game = RetroRacer(music=False, engine_sound=False)
+        assert game.game_state == "LOADING" and game.sprites is None
+        # The title is rendered once, so frames never touch the font
+        game.loading_font = None
+        game.draw_loading_screen()
+        game.present()
+        assert 'first_frame' in game.startup_times
+        # Leaving LOADING installs the start screen's assets in the same step
+        game.assets.get('text')
+        game.update_loading()
+        assert game.game_state == "START"
+        assert {'fonts', 'layers', 'text'} <= game.applied_assets
+        game.require_assets('fonts', 'sprites')
+        assert game.start_button.font is game.ui_font and game.sprites is not None
+        game.require_assets()
+        assert game.sound_enabled == (game.sounds['beep'] is not None)
+        game.assets.shutdown()
+        print(f"✓ first frame after {game.startup_times['first_frame']:.0f} ms, "
+              "assets installed on demand")
+        
+        return True
+    except Exception as e:
+        print(f"✗ asset warm-up error: {e}")
+        return False
+
+def test_music_stream():
+    """Test block-rendered music and the channel feeder"""
+    print("\nTesting streaming music...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from audio_stream import AudioStream
+        from music import MAX_TEMPO, MIN_TEMPO, MusicSynth, tempo_for_speed
+        
+        assert tempo_for_speed(5) == MIN_TEMPO and tempo_for_speed(12) == MAX_TEMPO
+        synth = MusicSynth(tempo=120)
+        whole = np.zeros((8192, 2), dtype=np.int16)
+        synth.render(whole)
+        synth = MusicSynth(tempo=120)
+        halves = np.zeros((8192, 2), dtype=np.int16)
+        synth.render(halves[:4096])
+        synth.render(halves[4096:])
+        # Two blocks match one long block, up to float rounding at note edges
+        assert (np.abs(whole.astype(int) - halves.astype(int)) > 1).mean() < 0.001
+        assert np.abs(whole).max() > 1000 and abs(synth.beat - 8192 * 2 / 22050) < 1e-9
+        print("✓ music renders in blocks with continuous phase and beat")
+        
+        class FakeChannel:
+            def __init__(self):
+                self.playing = self.queued = None
+            def get_busy(self):
+                return self.playing is not None
+            def get_queue(self):
+                return self.queued
+            def play(self, sound):
+                self.playing = sound
+            def queue(self, sound):
+                self.queued = sound
+            def stop(self):
+                self.playing = self.queued = None
+        
+        pygame.mixer.init(frequency=22050, size=-16, channels=2)
+        channel = FakeChannel()
+        stream = AudioStream(synth.render, channel, block_frames=1024)
+        assert stream.feed() and stream.feed() and not stream.feed()
+        first, second = channel.playing, channel.queued
+        assert first is not second
+        channel.playing, channel.queued = None, second  # mixer between blocks
+        assert not stream.feed() and stream.underruns == 0
+        channel.playing, channel.queued = second, None
+        assert stream.feed() and channel.queued not in (first, second)
+        channel.stop()
+        stream.feed()
+        assert stream.underruns == 1 and stream.blocks == 4
+        print("✓ feeder keeps one block queued and counts real underruns only")
+        
+        return True
+    except Exception as e:
+        print(f"✗ music stream error: {e}")
+        return False
+
+def test_engine_audio():
+    """Test the wavetable engine voice"""
+    print("\nTesting engine audio...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tracemalloc
+        import numpy as np
+        from engine_audio import EngineVoice, WavetableBank
+        
+        bank = WavetableBank()
+        assert bank.count == 8 and bank.position(3) == 0 and bank.position(20) == 7
+        assert bank.position(8.5) == 3.5
+        print("✓ wavetable bank covers speeds 5 to 12")
+        
+        def crossings(speed):
+            voice = EngineVoice(bank)
+            voice.level, voice.speed = 1.0, speed
+            block = np.zeros((22050, 2), dtype=np.int16)
+            voice.render(block)
+            voice.render(block)  # settled at the target speed
+            wave = block[:, 0].astype(int)
+            return np.count_nonzero((wave[:-1] < 0) & (wave[1:] >= 0))
+        
+        assert crossings(5) < crossings(8.5) < crossings(12)
+        print("✓ engine pitch rises with speed")
+        
+        voice = EngineVoice(bank)
+        voice.level = 1.0
+        blocks = np.zeros((4, 1024, 2), dtype=np.int16)
+        for i, speed in enumerate((5, 7.5, 12, 6)):
+            voice.speed = speed
+            voice.render(blocks[i])
+        wave = blocks[:, :, 0].astype(int)
+        steps = np.abs(np.diff(wave.ravel()))
+        seams = np.abs(wave[1:, 0] - wave[:-1, -1])
+        # Speed changes glide, so block seams are no harsher than the waveform itself
+        assert seams.max() <= steps.max() and np.abs(wave).max() > 1000
+        voice.level = 0.0
+        voice.render(blocks[0])
+        voice.render(blocks[1])
+        assert not blocks[1].any()
+        print("✓ speed and level changes glide across blocks")
+        
+        tracemalloc.start()
+        for speed in (5, 9, 12):
+            voice.speed = speed
+            voice.render(blocks[2])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak < 8192, peak
+        print(f"✓ steady-state rendering allocates no sample buffers ({peak} bytes peak)")
+        
+        return True
+    except Exception as e:
+        print(f"✗ engine audio error: {e}")
+        return False
+
+def test_particles():
+    """Test the pooled particle system"""
+    print("\nTesting particles...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from particles import ParticleSystem
+        
+        particles = ParticleSystem(capacity=1000, seed=0)
+        assert particles.emit('crash', 100, 100) == 400
+        assert particles.emit('sparks', 100, 100, count=700) == 600
+        assert len(particles) == 1000 and particles.dropped == 100
+        print("✓ emission fills a fixed-capacity pool and drops the overflow")
+        
+        particles.life[:500] = 0.01
+        particles.update(0.02)
+        assert len(particles) == 500 and (particles.life[:500] > 0).all()
+        particles.update(2.0)
+        assert len(particles) == 0
+        print("✓ expired particles are swap-removed from the pool")
+        
+        surface = pygame.Surface((200, 200), depth=32)
+        surface.fill((100, 0, 0))
+        particles.emit('exhaust', 50, 50, count=1)
+        particles.vx[0] = particles.vy[0] = particles.ay[0] = 0
+        particles.color[0] = (200, 80, 0)
+        particles.life[0] = particles.max_life[0] = 1.0
+        rect = particles.draw(surface)
+        # Additive and saturating, over the 2x2 square at the particle
+        assert surface.get_at((50, 50))[:3] == (255, 80, 0)
+        assert surface.get_at((51, 51))[:3] == (255, 80, 0)
+        assert surface.get_at((52, 52))[:3] == (100, 0, 0)
+        assert rect == pygame.Rect(50, 50, 2, 2)
+        particles.x[0] = -10
+        assert particles.draw(surface) is None
+        print("✓ particles blend additively into the surface pixels")
+        
+        # Particles on the same pixel all add to it
+        surface.fill((0, 0, 0))
+        particles = ParticleSystem(capacity=2, seed=0)
+        particles.emit('exhaust', 20, 20, count=2)
+        particles.x[:2], particles.y[:2] = 20, 20
+        particles.color[:2] = (60, 0, 0)
+        particles.life[:2] = particles.max_life[:2] = 1.0
+        particles.draw(surface)
+        assert surface.get_at((20, 20))[:3] == (120, 0, 0)
+        print("✓ overlapping particles add up")
+        
+        return True
+    except Exception as e:
+        print(f"✗ particles error: {e}")
+        return False
+
+def test_perspective_road():
+    """Test the pseudo-3D road tables, rasterizer and projection"""
+    print("\nTesting perspective road...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import numpy as np
+        from road3d import GROUND_COLORS, PerspectiveRoad, sprite_size
+        from sim_core import PLAYER_Y
+        
+        road = PerspectiveRoad((800, 600))
+        player = PLAYER_Y - road.top
+        assert road.scale[player] == 1.0 and road.depth[player] == 0.0
+        assert (np.diff(road.scale) > 0).all() and (np.diff(road.road_half) >= 0).all()
+        print("✓ projection tables keep scale 1 at the player's row")
+        
+        x, y, scale, visible = road.project([400, 250, 550, 400, 400], [500, 500, 100, -50, 700])
+        assert np.allclose(x[:2], [400, 250]) and np.allclose(y[:2], 500) and scale[0] == 1.0
+        assert 400 < x[2] < 550 and y[3] < y[2] < 500 and scale[3] < scale[2] < 1.0
+        assert visible[:4].all() and not visible[4]
+        bent = road.project([400], [100], curve=100)[0][0]
+        assert bent > 400 and road.project([400], [500], curve=100)[0][0] == 400
+        assert sprite_size(30, 40, 0.5) == (16, 20)
+        print("✓ obstacles project through the same tables and follow the curve")
+        
+        surface = pygame.Surface((800, 600), depth=32)
+        surface.fill((1, 2, 3))
+        rect = road.draw(surface, scroll=0.0, curve=0.0)
+        assert rect.top == road.top and rect.bottom == 600
+        assert surface.get_at((400, road.top - 1))[:3] == (1, 2, 3)
+        assert surface.get_at((0, 599))[:3] in GROUND_COLORS['grass']
+        assert surface.get_at((300, 599))[:3] in GROUND_COLORS['road']
+        assert surface.get_at((400, 599))[:3] in GROUND_COLORS['line']
+        print("✓ ground is rasterized below the horizon only")
+        
+        return True
+    except Exception as e:
+        print(f"✗ perspective road error: {e}")
+        return False
+
+def test_render_resolution():
+    """Test rendering at a lower internal resolution"""
+    print("\nTesting render resolution...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import argparse
+        from layers import road_bounds
+        from particles import ParticleSystem
+        from retro_racer import RetroRacer, parse_size
+        from sprites import SpriteAtlas
+        
+        assert parse_size('400x300') == (400, 300)
+        for text in ('400x400', 'wide'):
+            try:
+                parse_size(text)
+                assert False, f"{text} should be rejected"
+            except argparse.ArgumentTypeError:
+                pass
+        print("✓ --render-size accepts 4:3 sizes only")
+        
+        atlas = SpriteAtlas()
+        full, _ = atlas.get('car', 30, 40)
+        half, anchor = atlas.get('car', 30, 40, 0.5)
+        assert half.width == round(full.width * 0.5) and half.height == round(full.height * 0.5)
+        rect = atlas.blit(pygame.Surface((400, 300)), 'car', 30, 40, 200, 400, 0.5)
+        assert rect.topleft == (100 - anchor[0], 200 - anchor[1])
+        assert road_bounds((400, 300)) == (125, 275)
+        particles = ParticleSystem(seed=0)
+        particles.emit('sparks', 400, 400, count=10)
+        particles.update(0.0)
+        drawn = particles.draw(pygame.Surface((400, 300), depth=32), 0.5)
+        assert drawn is not None and drawn.right <= 400 and drawn.bottom <= 300
+        print("✓ sprites, road and particles scale to the render size")
+        
+        # SDL cannot turn an existing window into a SCALED one, so start a fresh display
+        pygame.display.quit()
+        pygame.display.init()
+        game = RetroRacer(seed=0, music=False, engine_sound=False, render_size=(400, 300))
+        game.require_assets()
+        assert game.screen.get_size() == (400, 300) and game.view_scale == 0.5
+        assert game.start_button.rect == pygame.Rect(150, 200, 100, 25)
+        assert game.ui_font.get_height() < 30
+        try:
+            RetroRacer(music=False, engine_sound=False, render_size=(400, 400))
+            assert False, "non-4:3 render size should be rejected"
+        except ValueError:
+            pass
+        pygame.display.quit()
+        pygame.display.init()
+        print("✓ layout and fonts follow the view scale")
+        
+        return True
+    except Exception as e:
+        print(f"✗ render resolution error: {e}")
+        return False
+
+def test_parallax():
+    """Test the pre-rendered parallax backdrop strips"""
+    print("\nTesting parallax backdrop...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from parallax import GRID_SIZE, Parallax, ParallaxLayer
+        
+        strip = pygame.Surface((100, 10))
+        strip.fill((0, 0, 0))
+        strip.fill((255, 0, 0), (0, 0, 10, 10))
+        target = pygame.Surface((80, 10))
+        layer = ParallaxLayer(strip, (0, 0, 80, 10), rate=1.0)
+        assert layer.draw(target, 95) == pygame.Rect(0, 0, 80, 10)
+        assert target.get_at((0, 0))[:3] == (0, 0, 0)
+        assert target.get_at((5, 0))[:3] == (255, 0, 0)
+        assert target.get_at((15, 0))[:3] == (0, 0, 0)
+        print("✓ strips wrap seamlessly with at most two blits")
+        
+        backdrop = Parallax((800, 600), 300, seed=1)
+        assert len(backdrop.layers) == 4
+        assert len(Parallax((800, 600), 240, ground=False).layers) == 3
+        grid = backdrop.layers[-1][0]
+        assert grid.axis == 1 and grid.length % GRID_SIZE == 0
+        assert all(layer.length >= 800 for layer, axis in backdrop.layers if axis == 0)
+        print("✓ stars, mountains and grid are pre-rendered once")
+        
+        backdrop.twinkle(0.0)
+        before = backdrop.stars.get_palette()[1:33]
+        backdrop.twinkle(0.5)
+        assert backdrop.stars.get_palette()[1:33] != before
+        assert backdrop.stars.get_palette_at(0)[:3] == (0, 0, 0)
+        screen = pygame.Surface((800, 600))
+        bands = backdrop.draw(screen, 10.0, 20.0, 1.0)
+        assert len(bands) == 4 and bands[-1].top == 300
+        print("✓ stars twinkle through the palette")
+        
+        return True
+    except Exception as e:
+        print(f"✗ parallax error: {e}")
+        return False
+
+def test_glow():
+    """Test the cached glow buffers and the bloom pass"""
+    print("\nTesting glow and bloom...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import tracemalloc
+        from glow import Bloom, GlowCache
+        from profiler import profiler
+        from retro_racer import RetroButton
+        
+        glow = GlowCache()
+        font = pygame.font.Font(None, 24)
+        button = RetroButton(100, 100, 200, 50, "GO", font, (255, 20, 147), (255, 182, 193),
+                             glow=glow)
+        button.glow_intensity = 0.5
+        screen = pygame.Surface((400, 300))
+        assert button.draw(screen) == button.rect.inflate(12, 12)
+        assert glow.builds == 1
+        profiler.enabled = True
+        try:
+            profiler.begin_frame()
+            for _ in range(10):
+                button.draw(screen)
+            profiler.end_frame()
+            assert 'surfaces' not in profiler.last_counters
+        finally:
+            profiler.enabled = False
+        assert glow.builds == 1
+        print("✓ button glow is pre-rendered once and reused")
+        
+        screen.fill((0, 0, 0))
+        rect = glow.draw_panel(screen, pygame.Rect(10, 10, 100, 50), (25, 25, 112), (0, 255, 255))
+        assert rect == pygame.Rect(10, 10, 100, 50).inflate(4, 4)
+        assert screen.get_at((8, 30))[:3] == (0, 255, 255)
+        assert 0 < screen.get_at((50, 30))[2] < 112
+        print("✓ HUD panels and borders come from one cached surface")
+        
+        screen = pygame.Surface((320, 240), depth=32)
+        screen.fill((10, 10, 20))
+        screen.fill((255, 255, 255), (152, 112, 16, 16))
+        bloom = Bloom()
+        bloom.apply(screen)
+        assert screen.get_at((160, 104))[0] > 10 and screen.get_at((10, 10))[:3] == (10, 10, 20)
+        tracemalloc.start()
+        for _ in range(3):
+            bloom.apply(screen)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak < 8192, f"bloom allocated {peak} bytes"
+        print("✓ bloom spreads bright areas and reuses its buffers")
+        
+        return True
+    except Exception as e:
+        print(f"✗ glow error: {e}")
+        return False
+
+def test_spawn_schedule():
+    """Test seeded batched spawn waves, pattern mixing and passability"""
+    print("\nTesting spawn schedule...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from sim_core import MAX_SPEED, OBSTACLE_SPAWN_Y, START_SPEED, Difficulty, Simulation
+        
+        def stream(seed, speed, waves=200):
+            spawner = Simulation(seed).spawner
+            return [(w.name, w.xs.tolist()) for w in (spawner.next_wave(speed) for _ in range(waves))]
+        assert stream(4, 8) == stream(4, 8) and stream(4, 8) != stream(5, 8)
+        print("✓ the same seed schedules the same waves")
+        
+        spawner = Simulation(1).spawner
+        spawner.next_wave(START_SPEED)
+        assert len(spawner.upcoming()) >= spawner.lookahead
+        slow = sum(name != 'single' for name, _ in stream(1, START_SPEED, 400))
+        fast = [name for name, _ in stream(1, MAX_SPEED, 400)]
+        assert 0 < slow < sum(name != 'single' for name in fast)
+        assert 'chicane' in fast and 'chicane' not in [n for n, _ in stream(1, START_SPEED, 400)]
+        print(f"✓ patterns mix in with speed ({slow} -> {400 - fast.count('single')} of 400 waves)")
+        
+        # Too fast to steer through a chicane: those waves are swapped out
+        sim = Simulation(2, difficulty=Difficulty(max_speed=40, pattern_chance=1.0))
+        names = [sim.spawner.next_wave(40).name for _ in range(400)]
+        assert sim.spawner.rejected > 0 and 'chicane' not in names
+        for wave in sim.spawner.templates.values():
+            assert sim.spawner.pass_rows(wave.rows) is not None or wave.name == 'chicane'
+        print(f"✓ impassable waves are replaced ({sim.spawner.rejected} rejected)")
+        
+        sim = Simulation(3, difficulty=Difficulty(pattern_chance=1.0))
+        sim.speed = MAX_SPEED
+        while True:
+            before = len(sim.obstacles)
+            sim.spawn_wave()
+            wave_ys = sim.obstacles.y[before:len(sim.obstacles)]
+            if wave_ys.min() < OBSTACLE_SPAWN_Y:
+                break
+        assert wave_ys.max() == OBSTACLE_SPAWN_Y and sim.obstacle_spawn_timer < 0
+        print("✓ multi-row waves spawn above the line and delay the next wave")
+        
+        return True
+    except Exception as e:
+        print(f"✗ spawn schedule error: {e}")
+        return False
+
+def test_ghost_race():
+    """Test ghost-race snapshots, the relay, interpolation and the load test"""
+    print("\nTesting ghost race networking...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import contextlib
+        import io
+        import time
+        from ghost_load import run_load_test
+        import socket
+        from ghost_net import (CAR_ID, MSG_KEYFRAME, MSG_PING, MSG_SNAPSHOT, STATE_RACING, ZERO,
+                               GhostClient, RemoteCar, decode_delta, encode_delta, frame,
+                               quantize)
+        from ghost_relay import GhostRelay
+        from retro_racer import RetroRacer
+        
+        previous = quantize(12.0, 401.25, 5000, 700, STATE_RACING)
+        current = quantize(12.05, 395.5, 5030, 703, STATE_RACING)
+        delta = encode_delta(previous, current)
+        assert decode_delta(previous, delta) == (current, len(delta))
+        assert decode_delta(ZERO, encode_delta(ZERO, current))[0] == current
+        assert len(frame(MSG_SNAPSHOT, delta)) <= 9
+        print(f"✓ snapshots travel as {len(frame(MSG_SNAPSHOT, delta))}-byte quantized deltas")
+        
+        car = RemoteCar()
+        car.add(quantize(1.0, 300, 100, 0, STATE_RACING), now=10.0)
+        car.add(quantize(1.1, 340, 150, 0, STATE_RACING), now=10.1)
+        x, distance, _, _ = car.sample(10.15, delay=0.1)
+        assert abs(x - 320) < 1e-9 and abs(distance - 125) < 1e-9
+        print("✓ remote cars are interpolated behind their newest snapshot")
+        
+        relay = GhostRelay()
+        port = relay.start_thread('127.0.0.1', 0)
+        clients = [GhostClient('127.0.0.1', port, seed=seed).start() for seed in (7, 7, 7, 8)]
+        for i, client in enumerate(clients):
+            assert client.connected.wait(5)
+            client.publish(1.0, 300 + i * 40, 1000 + i * 100, i, STATE_RACING)
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline and len(clients[0].ghosts()) < 2:
+            time.sleep(0.02)
+        seen = sorted((round(x), round(distance)) for _, x, distance, _, _ in clients[0].ghosts())
+        assert seen == [(340, 1100), (380, 1200)], seen
+        assert clients[3].ghosts() == []
+        clients[2].close()
+        while time.perf_counter() < deadline and len(clients[0].remotes) > 1:
+            time.sleep(0.02)
+        assert len(clients[0].remotes) == 1
+        print("✓ the relay forwards cars within a seed's room and drops leavers")
+        
+        # A receiver too far behind for snapshots still hears about departures
+        throttled = GhostRelay(max_buffer=-1)
+        throttled_port = throttled.start_thread('127.0.0.1', 0)
+        leaver = GhostClient('127.0.0.1', throttled_port, seed=3).start()
+        assert leaver.connected.wait(5)
+        leaver.publish(1.0, 300, 100, 0, STATE_RACING)
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline and not any(
+                session.snapshot != ZERO for room in throttled.rooms.values()
+                for session in room.sessions.values()):
+            time.sleep(0.02)
+        stalled = GhostClient('127.0.0.1', throttled_port, seed=3).start()
+        while time.perf_counter() < deadline and not stalled.remotes:
+            time.sleep(0.02)
+        assert len(stalled.remotes) == 1
+        leaver.publish(1.1, 320, 140, 0, STATE_RACING)
+        while time.perf_counter() < deadline and not throttled.stats()['skipped']:
+            time.sleep(0.02)
+        leaver.close()
+        while time.perf_counter() < deadline and stalled.remotes:
+            time.sleep(0.02)
+        assert not stalled.remotes and throttled.stats()['skipped'] > 0, throttled.stats()
+        stalled.close()
+        
+        # A bad hello is answered by closing the connection
+        with socket.create_connection(('127.0.0.1', throttled_port), timeout=5) as probe:
+            probe.sendall(frame(MSG_PING, b'x'))
+            assert probe.recv(16) == b''
+        throttled.stop()
+        
+        # A car that goes quiet without a departure is dropped, and resumes cleanly
+        quiet = GhostClient('127.0.0.1', 0, timeout=3.0)
+        keyframe = CAR_ID.pack(9) + encode_delta(ZERO, quantize(1.0, 200, 50, 0, STATE_RACING))
+        quiet.handle(MSG_KEYFRAME, keyframe, now=100.0)
+        assert len(quiet.ghosts(now=101.0)) == 1
+        assert quiet.ghosts(now=104.0) == [] and not quiet.remotes
+        delta = CAR_ID.pack(9) + encode_delta(quantize(1.0, 200, 50, 0, STATE_RACING),
+                                              quantize(5.0, 240, 90, 0, STATE_RACING))
+        quiet.handle(MSG_SNAPSHOT, delta, now=105.0)
+        assert [(round(x), round(d)) for _, x, d, _, _ in quiet.ghosts(now=105.0)] == [(240, 90)]
+        print("✓ departures survive throttling, bad hellos are closed, silent cars expire")
+        
+        # The game draws ghosts from the connection without waiting on it
+        pygame.display.quit()
+        pygame.display.init()
+        game = RetroRacer(seed=9, music=False, engine_sound=False, ghost=('127.0.0.1', port))
+        game.require_assets()
+        game.game_state = "PLAYING"
+        game.reset_game()
+        game.publish_ghost()
+        assert game.ghost.local[4] == STATE_RACING
+        racer = GhostClient('127.0.0.1', port, seed=9).start()
+        racer.publish(1.0, 400, 150, 5, STATE_RACING)
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline and not game.ghost.ghosts():
+            time.sleep(0.02)
+        game.screen.fill((0, 0, 0))
+        game.draw_ghosts()
+        scale = game.view_scale
+        center = (int(400 * scale), int((game.player_y - 150) * scale))
+        assert game.screen.get_at(center) != (0, 0, 0, 255)
+        for client in clients + [racer]:
+            client.close()
+        relay.stop()
+        print("✓ other racers are drawn as ghosts ahead of the player")
+        
+        # Losing the relay is reported once, not every frame
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline and game.ghost.error is None:
+            time.sleep(0.02)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            game.check_ghost()
+            game.check_ghost()
+        assert output.getvalue().count("Ghost race: relay") == 1, output.getvalue()
+        game.ghost.close()
+        print("✓ a lost relay connection is reported once")
+        
+        report = run_load_test(clients=40, room_size=4, seconds=1.0, local=True)
+        assert report['errors'] == 0 and report['snapshots_received'] > 0
+        assert report['up_bytes_per_s'] < 400
+        print(f"✓ load test: {report['clients']} clients at {report['up_bytes_per_s']:.0f} B/s up, "
+              f"relay latency p50 {report['relay_latency_ms']['p50']:.2f} ms")
+        
+        return True
+    except Exception as e:
+        print(f"✗ ghost race error: {e}")
+        return False
+
+def test_leaderboard():
+    """Test the SQLite leaderboard, its writer thread and the menu panel"""
+    print("\nTesting leaderboard...")
+    try:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import sqlite3
+        import tempfile
+        import time
+        from leaderboard import TOP_RUNS, Leaderboard
+        from retro_racer import RetroRacer
+        
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, 'leaderboard.db')
+            board = Leaderboard(path, top_n=3).start()
+            assert board.loaded.wait(5) and board.error is None
+            places = [board.record(score, score * 2, 30.0, 200) for score in (500, 900, 100, 700)]
+            assert places == [1, 1, 3, 2], places
+            assert board.record(50, 0, 1.0, 100) is None
+            assert [run[0] for run in board.top] == [900, 700, 500]
+            board.flush()
+            
+            reader = sqlite3.connect(path)
+            assert reader.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            assert reader.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 5
+            plan = ' '.join(row[-1] for row in reader.execute("EXPLAIN QUERY PLAN " + TOP_RUNS, (3,)))
+            assert 'runs_by_score' in plan and 'TEMP B-TREE' not in plan, plan
+            print("✓ runs are stored in WAL mode and top-N reads the score index")
+            
+            # A writer stuck behind a lock: record() neither waits nor grows the queue
+            reader.execute("BEGIN IMMEDIATE")
+            stalled = Leaderboard(path, queue_size=8).start()
+            stalled.loaded.wait(5)
+            start = time.perf_counter()
+            for score in range(40):
+                stalled.record(score, 0, 1.0, 100)
+            assert time.perf_counter() - start < 0.05
+            assert stalled.dropped > 0 and stalled.queue.qsize() <= 8
+            reader.rollback()
+            stalled.close()
+            assert stalled.written + stalled.dropped == 40
+            assert stalled.batches < stalled.written
+            print(f"✓ a stalled disk drops {stalled.dropped} of 40 runs instead of blocking; "
+                  f"{stalled.written} written in {stalled.batches} transactions")
+            board.close()
+            reader.close()
+            
+            reopened = Leaderboard(path, top_n=3).start()
+            reopened.loaded.wait(5)
+            assert [run[0] for run in reopened.top] == [900, 700, 500]
+            reopened.close()
+            print("✓ the top runs are loaded again on the next start")
+            
+            # Crashed runs are recorded and the menus draw the cached board
+            pygame.display.quit()
+            pygame.display.init()
+            game = RetroRacer(seed=3, music=False, engine_sound=False, leaderboard_path=path)
+            game.require_assets()
+            game.apply_ready_assets()
+            game.leaderboard.loaded.wait(5)
+            game.game_state = "PLAYING"
+            game.reset_game()
+            while game.game_state == "PLAYING":
+                game.update_game()
+            game.draw_enhanced_game_over_screen()
+            game.game_state = "START"
+            game.draw_enhanced_start_screen()
+            game.leaderboard.close()
+            assert game.leaderboard.written == 1 and game.leaderboard.error is None
+            print(f"✓ a finished run is recorded (place {game.leaderboard_place}) and shown on the menus")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Leaderboard error: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🎮 RETRO RACER - Enhanced Features Test")
@@ -104,7 +1335,31 @@ def main():
         test_imports,
         test_pygame_init,
         test_sound_generation,
-        test_retro_racer_import
+        test_retro_racer_import,
+        test_synth_cache,
+        test_layer_compositor,
+        test_text_cache,
+        test_sprite_atlas,
+        test_obstacle_store,
+        test_simulation_core,
+        test_fixed_timestep,
+        test_dirty_rects,
+        test_profiler,
+        test_benchmark_baseline,
+        test_replay,
+        test_difficulty_analyzer,
+        test_vec_env,
+        test_asset_warmup,
+        test_music_stream,
+        test_engine_audio,
+        test_particles,
+        test_perspective_road,
+        test_render_resolution,
+        test_parallax,
+        test_glow,
+        test_spawn_schedule,
+        test_ghost_race,
+        test_leaderboard
     ]
     
     passed = 0
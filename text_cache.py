@@ -0,0 +1,172 @@
+"""
+Shared LRU cache of rendered text for RETRO RACER
+
+Rendered strings are cached by (font, text, color) with bounded LRU
+eviction. A whole glow stack can be baked into one Surface so a glowing
+label costs one blit, and frequently changing strings such as HUD
+counters are drawn from cached per-glyph surfaces instead.
+"""
+from collections import OrderedDict
+
+import pygame
+
+from profiler import profiler
+
+# Offsets used for the eight-way text glow
+GLOW_OFFSETS = ((2, 2), (-2, -2), (2, -2), (-2, 2), (0, 2), (0, -2), (2, 0), (-2, 0))
+
+
+def shade(color, factor, levels=32):
+    """Scale a color by a factor snapped to a fixed number of levels
+
+    Animated brightness would otherwise create a new cache key per frame.
+    """
+    factor = round(factor * levels) / levels
+    return tuple(min(255, int(c * factor)) for c in color)
+
+
+class TextCache:
+    """Bounded LRU cache of rendered text and glyph surfaces"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key, build):
+        """Return the cached value for key, building it on a miss"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = build()
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def render(self, font, text, color):
+        """Return the antialiased text surface for (font, text, color)"""
+        color = tuple(color)
+        return self.lookup(('text', font, text, color),
+                           lambda: self.render_text(font, text, color))
+
+    def render_text(self, font, text, color):
+        """Render uncached text (counted as a Surface allocation)"""
+        profiler.count('surfaces')
+        return font.render(text, True, color)
+
+    def render_glow(self, font, text, color, glow_color, offsets=GLOW_OFFSETS):
+        """Return (surface, origin) with the glow stack and text baked together
+
+        Blit the surface at the text position minus origin.
+        """
+        color, glow_color, offsets = tuple(color), tuple(glow_color), tuple(offsets)
+        key = ('glow', font, text, color, glow_color, offsets)
+        return self.lookup(key, lambda: self.bake(
+            self.render(font, text, glow_color), offsets, self.render(font, text, color)))
+
+    def bake(self, glow_surface, offsets, main_surface=None):
+        """Stack copies of glow_surface at offsets, with main_surface on top"""
+        min_x = min(0, min(dx for dx, _ in offsets))
+        min_y = min(0, min(dy for _, dy in offsets))
+        max_x = max(0, max(dx for dx, _ in offsets))
+        max_y = max(0, max(dy for _, dy in offsets))
+        width, height = glow_surface.get_size()
+
+        profiler.count('surfaces')
+        baked = pygame.Surface((width + max_x - min_x, height + max_y - min_y), pygame.SRCALPHA)
+        for dx, dy in offsets:
+            baked.blit(glow_surface, (dx - min_x, dy - min_y))
+        if main_surface is not None:
+            baked.blit(main_surface, (-min_x, -min_y))
+        return baked, (-min_x, -min_y)
+
+    def advance(self, font, char):
+        """Horizontal advance of one glyph"""
+        metrics = font.metrics(char)
+        if metrics and metrics[0]:
+            return metrics[0][4]
+        return font.size(char)[0]
+
+    def glyph_table(self, font, color, glow_color=None, offsets=GLOW_OFFSETS):
+        """Per-style glyph atlas: char -> (glyph, glow, glow origin, advance)"""
+        key = ('glyphs', font, color, glow_color, offsets)
+        return self.lookup(key, dict)
+
+    def build_glyph(self, font, char, color, glow_color, offsets):
+        """Render one glyph, and its baked glow stack if requested"""
+        self.misses += 1
+        glyph = self.render_text(font, char, color)
+        glow, origin = None, (0, 0)
+        if glow_color is not None:
+            glow, origin = self.bake(self.render_text(font, char, glow_color), offsets)
+        return glyph, glow, origin, self.advance(font, char)
+
+    def draw_glyphs(self, target, font, text, pos, color, glow_color=None, offsets=GLOW_OFFSETS):
+        """Draw text glyph by glyph from the atlas and return the touched Rect
+
+        Changing strings such as score counters reuse the same glyphs
+        instead of adding a new cache entry per value.
+        """
+        color = tuple(color)
+        if glow_color is not None:
+            glow_color, offsets = tuple(glow_color), tuple(offsets)
+        table = self.glyph_table(font, color, glow_color, offsets)
+
+        x, y = pos
+        glows = []
+        mains = []
+        for char in text:
+            entry = table.get(char)
+            if entry is None:
+                entry = table[char] = self.build_glyph(font, char, color, glow_color, offsets)
+            glyph, glow, origin, advance = entry
+            if glow is not None:
+                glows.append((glow, (x - origin[0], y - origin[1])))
+            mains.append((glyph, (x, y)))
+            x += advance
+
+        # All glow layers first so they never cover a neighbouring glyph
+        if glows:
+            target.blits(glows, doreturn=False)
+        target.blits(mains, doreturn=False)
+
+        rect = pygame.Rect(pos[0], pos[1], x - pos[0], font.get_height())
+        if glow_color is not None:
+            pad_x = max(abs(dx) for dx, _ in offsets)
+            pad_y = max(abs(dy) for _, dy in offsets)
+            rect.inflate_ip(pad_x * 2, pad_y * 2)
+        return rect
+
+    def clear(self):
+        """Drop every cached surface"""
+        self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current size"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+_shared_cache = None
+
+
+def shared_text_cache():
+    """Return the process-wide text cache"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = TextCache()
+    return _shared_cache
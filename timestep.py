@@ -0,0 +1,42 @@
+"""
+Fixed-timestep clock for RETRO RACER
+
+Real frame time is accumulated and spent in whole simulation ticks, so
+game speed no longer depends on the render frame rate. A cap on
+catch-up ticks keeps a long stall from freezing the game, and the
+leftover fraction of a tick is exposed as an interpolation factor for
+rendering between the previous and current simulation states.
+"""
+
+
+class FixedTimestep:
+    """Turn variable frame times into a whole number of fixed ticks"""
+
+    def __init__(self, tick_rate=60, max_catch_up=8):
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.dropped_ticks = 0
+
+    def advance(self, frame_dt):
+        """Add a frame's elapsed seconds and return how many ticks to run"""
+        self.accumulator += frame_dt
+        ticks = int(self.accumulator / self.tick_dt)
+        if ticks > self.max_catch_up:
+            # Too far behind: run the cap and drop the rest
+            self.dropped_ticks += ticks - self.max_catch_up
+            ticks = self.max_catch_up
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_dt
+        return ticks
+
+    @property
+    def alpha(self):
+        """Fraction of a tick since the last one, for render interpolation"""
+        return min(self.accumulator / self.tick_dt, 1.0)
+
+    def reset(self):
+        """Forget any accumulated time"""
+        self.accumulator = 0.0
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Batched, vectorized RETRO RACER environment for training agents
+
+VecEnv steps N independent games in lockstep with the rules of
+sim_core.Simulation at the base tick rate: steering, the difficulty
+curve, obstacle movement, despawn scoring, spawning and collision.
+Obstacle waves, authored patterns included, come from a spawn_schedule
+scheduler per game, seeded the way Simulation seeds its own, so an
+episode started from seed s meets exactly the obstacles of
+Simulation(s) and the same inputs play out the same run. The schedulers
+are forks of one template and only run for games that spawn in a step;
+all other state lives in NumPy arrays - one entry per game, and an
+(N, slots) grid for obstacles.
+
+Game i's first episode uses seeds[i]. Later episodes take their seeds
+from the game's own splitmix64 stream, so a batch is reproducible from
+its seeds, and every episode's seed is reported so it can be replayed in
+the game. Finished games reset in place during the same step (Gym's
+vector auto-reset), so the batch never stalls.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from obstacle_store import OBSTACLE_SIZES, TYPE_NAMES
+from sim_core import (BASE_TICK_RATE, INPUT_LEFT, INPUT_RIGHT, OBSTACLE_DESPAWN_Y,
+                      OBSTACLE_SCORE, OBSTACLE_SPAWN_Y, PLAYER_HEIGHT, PLAYER_SPEED, PLAYER_WIDTH,
+                      PLAYER_Y, ROAD_LEFT, ROAD_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, STEER_LEFT,
+                      STEER_RIGHT, Difficulty, make_spawner)
+
+# Obstacle slots per game; walls and chicanes at top speed put up to 16 on screen
+DEFAULT_SLOTS = 24
+
+# Values per obstacle slot in an observation: relative x, y, is barrier, alive
+SLOT_FEATURES = 4
+
+# splitmix64 constants
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# Obstacle (width, height) and their halves (rounded down), indexed by type code
+SIZES = np.array([OBSTACLE_SIZES[name] for name in TYPE_NAMES], dtype=np.float64)
+HALF_SIZES = SIZES // 2
+
+
+def splitmix64(state):
+    """Advance each stream in place and return one 64-bit output per stream"""
+    state += GOLDEN_GAMMA
+    z = state.copy()
+    z ^= z >> np.uint64(30)
+    z *= MIX_1
+    z ^= z >> np.uint64(27)
+    z *= MIX_2
+    z ^= z >> np.uint64(31)
+    return z
+
+
+class VecEnv:
+    """N games of RETRO RACER stepped in lockstep
+
+    Actions are the Simulation input bitmask (0 none, 1 left, 2 right,
+    3 both). Rewards are the score gained that step: 1 per tick survived
+    plus the score for each obstacle passed.
+    """
+
+    def __init__(self, num_envs, slots=DEFAULT_SLOTS, difficulty=None, max_steps=None):
+        self.num_envs = num_envs
+        self.slots = slots
+        self.difficulty = difficulty or Difficulty()
+        self.max_steps = max_steps
+        self.observation_size = 2 + slots * SLOT_FEATURES
+
+        n = num_envs
+        self.rng_state = np.zeros(n, dtype=np.uint64)
+        # Seed of each game's current episode
+        self.seeds = np.zeros(n, dtype=np.uint64)
+        # One scheduler per game, forked so they share the wave geometry
+        template = make_spawner(self.difficulty, seed=0)
+        self.spawners = [template.fork(0) for _ in range(n)]
+        # Obstacles lost because a game had no free slot (Simulation has no limit)
+        self.overflow = 0
+        self.player_x = np.zeros(n)
+        self.speed = np.zeros(n)
+        self.distance = np.zeros(n)
+        self.next_level = np.zeros(n)
+        self.spawn_timer = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+
+        shape = (n, slots)
+        self.obstacle_x = np.zeros(shape)
+        self.obstacle_y = np.zeros(shape)
+        self.obstacle_kind = np.zeros(shape, dtype=np.int8)
+        self.obstacle_width = np.zeros(shape)
+        self.obstacle_height = np.zeros(shape)
+        self.obstacle_half_width = np.zeros(shape)
+        self.obstacle_half_height = np.zeros(shape)
+        self.alive = np.zeros(shape, dtype=bool)
+        self.rows = np.arange(n)
+
+    def reset(self, seeds=None):
+        """Start every game; seeds is one non-negative int per game (default 0..N-1)
+
+        Returns the batched observations.
+        """
+        if seeds is None:
+            seeds = np.arange(self.num_envs)
+        seeds = np.asarray(seeds, dtype=np.int64).astype(np.uint64)
+        self.rng_state[:] = seeds
+        self.reset_games(np.ones(self.num_envs, dtype=bool), seeds)
+        return self.observe()
+
+    def reset_games(self, mask, seeds=None):
+        """Start new episodes in the masked games, by default with seeds from their streams"""
+        if seeds is None:
+            state = self.rng_state[mask]
+            seeds = splitmix64(state)
+            self.rng_state[mask] = state
+        self.seeds[mask] = seeds
+        for game, seed in zip(np.flatnonzero(mask).tolist(), self.seeds[mask].tolist()):
+            # Simulation.reset seeds its schedule with the first draw of Random(seed)
+            self.spawners[game].reset(random.Random(seed).getrandbits(64))
+
+        difficulty = self.difficulty
+        self.player_x[mask] = SCREEN_WIDTH // 2
+        self.speed[mask] = difficulty.start_speed
+        self.distance[mask] = 0
+        self.next_level[mask] = difficulty.level_distance
+        self.spawn_timer[mask] = 0
+        self.score[mask] = 0
+        self.ticks[mask] = 0
+        self.alive[mask] = False
+
+    def step(self, actions):
+        """Advance every game one tick
+
+        Returns (observations, rewards, dones, info). Games that end are
+        reset before returning; info['final_score'] and info['final_ticks']
+        hold their results (0 for games still running) and info['seeds']
+        the seed of the episode each game played this step.
+        """
+        actions = np.asarray(actions)
+        difficulty = self.difficulty
+        score_before = self.score.copy()
+
+        # Steering, checked left then right as in Simulation.apply_input
+        left = ((actions & INPUT_LEFT) != 0) & (self.player_x > STEER_LEFT)
+        self.player_x -= PLAYER_SPEED * left
+        right = ((actions & INPUT_RIGHT) != 0) & (self.player_x < STEER_RIGHT)
+        self.player_x += PLAYER_SPEED * right
+
+        # Distance, difficulty and the per-tick point
+        self.distance += self.speed
+        level_up = self.distance >= self.next_level
+        self.next_level += difficulty.level_distance * level_up
+        self.speed = np.where(level_up,
+                              np.minimum(self.speed + difficulty.speed_step, difficulty.max_speed),
+                              self.speed)
+        self.score += 1
+        self.ticks += 1
+
+        # Collision against obstacles before they move, with pygame.Rect truncation
+        width = self.obstacle_width
+        height = self.obstacle_height
+        o_left = np.trunc(self.obstacle_x - self.obstacle_half_width)
+        o_top = np.trunc(self.obstacle_y - self.obstacle_half_height)
+        p_left = (self.player_x - PLAYER_WIDTH // 2)[:, None]
+        p_top = PLAYER_Y - PLAYER_HEIGHT // 2
+        hit = (self.alive & (o_left < p_left + PLAYER_WIDTH) & (p_left < o_left + width) &
+               (o_top < p_top + PLAYER_HEIGHT) & (p_top < o_top + height))
+        crashed = hit.any(axis=1)
+        running = ~crashed
+
+        # Move, despawn with scoring (crashed games are frozen as in Simulation.step)
+        self.obstacle_y += (self.speed + 2)[:, None] * (self.alive & running[:, None])
+        gone = self.alive & (self.obstacle_y > OBSTACLE_DESPAWN_Y)
+        self.alive &= ~gone
+        self.score += OBSTACLE_SCORE * gone.sum(axis=1)
+
+        # Spawning the next scheduled wave
+        self.spawn_timer += running
+        spawn_rate = np.maximum(difficulty.spawn_interval
+                                - (self.speed - difficulty.start_speed) * difficulty.spawn_speedup,
+                                difficulty.min_spawn_interval)
+        spawn = running & (self.spawn_timer >= spawn_rate)
+        if spawn.any():
+            self.spawn_waves(self.rows[spawn], spawn_rate[spawn])
+
+        rewards = (self.score - score_before).astype(np.float32)
+        dones = crashed
+        if self.max_steps is not None:
+            dones = dones | (self.ticks >= self.max_steps)
+        info = {
+            'crashed': crashed,
+            'seeds': self.seeds.copy(),
+            'final_score': np.where(dones, self.score, 0),
+            'final_ticks': np.where(dones, self.ticks, 0),
+        }
+        if dones.any():
+            self.reset_games(dones)
+        return self.observe(), rewards, dones, info
+
+    def spawn_waves(self, games, spawn_rates):
+        """Spawn each game's next wave into its free slots, lowest slots first"""
+        speeds = self.speed[games]
+        waves = [self.spawners[game].next_wave(speed)
+                 for game, speed in zip(games.tolist(), speeds.tolist())]
+        # Take the timers back by the spawn rates and the waves' extents, as in Simulation.spawn_wave
+        extents = np.array([wave.extent for wave in waves])
+        self.spawn_timer[games] -= spawn_rates + extents / (speeds + 2)
+
+        counts = np.array([len(wave) for wave in waves])
+        if not counts.any():
+            return
+        # Each obstacle's spawning game (as an index into games) and place in its wave
+        owners = np.repeat(np.arange(len(games)), counts)
+        ranks = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+        alive = self.alive[games]
+        free_slots = np.argsort(alive, axis=1, kind='stable')
+        fits = ranks < (~alive).sum(axis=1)[owners]
+        self.overflow += int(len(fits) - fits.sum())
+        owners, ranks = owners[fits], ranks[fits]
+
+        rows = games[owners]
+        slots = free_slots[owners, ranks]
+        kinds = np.concatenate([wave.kinds for wave in waves])[fits]
+        self.obstacle_x[rows, slots] = np.concatenate([wave.xs for wave in waves])[fits]
+        self.obstacle_y[rows, slots] = OBSTACLE_SPAWN_Y - np.concatenate(
+            [wave.offsets for wave in waves])[fits]
+        self.obstacle_kind[rows, slots] = kinds
+        self.obstacle_width[rows, slots] = SIZES[kinds, 0]
+        self.obstacle_height[rows, slots] = SIZES[kinds, 1]
+        self.obstacle_half_width[rows, slots] = HALF_SIZES[kinds, 0]
+        self.obstacle_half_height[rows, slots] = HALF_SIZES[kinds, 1]
+        self.alive[rows, slots] = True
+
+    def observe(self):
+        """Observations as float32 (N, observation_size)
+
+        Per game: player x across the road (0..1), speed over max speed,
+        then per obstacle slot: x relative to the player over the road
+        width, y over the screen height, 1 for a barrier, 1 when alive.
+        """
+        obs = np.empty((self.num_envs, self.observation_size), dtype=np.float32)
+        obs[:, 0] = (self.player_x - ROAD_LEFT) / ROAD_WIDTH
+        obs[:, 1] = self.speed / self.difficulty.max_speed
+        slots = obs[:, 2:].reshape(self.num_envs, self.slots, SLOT_FEATURES)
+        # Empty slots are zeroed feature by feature, while the arrays are
+        # contiguous; masking the interleaved slots costs several times more
+        alive = self.alive
+        slots[:, :, 0] = (self.obstacle_x - self.player_x[:, None]) * (alive / ROAD_WIDTH)
+        slots[:, :, 1] = self.obstacle_y * (alive / SCREEN_HEIGHT)
+        slots[:, :, 2] = self.obstacle_kind * alive
+        slots[:, :, 3] = alive
+        return obs
+
+
+def main(argv=None):
+    """Measure env-steps per second with random actions"""
+    parser = argparse.ArgumentParser(description="Vectorized RETRO RACER throughput")
+    parser.add_argument('--envs', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    env = VecEnv(args.envs)
+    env.reset(np.arange(args.envs) + args.seed)
+    actions = np.random.default_rng(args.seed).integers(0, 3, (args.steps, args.envs))
+    episodes = 0
+    start = time.perf_counter()
+    for step_actions in actions:
+        _, _, dones, _ = env.step(step_actions)
+        episodes += int(dones.sum())
+    elapsed = time.perf_counter() - start
+    steps = args.envs * args.steps
+    print(f"{steps:,} env-steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s, "
+          f"{steps / elapsed / BASE_TICK_RATE / 3600:.1f} hours of play per second); "
+          f"{episodes} episodes finished")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())